@@ -0,0 +1,163 @@
+"""Benchmark parsing, simulation and formatting on generated scenarios.
+
+    python -m benchmarks.bench --preset quick --output bench.json
+
+Every scenario is generated from a fixed seed, so runs can be compared across
+releases. Each phase is timed separately and the best of --repeat runs is kept.
+Throughput is given for the whole programs, a simulation that stops on an early
+collision therefore shows a higher figure.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import UTC, datetime
+
+from src.execute import (
+    execute_simulation_multiples_cars,
+    execute_simulation_one_car,
+    execute_simulation_one_car_run_length,
+)
+from src.generator import format_scenario, generate_scenario
+from src.parser import ScenarioParser, parse_part2
+from src.tiles import execute_simulation_multiples_cars_tiles
+from src.trajectories import execute_simulation_multiples_cars_trajectories
+from src.vectorized import execute_simulation_multiples_cars_vectorized
+
+ONE_CAR_ENGINES = {
+    "reference": execute_simulation_one_car,
+    "run_length": execute_simulation_one_car_run_length,
+}
+MULTIPLE_CARS_ENGINES = {
+    "reference": execute_simulation_multiples_cars,
+    "vectorized": execute_simulation_multiples_cars_vectorized,
+    "trajectories": execute_simulation_multiples_cars_trajectories,
+    "tiles": execute_simulation_multiples_cars_tiles,
+}
+
+PRESETS = {
+    "quick": [
+        {"name": "one-car", "width": 1000, "height": 1000, "cars": 1, "commands": 100_000},
+        {"name": "small-fleet", "width": 100, "height": 100, "cars": 20, "commands": 1000},
+        {"name": "sparse-fleet", "width": 10_000, "height": 10_000, "cars": 2000, "commands": 100},
+        {
+            "name": "dense-fleet",
+            "width": 1000,
+            "height": 1000,
+            "cars": 2000,
+            "commands": 100,
+            "density": 0.5,
+        },
+    ],
+    "full": [
+        {"name": "one-car", "width": 10_000, "height": 10_000, "cars": 1, "commands": 2_000_000},
+        {"name": "small-fleet", "width": 100, "height": 100, "cars": 26, "commands": 10_000},
+        {
+            "name": "sparse-fleet",
+            "width": 100_000,
+            "height": 100_000,
+            "cars": 20_000,
+            "commands": 200,
+        },
+        {
+            "name": "large-fleet",
+            "width": 1_000_000,
+            "height": 1_000_000,
+            "cars": 100_000,
+            "commands": 100,
+        },
+        {
+            "name": "dense-fleet",
+            "width": 10_000,
+            "height": 10_000,
+            "cars": 20_000,
+            "commands": 200,
+            "density": 0.5,
+        },
+    ],
+}
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def run_scenario(config: dict, seed: int, repeat: int) -> list[dict]:
+    """Time every engine that applies to one scenario, keeping the best of `repeat` runs."""
+    parameters = {key: value for key, value in config.items() if key != "name"}
+    field, cars = generate_scenario(seed=seed, **parameters)
+    text = format_scenario(field, cars)
+
+    parse_seconds = min(timed(parse_part2, ScenarioParser(), text)[0] for _ in range(repeat))
+
+    engines = ONE_CAR_ENGINES if len(cars) == 1 else MULTIPLE_CARS_ENGINES
+    records = []
+    for engine_name, engine in engines.items():
+        simulate_seconds = format_seconds = float("inf")
+        for _ in range(repeat):
+            fleet = [car.copy() for car in cars]
+            seconds, result = timed(engine, field, fleet if len(fleet) > 1 else fleet[0])
+            simulate_seconds = min(simulate_seconds, seconds)
+            seconds, _ = timed(lambda cars: "\n".join(format(car) for car in cars), fleet)
+            format_seconds = min(format_seconds, seconds)
+
+        records.append(
+            {
+                "scenario": config["name"],
+                **parameters,
+                "seed": seed,
+                "engine": engine_name,
+                "parse_seconds": parse_seconds,
+                "simulate_seconds": simulate_seconds,
+                "format_seconds": format_seconds,
+                "commands_per_second": len(cars) * config["commands"] / simulate_seconds,
+                "result": result if isinstance(result, str) else format(result),
+            }
+        )
+
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto Driving Car Simulation benchmarks")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the scenario generator")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement")
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+
+    args = parser.parse_args()
+
+    results = []
+    for config in PRESETS[args.preset]:
+        for record in run_scenario(config, args.seed, args.repeat):
+            print(
+                f"{record['scenario']:>14} {record['engine']:>11} "
+                f"simulate {record['simulate_seconds']:.4f}s "
+                f"({record['commands_per_second']:,.0f} commands/s)",
+                file=sys.stderr,
+            )
+            results.append(record)
+
+    report = json.dumps(
+        {
+            "timestamp": datetime.now(UTC).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "preset": args.preset,
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output == "-":
+        print(report)
+    else:
+        with open(args.output, "w") as stream:
+            stream.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Load test of the simulation server, run with python -m benchmarks.load.
+
+Without --port or --unix a local server is started on a free port for the run.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+
+from src.client import SimulationClient
+from src.generator import format_scenario, generate_scenario
+from src.server import DEFAULT_HOST, SimulationServer
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+async def run_load(args: argparse.Namespace, host: str, port: int, unix: str | None) -> dict:
+    scenarios = []
+    for seed in range(args.scenarios):
+        field, cars = generate_scenario(
+            seed=seed, width=args.size, height=args.size, cars=args.cars, commands=args.commands
+        )
+        scenarios.append(format_scenario(field, cars))
+
+    latencies = []
+    errors = 0
+    remaining = iter(range(args.requests))
+
+    async def user(client: SimulationClient):
+        nonlocal errors
+        for index in remaining:
+            start = time.perf_counter()
+            response = await client.simulate(2, scenarios[index % len(scenarios)])
+            latencies.append(time.perf_counter() - start)
+            errors += "error" in response
+
+    clients = [await SimulationClient.connect(host, port, unix) for _ in range(args.connections)]
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(user(clients[index % len(clients)]) for index in range(args.concurrency))
+        )
+    finally:
+        for client in clients:
+            await client.close()
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "seconds": seconds,
+        "requests_per_second": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    if args.port or args.unix:
+        return await run_load(args, args.host, args.port, args.unix)
+
+    async with SimulationServer(workers=args.workers) as server:
+        listener = await server.listen_tcp(DEFAULT_HOST, 0)
+        async with listener:
+            port = listener.sockets[0].getsockname()[1]
+            return await run_load(args, DEFAULT_HOST, port, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto Driving Car Simulation server load test")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="TCP address of the server")
+    parser.add_argument("--port", type=int, default=None, help="TCP port of the server")
+    parser.add_argument("--unix", metavar="PATH", help="Unix socket of the server")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="Workers of the local server"
+    )
+    parser.add_argument("--requests", type=int, default=2000, help="Requests to send")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight")
+    parser.add_argument("--connections", type=int, default=8, help="Connections to open")
+    parser.add_argument("--scenarios", type=int, default=50, help="Distinct scenarios sent")
+    parser.add_argument("--size", type=int, default=100, help="Field width and height")
+    parser.add_argument("--cars", type=int, default=10, help="Cars per scenario")
+    parser.add_argument("--commands", type=int, default=100, help="Commands per car")
+
+    args = parser.parse_args()
+
+    if min(args.requests, args.concurrency, args.connections, args.scenarios) < 1:
+        parser.error("The request, concurrency, connection and scenario counts must be positive")
+
+    report = asyncio.run(run(args))
+    print(
+        f"{report['requests']} requests in {report['seconds']:.2f}s "
+        f"({report['requests_per_second']:,.0f}/s), "
+        f"p50 {report['p50_ms']:.2f} ms, p99 {report['p99_ms']:.2f} ms",
+        file=sys.stderr,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import contextlib
+import json
+import sys
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from src.execute import run_simulation
+from src.parser import ScenarioError, ScenarioParser, parse_part1, parse_part2
+
+DOCUMENT_SEPARATOR = "---"
+
+
+def check_scenario(part, text):
+    """Raise ScenarioError unless `part` is 1 or 2 and `text` a string."""
+    # bool is an int, and 1.0 == 1: only actual ints are parts
+    if type(part) is not int or part not in (1, 2):
+        raise ScenarioError("The part must be 1 or 2")
+    if not isinstance(text, str):
+        raise ScenarioError("The input must be a string")
+
+
+def run_scenario(scenario: tuple[int, str] | ScenarioError) -> dict:
+    """Parse and simulate one scenario, returning its result or its error.
+
+    A record that could not be read arrives as its ScenarioError.
+    """
+    if isinstance(scenario, ScenarioError):
+        return {"error": str(scenario)}
+
+    part, text = scenario
+    parser = ScenarioParser()
+    try:
+        check_scenario(part, text)
+        if part == 1:
+            field, cars = parse_part1(parser, text)
+        else:
+            field, cars = parse_part2(parser, text)
+    except ScenarioError as error:
+        return {"error": str(error)}
+
+    return {"result": run_simulation(field, cars)}
+
+
+def run_batch(
+    scenarios: Iterable[tuple[int, str] | ScenarioError],
+    workers: int | None = None,
+    chunksize: int = 64,
+) -> Iterator[dict]:
+    """Run the scenarios on a process pool and yield their results in input order.
+
+    Scenarios are sent to the workers `chunksize` at a time to keep the dispatch
+    overhead low. With a single worker everything runs in the current process.
+    """
+    if workers == 1:
+        yield from map(run_scenario, scenarios)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(run_scenario, scenarios, chunksize=chunksize)
+
+
+def read_jsonl_scenarios(
+    lines: Iterable[str], part: int
+) -> Iterator[tuple[int, str] | ScenarioError]:
+    """Read one {"part": 1|2, "input": "..."} record per line, part defaulting to `part`.
+
+    Only the JSON is checked here: a line that is not a record is yielded as its
+    ScenarioError and a record with an invalid part or input gets its own error from
+    run_scenario. Either way the rest of the batch still runs.
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            scenario = record.get("part", part), record["input"]
+        except (ValueError, KeyError, AttributeError):
+            scenario = ScenarioError(f"Invalid scenario record on line {number}")
+        yield scenario
+
+
+def read_text_scenarios(lines: Iterable[str], part: int) -> Iterator[tuple[int, str]]:
+    """Read scenarios written in the usual text format, separated by --- lines."""
+    document = []
+    for line in lines:
+        if line.strip() == DOCUMENT_SEPARATOR:
+            yield part, "".join(document).strip("\n")
+            document = []
+        else:
+            document.append(line)
+
+    if "".join(document).strip():
+        yield part, "".join(document).strip("\n")
+
+
+def open_stream(path: str, mode: str):
+    """Open `path`, or stdin/stdout for -, without ever closing the standard streams."""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+
+    return open(path, mode)
+
+
+def write_jsonl_results(stream, results: Iterable[dict]):
+    for result in results:
+        stream.write(json.dumps(result) + "\n")
+
+
+def write_text_results(stream, results: Iterable[dict]):
+    for index, result in enumerate(results):
+        if index:
+            stream.write(f"{DOCUMENT_SEPARATOR}\n")
+        if "error" in result:
+            stream.write(f"error: {result['error']}\n")
+        else:
+            stream.write(f"{result['result']}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto Driving Car Simulation - batch mode")
+    parser.add_argument("scenarios", help="File with one scenario per record, - for stdin")
+    parser.add_argument(
+        "-o", "--output", default="-", help="File receiving the results, - for stdout"
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["jsonl", "text"],
+        default=None,
+        help="Scenario format, guessed from the file extension by default",
+    )
+    parser.add_argument(
+        "-p",
+        "--part",
+        type=int,
+        choices=[1, 2],
+        default=2,
+        help="Functioning mode of scenarios that do not define one",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="Number of worker processes"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=64, help="Scenarios sent to a worker at once"
+    )
+
+    args = parser.parse_args()
+
+    if args.format is None:
+        args.format = "jsonl" if Path(args.scenarios).suffix == ".jsonl" else "text"
+    if args.workers is not None and args.workers < 1:
+        parser.error("The number of workers must be positive")
+    if args.chunksize < 1:
+        parser.error("The chunk size must be positive")
+
+    with (
+        open_stream(args.scenarios, "r") as input_stream,
+        open_stream(args.output, "w") as output_stream,
+    ):
+        if args.format == "jsonl":
+            scenarios = read_jsonl_scenarios(input_stream, args.part)
+            write_results = write_jsonl_results
+        else:
+            scenarios = read_text_scenarios(input_stream, args.part)
+            write_results = write_text_results
+
+        write_results(output_stream, run_batch(scenarios, args.workers, args.chunksize))
+
+
+if __name__ == "__main__":
+    main()
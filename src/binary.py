@@ -0,0 +1,213 @@
+"""Binary scenario format.
+
+All integers are little-endian. A file is made of:
+
+- a 32-byte header: the magic b"JACS", the format version (u16), 2 reserved bytes,
+  then the field width, the field height and the number of cars (u64 each);
+- in version 2 only, the number of obstacles (u64) and one 32-byte record per
+  obstacle: the corners x0, y0, x1, y1 of its rectangle (u64 each). Fields without
+  obstacles are written in version 1;
+- one 48-byte record per car: x, y, the offset and the number of commands of its
+  command stream, the offset of its id (u64 each), the id length in bytes (u32),
+  the direction (u8, 0-3 for N, E, S, W) and 3 padding bytes;
+- the car ids, UTF-8 encoded;
+- the command streams, each starting on a byte boundary, with 2 bits per command
+  (0 = F, 1 = R, 2 = L), the first command in the lowest bits of a byte.
+
+Offsets are counted from the start of the file.
+"""
+
+import mmap
+import struct
+from collections.abc import Iterator, Sequence
+
+import numpy as np
+
+from src.obstacles import Obstacles
+from src.schemas import Car, Field
+
+MAGIC = b"JACS"
+VERSION = 1
+OBSTACLES_VERSION = 2
+HEADER = struct.Struct("<4sH2xQQQ")
+RECORD = struct.Struct("<QQQQQIB3x")
+COUNT = struct.Struct("<Q")
+OBSTACLE = struct.Struct("<QQQQ")
+
+# 2-bit codes <-> ASCII command codes
+CODES = b"FRL"
+ENCODE = bytes.maketrans(CODES, bytes(range(len(CODES))))
+DECODE = np.frombuffer(CODES + b"\0", dtype=np.uint8)
+SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+# The four commands held by every possible byte of a packed stream
+UNPACKED = [DECODE[(byte >> SHIFTS) & 3].tobytes() for byte in range(256)]
+
+
+def pack_commands(commands: bytes) -> bytes:
+    """Pack ASCII command codes four to a byte."""
+    codes = np.frombuffer(commands.translate(ENCODE), dtype=np.uint8)
+    codes = np.concatenate((codes, np.zeros(-len(codes) % 4, dtype=np.uint8))).reshape(-1, 4)
+    return np.bitwise_or.reduce(codes << SHIFTS, axis=1).astype(np.uint8).tobytes()
+
+
+def unpack_commands(data, count: int) -> bytes:
+    """Decode `count` packed commands back to ASCII command codes."""
+    packed = np.frombuffer(data, dtype=np.uint8)
+    codes = (packed[:, None] >> SHIFTS) & 3
+    return DECODE[codes.reshape(-1)[:count]].tobytes()
+
+
+class PackedCommands(Sequence):
+    """Read-only sequence of command codes over a 2-bit packed buffer.
+
+    Commands are decoded on access, so a stream mapped from a file is never copied.
+    """
+
+    __slots__ = ("data", "length")
+
+    def __init__(self, data, length: int):
+        self.data = data
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, stride = index.indices(self.length)
+            if stride != 1:
+                return bytes(self)[index]
+            # Only decode the bytes holding the slice
+            first = start >> 2
+            commands = unpack_commands(self.data[first : (stop + 3) >> 2], max(stop - 4 * first, 0))
+            return commands[start - 4 * first :]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("command index out of range")
+        return CODES[(self.data[index >> 2] >> ((index & 3) * 2)) & 3]
+
+    def __iter__(self) -> Iterator[int]:
+        remaining = self.length
+        for byte in self.data:
+            commands = UNPACKED[byte]
+            if remaining <= 4:
+                yield from commands[:remaining]
+                return
+            yield from commands
+            remaining -= 4
+
+    def __bytes__(self):
+        return unpack_commands(self.data, self.length)
+
+    def __eq__(self, other):
+        return bytes(self) == bytes(other)
+
+    def __lt__(self, other):
+        return bytes(self) < bytes(other)
+
+    def __repr__(self):
+        return f"PackedCommands({bytes(self)!r})"
+
+
+def write_scenario(path, field: Field, cars: list[Car]):
+    """Write a field and its cars in the binary scenario format."""
+    ids = [car.id.encode("utf-8") for car in cars]
+    streams = [pack_commands(bytes(car.commands)) for car in cars]
+
+    rectangles = field.obstacles.rectangles if field.obstacles is not None else []
+    version = OBSTACLES_VERSION if rectangles else VERSION
+    records = HEADER.size + (COUNT.size + OBSTACLE.size * len(rectangles) if rectangles else 0)
+    offset = records + RECORD.size * len(cars)
+    id_offsets = []
+    for car_id in ids:
+        id_offsets.append(offset)
+        offset += len(car_id)
+
+    with open(path, "wb") as stream:
+        stream.write(HEADER.pack(MAGIC, version, field.width, field.height, len(cars)))
+        if rectangles:
+            stream.write(COUNT.pack(len(rectangles)))
+            stream.writelines(OBSTACLE.pack(*rectangle) for rectangle in rectangles)
+        for car, car_id, id_offset, packed in zip(cars, ids, id_offsets, streams, strict=True):
+            stream.write(
+                RECORD.pack(
+                    car.x, car.y, offset, len(car.commands), id_offset, len(car_id), car.heading
+                )
+            )
+            offset += len(packed)
+        stream.writelines(ids)
+        stream.writelines(streams)
+
+
+def is_binary_scenario(path) -> bool:
+    try:
+        with open(path, "rb") as stream:
+            return stream.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def load_scenario(path) -> tuple[Field, list[Car]]:
+    """Memory-map a binary scenario file.
+
+    The cars' commands are PackedCommands views over the mapping: nothing is
+    decoded until an engine reads it. Every record is checked against the file and
+    the field, a ValueError is raised on the first invalid one.
+    """
+    with open(path, "rb") as stream:
+        data = memoryview(mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ))
+
+    if len(data) < HEADER.size:
+        raise ValueError("Not a binary scenario file")
+    magic, version, width, height, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary scenario file")
+    if version not in (VERSION, OBSTACLES_VERSION):
+        raise ValueError(f"Unsupported binary scenario version {version}")
+    if not count:
+        raise ValueError("No cars defined in the input")
+
+    start = HEADER.size
+    obstacles = None
+    if version == OBSTACLES_VERSION:
+        if len(data) < start + COUNT.size:
+            raise ValueError("Truncated binary scenario file")
+        (obstacle_count,) = COUNT.unpack_from(data, start)
+        start += COUNT.size
+        rectangles = data[start : start + OBSTACLE.size * obstacle_count]
+        if len(rectangles) != OBSTACLE.size * obstacle_count:
+            raise ValueError("Truncated binary scenario file")
+        obstacles = Obstacles(width, height, OBSTACLE.iter_unpack(rectangles))
+        start += len(rectangles)
+
+    records = data[start : start + RECORD.size * count]
+    if len(records) != RECORD.size * count:
+        raise ValueError("Truncated binary scenario file")
+
+    cars = []
+    ids = set()
+    records = RECORD.iter_unpack(records)
+    for number, (x, y, offset, length, id_offset, id_length, heading) in enumerate(records, 1):
+        if id_offset + id_length > len(data) or offset + (length + 3) // 4 > len(data):
+            raise ValueError(f"Car record {number}: truncated binary scenario file")
+        try:
+            car_id = str(data[id_offset : id_offset + id_length], "utf-8")
+        except UnicodeDecodeError:
+            raise ValueError(f"Car record {number}: the car ID is not valid UTF-8") from None
+        if not car_id:
+            raise ValueError(f"Car record {number}: the car ID is empty")
+        if car_id in ids:
+            raise ValueError(f"Car record {number}: duplicate car ID {car_id}")
+        ids.add(car_id)
+        if heading > 3:
+            raise ValueError(f"Car record {number}: invalid direction {heading}")
+        if x >= width or y >= height:
+            raise ValueError(f"Car record {number}: the starting position must be in the field")
+        if obstacles is not None and obstacles.blocked(x, y):
+            raise ValueError(f"Car record {number}: the starting position is on an obstacle")
+
+        commands = PackedCommands(data[offset : offset + (length + 3) // 4], length)
+        cars.append(Car(id=car_id, x=x, y=y, direction=heading, command_list=commands))
+
+    return Field(width=width, height=height, obstacles=obstacles), cars
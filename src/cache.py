@@ -0,0 +1,211 @@
+"""On-disk cache of simulation results, addressed by the hash of their input.
+
+Every result is a file named after the sha256 of its normalised (field, cars)
+input and of KEY_VERSION, written to a temporary file then renamed so readers
+never see a partial result. A `state` file holds the total size of the results
+and the hit and miss counts; it is updated under an exclusive lock, which also
+serialises eviction when several processes share the cache. Lookups never wait
+for that lock: their counts are added to the totals when it is free, or on the
+next write. A hit refreshes the file's mtime and the least recently used results
+are evicted first.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import os
+import struct
+from collections.abc import Iterable
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.files import atomic_write
+from src.repeat import RepeatedCommands
+from src.schemas import Car, Field
+
+STATE = struct.Struct("<QQQ")
+# Part of every key: raise it whenever the results of the engines or the way
+# scenarios are hashed change, so older results are never read back
+KEY_VERSION = 1
+DEFAULT_CACHE_SIZE = 64 << 20
+# Eviction goes below the bound so that it does not run on every following write
+EVICTION_RATIO = 0.9
+
+# Cache used by main, set up by the command line
+_cache = None
+
+
+def enable_cache(directory, max_bytes: int = DEFAULT_CACHE_SIZE) -> "ResultCache":
+    global _cache
+    _cache = ResultCache(directory, max_bytes)
+    return _cache
+
+
+def disable_cache():
+    global _cache
+    _cache = None
+
+
+def get_cache() -> "ResultCache | None":
+    return _cache
+
+
+def scenario_key(field: Field, cars: Iterable[Car]) -> str:
+    """Hash a scenario, independently of how its input was written."""
+    digest = hashlib.sha256(f"v{KEY_VERSION}\n{field.width} {field.height}\n".encode())
+    if field.obstacles is not None:
+        for x0, y0, x1, y1 in field.obstacles.rectangles:
+            digest.update(f"# {x0} {y0} {x1} {y1}\n".encode())
+    for car in cars:
+        commands = car.commands
+        if isinstance(commands, RepeatedCommands):
+            # Repeat trees are hashed in their compact form, never expanded
+            commands = b"*" + str(commands).encode("ascii")
+        else:
+            commands = bytes(commands)
+        digest.update(f"{car.id}\n{car.x} {car.y} {car.heading}\n{len(commands)}\n".encode())
+        digest.update(commands)
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Results stored under `directory`, at most about `max_bytes` of them."""
+
+    def __init__(self, directory, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.directory / "state"
+        # Counts of this process, the state file holds the totals of every process
+        self.hits = self.misses = 0
+        # Counts not added to the totals yet
+        self.unsaved_hits = self.unsaved_misses = 0
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / key[2:]
+
+    @contextmanager
+    def locked_state(self, wait: bool = True):
+        """Yield the [size, hits, misses] totals, saved back when the block exits.
+
+        Without `wait`, raise BlockingIOError if another process holds the lock.
+        """
+        with open(self.state_path, "a+b") as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            stream.seek(0)
+            data = stream.read(STATE.size)
+            state = list(STATE.unpack(data)) if len(data) == STATE.size else [0, 0, 0]
+            yield state
+            stream.seek(0)
+            stream.truncate()
+            stream.write(STATE.pack(*state))
+
+    def get(self, key: str) -> str | None:
+        path = self.path(key)
+        try:
+            result = path.read_text("utf-8")
+        except FileNotFoundError:  # never stored, or evicted in the meantime
+            self.misses += 1
+            self.unsaved_misses += 1
+            result = None
+        else:
+            self.hits += 1
+            self.unsaved_hits += 1
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass  # evicted since it was read, the result is still valid
+
+        try:
+            with self.locked_state(wait=False) as state:
+                self.save_counts(state)
+        except BlockingIOError:
+            pass  # saved by a later lookup or write
+
+        return result
+
+    def save(self):
+        """Add the counts not saved yet to the totals, waiting for the lock if needed."""
+        if self.unsaved_hits or self.unsaved_misses:
+            with self.locked_state() as state:
+                self.save_counts(state)
+
+    def save_counts(self, state: list[int]):
+        """Add the counts not saved yet to the locked `state`."""
+        state[1] += self.unsaved_hits
+        state[2] += self.unsaved_misses
+        self.unsaved_hits = self.unsaved_misses = 0
+
+    def put(self, key: str, result: str):
+        path = self.path(key)
+        path.parent.mkdir(exist_ok=True)
+        data = result.encode("utf-8")
+        with self.locked_state() as state:
+            with atomic_write(path) as temporary:
+                Path(temporary).write_bytes(data)
+                self.save_counts(state)
+                if not path.exists():
+                    state[0] += len(data)
+            if state[0] > self.max_bytes:
+                state[0] = self.evict(int(self.max_bytes * EVICTION_RATIO))
+
+    def evict(self, target: int) -> int:
+        """Delete the least recently used results down to `target` bytes, return the size left."""
+        entries = []
+        for path in self.directory.glob("??/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                status = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime_ns, status.st_size, path))
+
+        entries.sort()
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+
+        return size
+
+    def totals(self) -> tuple[int, int, int]:
+        """Size of the stored results, hits and misses of every process so far."""
+        with self.locked_state() as state:
+            self.save_counts(state)
+            return tuple(state)
+
+    def __format__(self, format_spec):
+        size, hits, misses = self.totals()
+        return "\n".join(
+            [
+                f"cache hits: {self.hits}",
+                f"cache misses: {self.misses}",
+                f"cache total hits: {hits}",
+                f"cache total misses: {misses}",
+                f"cache size: {size} bytes",
+            ]
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto Driving Car Simulation - result cache")
+    parser.add_argument("directory", help="Cache directory")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached result")
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"No cache in {args.directory}")
+    cache = ResultCache(args.directory)
+    if args.clear:
+        with cache.locked_state() as state:
+            state[0] = cache.evict(0)
+    print(format(cache))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Checkpoints of simulations that receive their commands over time.
+
+A checkpoint file is a binary scenario file (see src/binary.py) holding the field
+and the cars as they stand, with their pending commands, followed by a trailer:
+the output of the simulation if it ended on a collision (UTF-8), then the step
+reached, the length of that output (u64 each) and the magic b"JACK". Scenario
+offsets count from the start of the file, so the trailer leaves the scenario
+readable by load_scenario.
+"""
+
+import os
+import struct
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+from src.binary import load_scenario, write_scenario
+from src.execute import execute_simulation_multiples_cars, execute_simulation_one_car_run_length
+from src.files import atomic_write
+from src.schemas import Car, Field
+
+MAGIC = b"JACK"
+TRAILER = struct.Struct("<QQ4s")
+
+
+@dataclass(slots=True)
+class Checkpoint:
+    """State of a simulation after `step` steps.
+
+    `result` holds the output of a simulation that ended on a collision. Such a
+    simulation is over: resuming it returns the same output again.
+    """
+
+    field: Field
+    cars: list[Car]
+    step: int = 0
+    result: str | None = None
+
+    def resume(self, commands: Mapping[str, Sequence[int] | str] | None = None) -> str:
+        """Append new commands to the cars, by car id, and play them from the current state.
+
+        In a fleet, a car that receives fewer commands than the others stands still
+        once it has played them, until the next batch. Return the output of the
+        simulation, as run_simulation would after replaying everything, as long as
+        every batch but the last gives all the cars the same number of commands: a
+        replay would play the next commands of such a car without waiting.
+        """
+        if self.result is not None:
+            return self.result
+
+        programs = {car.id: bytes(car.commands) for car in self.cars}
+        for car_id, new_commands in (commands or {}).items():
+            if car_id not in programs:
+                raise ValueError(f"Unknown car {car_id!r}")
+            if isinstance(new_commands, str):
+                new_commands = new_commands.encode("ascii")
+            new_commands = bytes(new_commands)
+            if new_commands.translate(None, b"FRL"):
+                raise ValueError("The commands must only contain F, R and L")
+            programs[car_id] += new_commands
+
+        steps = max(map(len, programs.values()), default=0)
+        for car in self.cars:
+            car.commands = programs[car.id]
+
+        collided = False
+        if len(self.cars) == 1:
+            output = format(execute_simulation_one_car_run_length(self.field, self.cars[0]))
+        else:
+            output = execute_simulation_multiples_cars(self.field, self.cars, first_step=self.step)
+            collided = output != "no collision"
+
+        for car in self.cars:
+            car.commands = b""
+        if collided:
+            self.result = output
+            self.step = int(output.rsplit("\n", 1)[1])
+        else:
+            self.step += steps
+
+        return output
+
+
+def save_checkpoint(path, checkpoint: Checkpoint):
+    """Write a checkpoint atomically, so an existing one stays valid until it is replaced."""
+    result = (checkpoint.result or "").encode("utf-8")
+    with atomic_write(path) as temporary:
+        write_scenario(temporary, checkpoint.field, checkpoint.cars)
+        with open(temporary, "ab") as stream:
+            stream.write(result)
+            stream.write(TRAILER.pack(checkpoint.step, len(result), MAGIC))
+
+
+def load_checkpoint(path) -> Checkpoint:
+    """Map a checkpoint file, the pending commands are read from the mapping on demand."""
+    field, cars = load_scenario(path)
+    with open(path, "rb") as stream:
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        if size < TRAILER.size:
+            raise ValueError("Not a checkpoint file")
+        stream.seek(size - TRAILER.size)
+        step, result_length, magic = TRAILER.unpack(stream.read(TRAILER.size))
+        if magic != MAGIC or result_length > size - TRAILER.size:
+            raise ValueError("Not a checkpoint file")
+        stream.seek(size - TRAILER.size - result_length)
+        result = stream.read(result_length).decode("utf-8") if result_length else None
+
+    return Checkpoint(field=field, cars=cars, step=step, result=result)
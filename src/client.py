@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+
+from src.server import DEFAULT_HOST, DEFAULT_PORT, LINE_LIMIT
+
+
+class SimulationClient:
+    """Connection to a simulation server.
+
+    Requests can be sent concurrently on the same connection, responses are matched
+    to their request by id.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count()
+        self.pending: dict[int, asyncio.Future] = {}
+        self.receiver = asyncio.create_task(self.receive())
+
+    @classmethod
+    async def connect(
+        cls, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix: str | None = None
+    ):
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def receive(self):
+        try:
+            while line := await self.reader.readline():
+                response = json.loads(line)
+                future = self.pending.pop(response.pop("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to the server lost"))
+
+    async def simulate(self, part: int, text: str) -> dict:
+        """Send one scenario and return the {"result": ...} or {"error": ...} response."""
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(json.dumps({"id": request_id, "part": part, "input": text}).encode())
+        self.writer.write(b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+        await asyncio.gather(self.receiver, return_exceptions=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+async def request(args: argparse.Namespace, text: str) -> dict:
+    async with await SimulationClient.connect(args.host, args.port, args.unix) as client:
+        return await client.simulate(args.part, text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto Driving Car Simulation - server client")
+    parser.add_argument("text", nargs="?", help="Input text")
+    parser.add_argument(
+        "-i", "--input", metavar="PATH", help="Read the input from a file, - for stdin"
+    )
+    parser.add_argument(
+        "-p", "--part", type=int, choices=[1, 2], required=True, help="Functioning mode"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help="TCP address of the server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port of the server")
+    parser.add_argument("--unix", metavar="PATH", help="Unix socket of the server")
+
+    args = parser.parse_args()
+
+    if (args.text is None) == (args.input is None):
+        parser.error("Provide the input either as text or with --input, not both")
+    if args.input == "-":
+        text = sys.stdin.read()
+    elif args.input is not None:
+        try:
+            with open(args.input) as stream:
+                text = stream.read()
+        except OSError as error:
+            parser.error(f"Cannot read the input file: {error}")
+    else:
+        text = args.text
+
+    try:
+        response = asyncio.run(request(args, text))
+    except OSError as error:
+        parser.error(f"Cannot reach the server: {error}")
+
+    if "error" in response:
+        parser.error(response["error"])
+    print(response["result"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+
+from src.execute import advance_car
+from src.schemas import FORWARD, Car, Field
+from src.vectorized import STEP_X, STEP_Y, TURNS
+
+# Commands summarised by a leaf of the index, replayed when the car may touch an edge
+BLOCK_SIZE = 64
+
+
+class CommandIndex:
+    """Where a car stands after any step of its commands, without replaying them.
+
+    Rotations never depend on the field, so the heading after every step is a prefix
+    sum. Moves do when the car is pushed against an edge: the index keeps the
+    unclamped path and, for every node of a segment tree over blocks of commands,
+    its bounding box. A query jumps over every node whose box, moved to where the
+    car really is, stays in the field, and only replays the blocks where the car may
+    hit an edge. Away from edges a query costs O(log n). On a field with obstacles,
+    a box must also be clear of them to be jumped over.
+    """
+
+    def __init__(self, field: Field, car: Car, block_size: int = BLOCK_SIZE):
+        self.field = field
+        self.car = car
+        self.block_size = block_size
+        self.commands = bytes(car.commands)
+        # Position after the nodes that had to be replayed, by (level, node)
+        self.replayed = {}
+
+        codes = np.frombuffer(self.commands, dtype=np.uint8)
+        # headings[i] and (xs[i], ys[i]) are the state after i commands, unclamped
+        self.headings = np.empty(len(codes) + 1, dtype=np.int64)
+        self.headings[0] = car.heading
+        np.cumsum(TURNS[codes], out=self.headings[1:])
+        self.headings[1:] += car.heading
+        self.headings &= 3
+        forward = codes == FORWARD
+        self.xs = np.concatenate(([car.x], car.x + np.cumsum(STEP_X[self.headings[1:]] * forward)))
+        self.ys = np.concatenate(([car.y], car.y + np.cumsum(STEP_Y[self.headings[1:]] * forward)))
+
+        # levels[0] holds the boxes of the blocks, each level above merges pairs of nodes
+        starts = np.arange(0, max(len(codes), 1), block_size)
+        ends = np.minimum(starts + block_size, len(codes))
+        boxes = []
+        for path in (self.xs, self.ys):
+            boxes.append(np.minimum(np.minimum.reduceat(path, starts), path[ends]))
+            boxes.append(np.maximum(np.maximum.reduceat(path, starts), path[ends]))
+        self.levels = [np.stack(boxes, axis=1)]
+        while len(self.levels[-1]) > 1:
+            below = self.levels[-1]
+            if len(below) % 2:
+                below = np.concatenate((below, below[-1:]))
+            pairs = below.reshape(-1, 2, 4)
+            self.levels.append(
+                np.stack(
+                    (
+                        pairs[:, :, 0].min(axis=1),
+                        pairs[:, :, 1].max(axis=1),
+                        pairs[:, :, 2].min(axis=1),
+                        pairs[:, :, 3].max(axis=1),
+                    ),
+                    axis=1,
+                )
+            )
+
+    def __len__(self):
+        return len(self.commands)
+
+    def state_at(self, step: int) -> tuple[int, int, int]:
+        """Return the (x, y, heading) of the car after `step` commands."""
+        if not 0 <= step <= len(self.commands):
+            raise IndexError("step out of range")
+
+        x, y = self.walk(len(self.levels) - 1, 0, step, self.car.x, self.car.y)
+        return x, y, int(self.headings[step])
+
+    def car_at(self, step: int) -> Car:
+        """The car after `step` commands, holding the commands it has left."""
+        x, y, heading = self.state_at(step)
+        return Car(self.car.id, x, y, heading, self.commands[step:])
+
+    def walk(self, level: int, node: int, step: int, x: int, y: int) -> tuple[int, int]:
+        """Play the commands of `node` that come before `step`, starting from (x, y)."""
+        span = self.block_size << level
+        start = node * span
+        end = min(start + span, len(self.commands))
+        if start >= step:
+            return x, y
+
+        # Offset between the real position and the unclamped path
+        shift_x, shift_y = x - int(self.xs[start]), y - int(self.ys[start])
+        if end <= step:
+            if position := self.replayed.get((level, node)):
+                return position
+            min_x, max_x, min_y, max_y = self.levels[level][node].tolist()
+            if (
+                min_x + shift_x >= 0
+                and max_x + shift_x < self.field.width
+                and min_y + shift_y >= 0
+                and max_y + shift_y < self.field.height
+                and (
+                    self.field.obstacles is None
+                    or not self.field.obstacles.overlaps(
+                        min_x + shift_x, min_y + shift_y, max_x + shift_x, max_y + shift_y
+                    )
+                )
+            ):
+                return int(self.xs[end]) + shift_x, int(self.ys[end]) + shift_y
+
+        if level == 0:
+            car = Car(self.car.id, x, y, int(self.headings[start]))
+            advance_car(self.field, car, self.commands[start : min(end, step)])
+            x, y = car.x, car.y
+        else:
+            x, y = self.walk(level - 1, 2 * node, step, x, y)
+            x, y = self.walk(level - 1, 2 * node + 1, step, x, y)
+
+        if end <= step:
+            self.replayed[(level, node)] = x, y
+        return x, y
@@ -0,0 +1,41 @@
+import argparse
+
+from src.binary import write_scenario
+from src.parser import ScenarioError, ScenarioParser, parse_part1, parse_part2_stream
+
+
+def convert(text: str, part: int, path):
+    """Convert an input in the text format to a binary scenario file."""
+    parser = ScenarioParser()
+    if part == 1:
+        field, cars = parse_part1(parser, text)
+    else:
+        field, cars = parse_part2_stream(parser, iter(text.strip().split("\n")))
+    write_scenario(path, field, list(cars))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a text input to a binary scenario")
+    parser.add_argument("input", help="Input in the text format")
+    parser.add_argument("output", help="Binary scenario file to write")
+    parser.add_argument(
+        "-p",
+        "--part",
+        type=int,
+        choices=[1, 2],
+        required=True,
+        help="Define the functioning mode: 1 or 2",
+    )
+
+    args = parser.parse_args()
+
+    with open(args.input) as stream:
+        text = stream.read().strip("\n")
+    try:
+        convert(text, args.part, args.output)
+    except ScenarioError as error:
+        parser.error(str(error))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,634 @@
-from src.schemas import Car, Field
+import math
+import re
+import time
+from collections.abc import Callable, Iterable
+from itertools import chain
+
+from src.repeat import RepeatedCommands
+from src.schemas import DX, DY, FORWARD, Car, Field
+from src.stats import SimulationStats
+
+COMMAND_RUNS = re.compile(rb"F+|[RL]+")
+
+# Collision scheduling: buckets are a fraction of the mean car spacing, and below the
+# minimum size rescheduling costs more than it saves
+BUCKET_SPACING_RATIO = 6
+MIN_BUCKET_SIZE = 16
+
+# Occupancy backends: a list over every cell of the field, or a dict of the occupied
+# cells. Indexing the list is cheaper than hashing, but it costs its whole size to
+# build every epoch, so it is picked up to DENSE_CELLS_PER_CAR cells per car and
+# MAX_DENSE_CELLS cells (8 MiB of list)
+OCCUPANCY_BACKENDS = ("dense", "sparse")
+DENSE_CELLS_PER_CAR = 256
+MAX_DENSE_CELLS = 1 << 20
+
+# Instrumentation is off unless enable_stats is called. Engines only look at it once
+# per step and count rejected moves on their rare path, so it costs nothing when off.
+_stats: SimulationStats | None = None
+
+
+def enable_stats(callback: Callable[[SimulationStats], None] | None = None) -> SimulationStats:
+    """Start collecting counters for every following simulation and return them."""
+    global _stats
+    _stats = SimulationStats(callback=callback)
+    return _stats
+
+
+def disable_stats():
+    global _stats
+    _stats = None
+
+
+def get_stats() -> SimulationStats | None:
+    return _stats
 
 
 def execute_simulation_one_car(field: Field, car: Car) -> Car:
-    for command in car.command_list:
-        if command == "F":
+    if stats := _stats:
+        started = time.perf_counter_ns()
+    rejected_moves = 0
+
+    for command in car.commands:
+        if command == FORWARD:
             if car.is_move_valid_for_field(field):
                 car.move()
+            else:
+                rejected_moves += 1
         else:  # R or L
             car.change_direction(command)
 
+    if stats:
+        # The whole program of a single car counts as one step
+        stats.record_commands([bytes(car.commands)], rejected_moves)
+        stats.record_step(time.perf_counter_ns() - started)
+        stats.finish()
+
+    return car
+
+
+def advance_car(field: Field, car: Car, commands: bytes) -> int:
+    """Play `commands` on a car by runs and return the number of rejected moves.
+
+    A run of forward moves is applied as one jump clamped to the field and a run of
+    rotations as a single turn modulo 4, so the cost follows the number of runs. On a
+    field with obstacles, a run stops before the first blocked cell.
+    """
+    rejected_moves = 0
+    direction = car.heading
+    obstacles = field.obstacles
+    for run in COMMAND_RUNS.finditer(commands):
+        commands = run.group()
+        if commands[0] == FORWARD:
+            steps = len(commands)
+            if obstacles is not None:
+                moves = obstacles.free_run(car.x, car.y, direction, steps)
+                car.x += DX[direction] * moves
+                car.y += DY[direction] * moves
+                rejected_moves += steps - moves
+            elif direction == 0:  # N
+                car.y += steps
+                if car.y >= field.height:
+                    rejected_moves += car.y - field.height + 1
+                    car.y = field.height - 1
+            elif direction == 1:  # E
+                car.x += steps
+                if car.x >= field.width:
+                    rejected_moves += car.x - field.width + 1
+                    car.x = field.width - 1
+            elif direction == 2:  # S
+                car.y -= steps
+                if car.y < 0:
+                    rejected_moves -= car.y
+                    car.y = 0
+            else:  # W
+                car.x -= steps
+                if car.x < 0:
+                    rejected_moves -= car.x
+                    car.x = 0
+        else:  # R and L
+            direction = (direction + commands.count(b"R") - commands.count(b"L")) % 4
+
+    car.heading = direction
+    return rejected_moves
+
+
+# Along one axis, any sequence of moves clamped to the field sends a coordinate v to
+# min(max(v + shift, low), high). These (shift, low, high) clamps compose into clamps,
+# so the effect of a whole program is two clamps and a rotation, whatever the edges
+# it runs into.
+NO_CLAMP = (0, -math.inf, math.inf)
+
+
+def compose_clamps(first: tuple, then: tuple) -> tuple:
+    shift, low, high = first
+    then_shift, then_low, then_high = then
+    return (
+        shift + then_shift,
+        min(max(low + then_shift, then_low), then_high),
+        min(max(high + then_shift, then_low), then_high),
+    )
+
+
+def compose_effects(first: tuple, then: tuple) -> tuple:
+    """Effect (x clamp, y clamp, rotation) of playing `first` then `then`."""
+    return (
+        compose_clamps(first[0], then[0]),
+        compose_clamps(first[1], then[1]),
+        (first[2] + then[2]) % 4,
+    )
+
+
+def commands_effect(field: Field, commands: bytes, heading: int) -> tuple:
+    """Effect of plain commands started with `heading`, one clamp per run of moves."""
+    x_clamp = y_clamp = NO_CLAMP
+    direction = heading
+    for run in COMMAND_RUNS.finditer(commands):
+        commands = run.group()
+        if commands[0] == FORWARD:
+            steps = len(commands)
+            if direction == 0:  # N
+                y_clamp = compose_clamps(y_clamp, (steps, -math.inf, field.height - 1))
+            elif direction == 1:  # E
+                x_clamp = compose_clamps(x_clamp, (steps, -math.inf, field.width - 1))
+            elif direction == 2:  # S
+                y_clamp = compose_clamps(y_clamp, (-steps, 0, math.inf))
+            else:  # W
+                x_clamp = compose_clamps(x_clamp, (-steps, 0, math.inf))
+        else:  # R and L
+            direction = (direction + commands.count(b"R") - commands.count(b"L")) % 4
+
+    return x_clamp, y_clamp, (direction - heading) % 4
+
+
+def program_effect(field: Field, program: RepeatedCommands, heading: int, cache: dict) -> tuple:
+    """Effect of a repeat tree started with `heading`, without expanding the repetitions.
+
+    The headings the body starts with cycle with a period of 1, 2 or 4 repetitions.
+    A whole cycle does not rotate the car, and its repetitions are fast-forwarded by
+    squaring, so even a car stuck in a corner costs O(log repeat) compositions.
+    """
+    key = (id(program), heading)
+    if key in cache:
+        return cache[key]
+
+    def body_effect(start_heading):
+        effect = (NO_CLAMP, NO_CLAMP, 0)
+        for part in program.parts:
+            current = (start_heading + effect[2]) % 4
+            if isinstance(part, RepeatedCommands):
+                part_effect = program_effect(field, part, current, cache)
+            else:
+                part_effect = commands_effect(field, part, current)
+            effect = compose_effects(effect, part_effect)
+        return effect
+
+    first = body_effect(heading)
+    period = 4 // math.gcd(first[2], 4)
+    cycle = first
+    for index in range(1, period):
+        cycle = compose_effects(cycle, body_effect((heading + index * first[2]) % 4))
+
+    cycles, remainder = divmod(program.repeat, period)
+    effect = (NO_CLAMP, NO_CLAMP, 0)
+    while cycles:
+        if cycles & 1:
+            effect = compose_effects(effect, cycle)
+        cycle = compose_effects(cycle, cycle)
+        cycles >>= 1
+    # A whole number of cycles leaves the heading unchanged
+    for index in range(remainder):
+        effect = compose_effects(effect, body_effect((heading + index * first[2]) % 4))
+
+    cache[key] = effect
+    return effect
+
+
+def fast_forward(field: Field, car: Car, program: RepeatedCommands):
+    """Play a repeat tree on a car in closed form."""
+    (x_shift, x_low, x_high), (y_shift, y_low, y_high), rotation = program_effect(
+        field, program, car.heading, {}
+    )
+    car.x = min(max(car.x + x_shift, x_low), x_high)
+    car.y = min(max(car.y + y_shift, y_low), y_high)
+    car.heading = (car.heading + rotation) % 4
+
+
+def play_program(
+    field: Field,
+    car: Car,
+    program: RepeatedCommands,
+    blocked: Callable[[int, int], bool] | None = None,
+    count_rejected: bool = True,
+) -> tuple[int, int | None]:
+    """Play a repeat tree on a car moving alone among cars standing still.
+
+    `blocked(x, y)` tells whether a car stands on a cell: the car stops on its first
+    move onto one. Return the number of rejected moves, counted if `count_rejected`,
+    and the number of commands played up to that collision, None without one.
+
+    Once the car starts a repetition in a state it already started one in, its path
+    and rejected moves repeat, and it cannot meet a car it did not already meet: the
+    whole periods left are skipped. Without cars to meet, rejected moves to count and
+    obstacles, the program is fast-forwarded in closed form instead.
+    """
+    if blocked is None and not count_rejected and field.obstacles is None:
+        fast_forward(field, car, program)
+        return 0, None
+
+    rejected_moves = played = 0
+
+    def play(node) -> bool:
+        """Play a node, return whether the car ran into another one."""
+        nonlocal rejected_moves, played
+        if not isinstance(node, RepeatedCommands):
+            for command in node:
+                played += 1
+                if command == FORWARD:
+                    if car.is_move_valid_for_field(field):
+                        car.move()
+                        if blocked is not None and blocked(car.x, car.y):
+                            return True
+                    else:
+                        rejected_moves += 1
+                else:  # R or L
+                    car.change_direction(command)
+            return False
+
+        # Repetition and rejected moves at the start of a repetition, by car state
+        seen = {}
+        repetition = 0
+        while repetition < node.repeat:
+            state = (car.x, car.y, car.heading)
+            if state in seen:
+                first, rejected_before = seen.pop(state)
+                period = repetition - first
+                periods = (node.repeat - repetition) // period
+                repetition += periods * period
+                played += periods * period * node.body_length
+                rejected_moves += periods * (rejected_moves - rejected_before)
+                # Fewer than a period of repetitions is left, played one by one
+                seen.clear()
+                continue
+
+            seen[state] = (repetition, rejected_moves)
+            for part in node.parts:
+                if play(part):
+                    return True
+            repetition += 1
+        return False
+
+    collided = play(program)
+    return rejected_moves, played if collided else None
+
+
+def advance_window(field: Field, car: Car, commands, start: int, stop: int) -> tuple[int, int]:
+    """Play commands [start, stop) on a car that cannot meet another one.
+
+    Return the number of rejected moves and of forward commands. A repeat tree is
+    never expanded.
+    """
+    if isinstance(commands, RepeatedCommands):
+        window = commands.window(start, stop)
+        rejected_moves, _ = play_program(field, car, window, count_rejected=_stats is not None)
+        return rejected_moves, window.count(b"F")
+
+    commands = bytes(commands[start:stop])
+    return advance_car(field, car, commands), commands.count(b"F")
+
+
+def command_prefix(commands, stop: int):
+    """The first `stop` commands, a repeat tree being kept unexpanded."""
+    if isinstance(commands, RepeatedCommands):
+        return commands.window(0, stop)
+    return bytes(commands[:stop])
+
+
+def execute_simulation_one_car_run_length(field: Field, car: Car) -> Car:
+    """Same result as execute_simulation_one_car, working on runs of commands.
+
+    Repeated commands are played with play_program: fast-forwarded in closed form,
+    or when rejected moves are counted for the stats or the field has obstacles,
+    one repetition at a time until the car's state repeats.
+    """
+    if stats := _stats:
+        started = time.perf_counter_ns()
+
+    commands = car.commands
+    if not isinstance(commands, RepeatedCommands):
+        commands = bytes(commands)
+        rejected_moves = advance_car(field, car, commands)
+    else:
+        rejected_moves, _ = play_program(field, car, commands, count_rejected=bool(stats))
+
+    if stats:
+        # The whole program of a single car counts as one step
+        stats.record_commands([commands], rejected_moves)
+        stats.record_step(time.perf_counter_ns() - started)
+        stats.finish()
+
     return car
 
 
-def execute_simulation_multiples_cars(field: Field, cars: list[Car]) -> str:
-    for step, _ in enumerate(max(map(lambda x: x.command_list, cars))):
-        for car in cars:
-            command = car.command_list[step]
-            if command == "F":
-                if car.is_move_valid_for_field(field):
-                    car.move()
-                    if other_car_id := car.collision_with_car(cars):
-                        return f"{other_car_id} {car.id}\n{car.x} {car.y}\n{step + 1}"
-            else:  # R or L
-                car.change_direction(command)
+def pick_occupancy_backend(field: Field, car_count: int) -> str:
+    """Occupancy backend for the fleet: dense on small crowded fields, sparse otherwise."""
+    cells = field.width * field.height
+    if cells <= MAX_DENSE_CELLS and cells <= DENSE_CELLS_PER_CAR * max(car_count, 1):
+        return "dense"
+    return "sparse"
+
+
+def build_occupancy(
+    field: Field, cars: list[Car], indices: Iterable[int] | None = None, dense: bool = False
+) -> dict[int, list[int]] | list[list[int] | None]:
+    """Map every occupied cell to the fleet indices of the cars standing on it, in fleet order.
+
+    Cells are keyed `x * height + y`. The dense index is a list over every cell of the
+    field, None where no car stands, the sparse one a dict of the occupied cells.
+    Only the cars at `indices` are placed, every car of the fleet by default.
+    """
+    height = field.height
+    occupancy = [None] * (field.width * height) if dense else {}
+    lookup = occupancy.__getitem__ if dense else occupancy.get
+    for index in range(len(cars)) if indices is None else indices:
+        car = cars[index]
+        key = car.x * height + car.y
+        if (cell := lookup(key)) is None:
+            occupancy[key] = [index]
+        else:
+            cell.append(index)
+
+    return occupancy
+
+
+def pick_bucket_size(field: Field, car_count: int) -> int:
+    """Bucket side giving most cars an empty neighbourhood, from the mean car spacing."""
+    spacing = math.sqrt(field.width * field.height / max(car_count, 1))
+    return int(spacing / BUCKET_SPACING_RATIO)
+
+
+def split_by_neighbourhood(cars: list[Car], bucket_size: int) -> tuple[list[int], list[int]]:
+    """Split the fleet indices into cars that have another car in their 3x3 buckets and the others.
+
+    Two cars in non-adjacent buckets are more than `bucket_size` cells apart, and as
+    each of them moves at most one cell per step they cannot meet during the next
+    `bucket_size // 2` steps.
+    """
+    buckets = {}
+    for car in cars:
+        key = (car.x // bucket_size, car.y // bucket_size)
+        buckets[key] = buckets.get(key, 0) + 1
+
+    crowded, isolated = [], []
+    for index, car in enumerate(cars):
+        bucket_x, bucket_y = car.x // bucket_size, car.y // bucket_size
+        neighbours = sum(
+            buckets.get((bucket_x + dx, bucket_y + dy), 0) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+        )
+        (crowded if neighbours > 1 else isolated).append(index)
+
+    return crowded, isolated
+
+
+def catch_up_isolated(
+    field: Field, cars: list[Car], isolated: list[int], mover: int, epoch_start: int, step: int
+) -> tuple[int, int]:
+    """Bring the isolated cars to where the fleet stopped, mid-epoch, on the car at `mover`.
+
+    Return the number of rejected moves and of moves played without a check.
+    """
+    rejected_moves = unchecked_moves = 0
+    for index in isolated:
+        # Cars after the mover have not played the colliding step
+        last_step = step + 1 if index < mover else step
+        rejected, forward = advance_window(
+            field, cars[index], cars[index].commands, epoch_start, last_step
+        )
+        rejected_moves += rejected
+        unchecked_moves += forward
+
+    return rejected_moves, unchecked_moves - rejected_moves
+
+
+def play_last_car(
+    field: Field,
+    cars: list[Car],
+    index: int,
+    occupancy: dict[int, list[int]] | list[list[int] | None],
+    step: int,
+    count_rejected: bool = True,
+) -> tuple[int, int | None, int | None]:
+    """Play the rest of the repeat tree of the car at `index`, the only one still moving.
+
+    Every other car stands on its cell of `occupancy` for good. Return the number of
+    rejected moves, then the number of commands played up to the first collision and
+    the fleet index of the car run into, or None twice without a collision.
+    """
+    car = cars[index]
+    height = field.height
+    occupied = occupancy.__getitem__ if isinstance(occupancy, list) else occupancy.get
+    occupant = None
+
+    def blocked(x: int, y: int) -> bool:
+        nonlocal occupant
+        for other in occupied(x * height + y) or ():
+            if other != index:
+                occupant = other
+                return True
+        return False
+
+    rejected_moves, played = play_program(
+        field, car, car.commands.window(step), blocked, count_rejected
+    )
+    return rejected_moves, played, occupant
+
+
+def record_fleet_stats(
+    stats: SimulationStats,
+    cars: list[Car],
+    steps: int,
+    rejected_moves: int,
+    unchecked_moves: int,
+    mover: int | None = None,
+):
+    """Count the commands of the steps played by the fleet and close the simulation.
+
+    When the simulation stopped on the car at `mover`, the cars after it have not
+    played the last step.
+    """
+    # One car at a time, repeat trees unexpanded
+    executed = (
+        command_prefix(car.commands, steps if mover is None or index <= mover else steps - 1)
+        for index, car in enumerate(cars)
+    )
+
+    moves = stats.moves
+    stats.record_commands(executed, rejected_moves)
+    # Every move outside isolated neighbourhoods looks its destination up
+    stats.collision_checks += stats.moves - moves - unchecked_moves
+    stats.finish()
+
+
+def execute_simulation_multiples_cars(
+    field: Field,
+    cars: Iterable[Car],
+    bucket_size: int | None = None,
+    first_step: int = 0,
+    backend: str | None = None,
+) -> str:
+    """Simulate the fleet step by step until the first collision.
+
+    Steps are numbered from `first_step`, the number of steps the fleet has already
+    played when resuming a simulation.
+
+    Collision checks are scheduled: the field is cut in buckets of `bucket_size`
+    cells (picked from the fleet density by default) and, for the next
+    `bucket_size // 2` steps, only cars with another car in a neighbouring bucket
+    can meet. Only those are tracked in the occupancy index, the others play the
+    whole epoch in one go without any check.
+
+    The occupancy index is `backend`, "dense" or "sparse" (see OCCUPANCY_BACKENDS),
+    picked from the field size and the number of cars by default.
+
+    Cars may have programs of different lengths. A car that has played all its
+    commands leaves the active set and stays in the occupancy index as a static
+    occupant, so the cost of a step only depends on the cars still moving. Once a
+    single car is left moving on a repeat tree, the rest of it is played by
+    play_program, so repetitions are skipped as soon as its path repeats.
+
+    Cars are tracked by their index in the fleet; their ids are only looked up to
+    write the output.
+    """
+    cars = list(cars)
+    stats = _stats
+    rejected_moves = unchecked_moves = 0
+    steps = max((len(car.commands) for car in cars), default=0)
+    backend = backend or pick_occupancy_backend(field, len(cars))
+    if backend not in OCCUPANCY_BACKENDS:
+        raise ValueError(f"Unknown occupancy backend {backend}")
+    # Emptied cells of the dense index keep their list, those of the sparse one are removed
+    dense = backend == "dense"
+    height = field.height
+    bucket_size = bucket_size or pick_bucket_size(field, len(cars))
+    # Sparse fleets are rescheduled every epoch, dense ones are checked on every move
+    scheduled = bucket_size >= MIN_BUCKET_SIZE
+    epoch = bucket_size // 2 if scheduled else max(steps, 1)
+
+    for epoch_start in range(0, steps, epoch):
+        epoch_end = min(epoch_start + epoch, steps)
+        # A single car left moving on a repeat tree is played alone against all the others
+        moving = [car for car in cars if len(car.commands) > epoch_start]
+        alone = len(moving) == 1 and isinstance(moving[0].commands, RepeatedCommands)
+        if scheduled and not alone:
+            crowded, isolated = split_by_neighbourhood(cars, bucket_size)
+        else:
+            crowded, isolated = range(len(cars)), []
+        occupancy = build_occupancy(field, cars, crowded, dense)
+        lookup = occupancy.__getitem__ if dense else occupancy.get
+        # Moving cars, in fleet order, and the step at which each of the others stops
+        active = {}
+        finishing = {}
+        for index in crowded:
+            car = cars[index]
+            if (length := len(car.commands)) > epoch_start:
+                active[index] = car
+                if length < epoch_end:
+                    finishing.setdefault(length, []).append(index)
+
+        for step in range(epoch_start, epoch_end):
+            if stats:
+                started = time.perf_counter_ns()
+            for index in finishing.pop(step, ()):
+                del active[index]
+            if (
+                len(active) == 1
+                and not isolated
+                and isinstance((car := next(iter(active.values()))).commands, RepeatedCommands)
+            ):
+                index = next(iter(active))
+                rejected, played, occupant = play_last_car(
+                    field, cars, index, occupancy, step, count_rejected=bool(stats)
+                )
+                rejected_moves += rejected
+                if stats:
+                    # The rest of the last car's program counts as one step
+                    stats.record_step(time.perf_counter_ns() - started)
+                    if played is None:
+                        record_fleet_stats(stats, cars, steps, rejected_moves, unchecked_moves)
+                    else:
+                        record_fleet_stats(
+                            stats, cars, step + played, rejected_moves, unchecked_moves, index
+                        )
+                if played is None:
+                    return "no collision"
+                return (
+                    f"{cars[occupant].id} {car.id}\n{car.x} {car.y}\n{first_step + step + played}"
+                )
+
+            for index, car in active.items():
+                command = car.commands[step]
+                if command == FORWARD:
+                    if car.is_move_valid_for_field(field):
+                        # Leave the current cell, then look the destination up in O(1)
+                        key = car.x * height + car.y
+                        cell = occupancy[key]
+                        if dense or len(cell) > 1:
+                            cell.remove(index)
+                        else:
+                            del occupancy[key]
+
+                        car.move()
+                        key = car.x * height + car.y
+                        if others := lookup(key):
+                            rejected, unchecked = catch_up_isolated(
+                                field, cars, isolated, index, epoch_start, step
+                            )
+                            rejected_moves += rejected
+                            unchecked_moves += unchecked
+                            if stats:
+                                stats.record_step(time.perf_counter_ns() - started)
+                                record_fleet_stats(
+                                    stats, cars, step + 1, rejected_moves, unchecked_moves, index
+                                )
+                            return (
+                                f"{cars[others[0]].id} {car.id}\n"
+                                f"{car.x} {car.y}\n{first_step + step + 1}"
+                            )
+                        if others is None:
+                            occupancy[key] = [index]
+                        else:
+                            others.append(index)
+                    else:
+                        rejected_moves += 1
+                else:  # R or L
+                    car.change_direction(command)
+
+            if stats:
+                stats.record_step(time.perf_counter_ns() - started)
+
+        for index in isolated:
+            car = cars[index]
+            if len(car.commands) <= epoch_start:
+                continue
+            rejected, forward = advance_window(field, car, car.commands, epoch_start, epoch_end)
+            rejected_moves += rejected
+            if stats:
+                unchecked_moves += forward - rejected
+
+    if stats:
+        record_fleet_stats(stats, cars, steps, rejected_moves, unchecked_moves)
 
     return "no collision"
+
+
+def run_simulation(field: Field, cars: Iterable[Car]) -> str:
+    """Run the simulation that fits the fleet and return its output."""
+    # Cars may be streamed, so only look ahead far enough to pick the mode
+    cars = iter(cars)
+    first_car = next(cars)
+    second_car = next(cars, None)
+
+    if second_car is None:
+        return format(execute_simulation_one_car_run_length(field, first_car))
+    else:
+        return execute_simulation_multiples_cars(field, chain([first_car, second_car], cars))
@@ -0,0 +1,211 @@
+"""Columnar export of the trajectories of a simulation.
+
+An export is a directory of .npy files, one per column:
+
+- `ids.npy`: the car ids, in fleet order;
+- `x.npy` and `y.npy` (int64) and `heading.npy` (uint8, 0-3 for N, E, S, W): the
+  state of every car after every step, one row per step and one column per car.
+  Row 0 holds the starting state.
+
+Rows are buffered and written CHUNK_POSITIONS positions at a time while the
+simulation runs, so memory does not grow with the length of the run. A .npy header
+holds the number of rows: it is written with a fixed size and rewritten in place
+after every chunk, so the files always hold the rows written so far. A simulation
+stops on its first collision; on the last row the cars after the mover have not
+played the colliding step.
+"""
+
+import argparse
+import os
+import struct
+from collections.abc import Iterable
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from src.binary import is_binary_scenario, load_scenario
+from src.parser import ScenarioError, ScenarioParser, parse_part1, parse_part2_stream
+from src.schemas import Car, Field
+from src.trajectories import execute_simulation_multiples_cars_trajectories
+
+# (step, car) positions buffered before a chunk is written
+CHUNK_POSITIONS = 1 << 20
+# Size of the .npy headers, large enough for any shape, a multiple of 64 like numpy's
+HEADER_SIZE = 128
+COLUMNS = {"x": np.int64, "y": np.int64, "heading": np.uint8}
+
+
+def npy_header(dtype, shape: tuple[int, ...]) -> bytes:
+    """Version 1.0 .npy header of HEADER_SIZE bytes, so it can be rewritten in place."""
+    header = repr(
+        {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            "fortran_order": False,
+            "shape": shape,
+        }
+    ).encode("latin1")
+    prefix = np.lib.format.MAGIC_PREFIX + bytes((1, 0)) + struct.pack("<H", HEADER_SIZE - 10)
+    return prefix + header.ljust(HEADER_SIZE - len(prefix) - 1) + b"\n"
+
+
+class TrajectoryWriter:
+    """Write the states of a fleet to an export directory, a chunk of rows at a time.
+
+    Record windows of rows with `record`, then call `close`, or use the writer as
+    a context manager.
+    """
+
+    def __init__(self, directory, ids: list[str], chunk_rows: int | None = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.cars = len(ids)
+        self.chunk_rows = chunk_rows or max(1, CHUNK_POSITIONS // max(self.cars, 1))
+        # Rows written to the files, and rows waiting in the buffers
+        self.rows = self.pending = 0
+        self.started = False
+
+        np.save(self.directory / "ids.npy", np.array(ids, dtype=str))
+        self.buffers = {
+            name: np.empty((self.chunk_rows, self.cars), dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        self.streams = {}
+        # Streams already open are closed if the next one fails
+        with ExitStack() as stack:
+            for name, dtype in COLUMNS.items():
+                stream = stack.enter_context(open(self.directory / f"{name}.npy", "wb"))
+                stream.write(npy_header(dtype, (0, self.cars)))
+                self.streams[name] = stream
+            self.stack = stack.pop_all()
+
+    def record(self, start: int, xs: np.ndarray, ys: np.ndarray, headings: np.ndarray):
+        """Record the states `xs[row, car]`..., of every car after step start + row.
+
+        Row 0 is the state the window starts from: only the first call records it,
+        as the starting state.
+        """
+        first = 1 if self.started else 0
+        self.started = True
+        columns = {"x": xs[first:], "y": ys[first:], "heading": headings[first:]}
+
+        position = 0
+        while position < len(xs) - first:
+            count = min(self.chunk_rows - self.pending, len(xs) - first - position)
+            for name, rows in columns.items():
+                self.buffers[name][self.pending : self.pending + count] = rows[
+                    position : position + count
+                ]
+            self.pending += count
+            position += count
+            if self.pending == self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        """Write the buffered rows and update the headers."""
+        if not self.pending:
+            return
+        self.rows += self.pending
+        for name, stream in self.streams.items():
+            stream.write(self.buffers[name][: self.pending].tobytes())
+            stream.seek(0)
+            stream.write(npy_header(COLUMNS[name], (self.rows, self.cars)))
+            stream.seek(0, os.SEEK_END)
+            stream.flush()
+        self.pending = 0
+
+    def close(self):
+        with self.stack:
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@dataclass(slots=True)
+class Trajectories:
+    """An export read back, its columns memory-mapped."""
+
+    ids: list[str]
+    x: np.ndarray
+    y: np.ndarray
+    heading: np.ndarray
+
+    @property
+    def steps(self) -> int:
+        """Number of steps played, the first row being the starting state."""
+        return len(self.x) - 1
+
+    def car(self, car_id: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The (x, y, heading) columns of a car, as views over the mapped files."""
+        index = self.ids.index(car_id)
+        return self.x[:, index], self.y[:, index], self.heading[:, index]
+
+
+def load_trajectories(directory) -> Trajectories:
+    """Memory-map an export: rows are only read from disk when accessed."""
+    directory = Path(directory)
+    return Trajectories(
+        np.load(directory / "ids.npy").tolist(),
+        *(np.load(directory / f"{name}.npy", mmap_mode="r") for name in COLUMNS),
+    )
+
+
+def export_simulation(
+    field: Field, cars: Iterable[Car], directory, chunk_rows: int | None = None
+) -> str:
+    """Run the simulation and export the trajectories of its cars to `directory`.
+
+    Return the output run_simulation would.
+    """
+    cars = list(cars)
+    with TrajectoryWriter(directory, [car.id for car in cars], chunk_rows) as writer:
+        result = execute_simulation_multiples_cars_trajectories(field, cars, export=writer)
+
+    return format(cars[0]) if len(cars) == 1 else result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto Driving Car Simulation - trajectory export")
+    parser.add_argument("input", help="Input in the text format or binary scenario")
+    parser.add_argument("output", help="Directory to write the columns to")
+    parser.add_argument(
+        "-p",
+        "--part",
+        type=int,
+        choices=[1, 2],
+        required=True,
+        help="Define the functioning mode: 1 or 2",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=None,
+        help="Steps written at a time, about 1M positions by default",
+    )
+
+    args = parser.parse_args()
+
+    if args.chunk_rows is not None and args.chunk_rows <= 0:
+        parser.error("The chunk size must be positive")
+    try:
+        if is_binary_scenario(args.input):
+            field, cars = load_scenario(args.input)
+        elif args.part == 1:
+            with open(args.input) as stream:
+                field, cars = parse_part1(ScenarioParser(), stream.read().strip("\n"))
+        else:
+            with open(args.input) as stream:
+                field, cars = parse_part2_stream(ScenarioParser(), stream)
+                cars = list(cars)
+    except (OSError, ValueError, ScenarioError) as error:
+        parser.error(str(error))
+    print(export_simulation(field, cars, args.output, args.chunk_rows))
+
+
+if __name__ == "__main__":
+    main()
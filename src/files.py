@@ -0,0 +1,27 @@
+"""Files replaced atomically: readers see the old content or the new one, never a partial write."""
+
+import os
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path) -> Iterator[str]:
+    """Yield a temporary path next to `path`, moved over `path` once the block has written it.
+
+    The data is flushed to disk before the move, so a crash leaves either file in
+    place. The temporary file is removed if the block raises.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(descriptor)
+    try:
+        yield temporary
+        with open(temporary, "rb") as stream:
+            os.fsync(stream.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
@@ -0,0 +1,75 @@
+import math
+import random
+from string import ascii_uppercase
+
+from src.schemas import DIRECTIONS, Car, Field
+
+
+def car_ids(count: int) -> list[str]:
+    """Spreadsheet-style ids: A to Z, then AA, AB and so on."""
+    ids = []
+    for index in range(count):
+        name = ""
+        index += 1
+        while index:
+            index, remainder = divmod(index - 1, len(ascii_uppercase))
+            name = ascii_uppercase[remainder] + name
+        ids.append(name)
+
+    return ids
+
+
+def generate_scenario(
+    seed: int = 0,
+    width: int = 100,
+    height: int = 100,
+    cars: int = 10,
+    commands: int = 100,
+    density: float | None = None,
+    forward_ratio: float = 0.6,
+) -> tuple[Field, list[Car]]:
+    """Build a reproducible random scenario.
+
+    Cars start on distinct cells. By default they are spread over the whole field;
+    with `density` they are packed in a centered square where that fraction of the
+    cells hold a car, which makes collisions more likely as the density grows.
+    """
+    if density is None:
+        area_width, area_height = width, height
+    elif 0 < density <= 1:
+        side = math.ceil(math.sqrt(cars / density))
+        area_width, area_height = min(side, width), min(side, height)
+    else:
+        raise ValueError("The density must be in (0, 1]")
+    if cars > area_width * area_height:
+        raise ValueError("Too many cars for the field")
+
+    rng = random.Random(seed)
+    left = (width - area_width) // 2
+    bottom = (height - area_height) // 2
+    turn_ratio = (1 - forward_ratio) / 2
+    fleet = []
+    for car_id, cell in zip(
+        car_ids(cars), rng.sample(range(area_width * area_height), cars), strict=True
+    ):
+        command_list = rng.choices(b"FRL", [forward_ratio, turn_ratio, turn_ratio], k=commands)
+        fleet.append(
+            Car(
+                id=car_id,
+                x=left + cell % area_width,
+                y=bottom + cell // area_width,
+                direction=rng.randrange(len(DIRECTIONS)),
+                command_list=bytes(command_list),
+            )
+        )
+
+    return Field(width=width, height=height), fleet
+
+
+def format_scenario(field: Field, cars: list[Car]) -> str:
+    """Write a scenario in the text input format (Part 2)."""
+    lines = [format(field)]
+    for car in cars:
+        lines += ["", car.id, format(car), bytes(car.commands).decode("ascii")]
+
+    return "\n".join(lines)
@@ -0,0 +1,159 @@
+"""Collision checks of candidate cars against a fleet simulated once.
+
+A candidate is appended last to the fleet: on every step the whole fleet has
+moved before it. Nothing in the fleet depends on the candidate until it collides,
+so the fleet's stays (see src.visits) are computed once and each candidate only
+looks its own trajectory up in them:
+
+- before the candidate moves, a fleet car arriving on its cell at that step runs
+  into it;
+- the candidate runs into any fleet car standing on its destination after the step.
+
+The fleet's own first collision ends every simulation, so a candidate is never
+played beyond it.
+"""
+
+import numpy as np
+
+from src.schemas import Car, Field
+from src.trajectories import WINDOW_POSITIONS, compute_trajectories
+from src.visits import build_visit_index
+
+# First window of candidate steps looked up at once, doubled up to WINDOW_POSITIONS
+FIRST_WINDOW = 16
+
+
+class FleetCache:
+    """A fleet simulated once, against which candidate cars are checked."""
+
+    def __init__(self, field: Field, cars: list[Car]):
+        if not cars:
+            raise ValueError("The fleet must have at least one car")
+        self.field = field
+        # The cars given are left untouched
+        fleet = [car.copy() for car in cars]
+        self.result, self.visits = build_visit_index(field, fleet)
+        self.indices = {car.id: index for index, car in enumerate(fleet)}
+
+        # Steps after which nothing moves in the fleet any more
+        self.steps = self.visits.steps
+        if self.result == "no collision":
+            self.mover = None
+        else:
+            self.mover = self.indices[self.result.split("\n", 1)[0].split()[1]]
+
+        # Stays sorted by (cell rank, arrive) as a single key, and the latest leave of
+        # the stays of the same cell up to each one, which tells if a cell is occupied
+        visits = self.visits
+        self.scale = self.steps + 2
+        base = np.repeat(
+            np.arange(len(visits.cells), dtype=np.int64) * self.scale, np.diff(visits.offsets)
+        )
+        self.keys = base + visits.arrive
+        self.cover = np.maximum.accumulate(base + visits.leave) - base
+
+    def check(self, car: Car) -> str:
+        """Return the output of the simulation of the fleet with `car` appended last.
+
+        `car` is left untouched.
+        """
+        if car.id in self.indices:
+            raise ValueError(f"Duplicate car ID {car.id}")
+
+        # The candidate moves until its commands run out, or until the step before
+        # the fleet's collision: on that one the fleet stops before the candidate plays
+        moving = len(car.commands)
+        if self.mover is not None:
+            moving = min(moving, self.steps - 1)
+
+        height = self.field.height
+        x, y, heading = (np.array([value], dtype=np.int64) for value in (car.x, car.y, car.heading))
+        start, window = 0, FIRST_WINDOW
+        while start < moving:
+            stop = min(start + window, moving)
+            codes = np.frombuffer(bytes(car.commands[start:stop]), dtype=np.uint8)
+            xs, ys, headings = compute_trajectories(self.field, x, y, heading, codes[:, None])
+            cells = (xs * height + ys)[:, 0]
+            steps = np.arange(start + 1, stop + 1, dtype=np.int64)
+
+            # A fleet car arriving on the candidate's cell moves before the candidate does
+            struck = self.arrivals(cells[:-1], steps)
+            moved = np.flatnonzero(cells[1:] != cells[:-1])
+            occupied = moved[self.occupied(cells[1:][moved], steps[moved])]
+            if struck.size and (not occupied.size or struck[0] <= occupied[0]):
+                return self.struck_output(car, int(cells[struck[0]]), int(steps[struck[0]]) - 1)
+            if occupied.size:
+                step, cell = int(steps[occupied[0]]), int(cells[occupied[0] + 1])
+                occupant = self.visits.ids[self.occupant(cell, step)]
+                return f"{occupant} {car.id}\n{cell // height} {cell % height}\n{step}"
+
+            x, y, heading = xs[-1], ys[-1], headings[-1]
+            start = stop
+            window = min(2 * window, WINDOW_POSITIONS)
+
+        # The candidate now stands still while the fleet keeps moving
+        return self.struck_output(car, int(x[0]) * height + int(y[0]), moving)
+
+    def struck_output(self, car: Car, cell: int, after: int) -> str:
+        """Output once the candidate stands on `cell` from step `after` on.
+
+        The first fleet car arriving there runs into it, unless the fleet collides first.
+        """
+        stays = self.stays(cell)
+        arrive, cars = self.visits.arrive[stays], self.visits.car[stays]
+        arriving = arrive > after
+        if self.mover is not None:
+            # On the fleet's colliding step, only the cars before its mover have moved
+            arriving &= (arrive < self.steps) | (cars < self.mover)
+        # Stays of a cell are sorted by arrival, then fleet order
+        first = np.flatnonzero(arriving)
+        if not first.size:
+            return self.result
+
+        height = self.field.height
+        mover = self.visits.ids[int(cars[first[0]])]
+        return f"{car.id} {mover}\n{cell // height} {cell % height}\n{int(arrive[first[0]])}"
+
+    def ranks(self, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Rank of every cell among the cells visited by the fleet, and whether it was visited."""
+        ranks = np.searchsorted(self.visits.cells, cells)
+        visited = np.zeros(len(cells), dtype=bool)
+        inside = ranks < len(self.visits.cells)
+        visited[inside] = self.visits.cells[ranks[inside]] == cells[inside]
+        return ranks, visited
+
+    def arrivals(self, cells: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        """Positions i where a fleet car arrives on `cells[i]` during `steps[i]`."""
+        ranks, visited = self.ranks(cells)
+        # No fleet car arrives anywhere after the fleet's last step
+        visited &= steps <= self.steps
+        keys = ranks * self.scale + steps
+        found = np.searchsorted(self.keys, keys)
+        hit = visited & (found < len(self.keys))
+        hit[hit] = self.keys[found[hit]] == keys[hit]
+        return np.flatnonzero(hit)
+
+    def occupied(self, cells: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        """Whether a fleet car stands on `cells[i]` after `steps[i]`."""
+        ranks, visited = self.ranks(cells)
+        # Beyond the fleet's last step, the stays still open are those that never end
+        steps = np.minimum(steps, self.steps)
+        last = np.searchsorted(self.keys, ranks * self.scale + steps, "right") - 1
+        hit = visited & (last >= self.visits.offsets[np.minimum(ranks, len(self.visits.cells))])
+        hit[hit] = self.cover[last[hit]] > steps[hit]
+        return hit
+
+    def occupant(self, cell: int, step: int) -> int:
+        """Fleet index of the first car standing on `cell` after `step`."""
+        stays = self.stays(cell)
+        step = min(step, self.steps)
+        covering = stays[(self.visits.arrive[stays] <= step) & (self.visits.leave[stays] > step)]
+        return int(self.visits.car[covering].min())
+
+    def stays(self, cell: int) -> np.ndarray:
+        """Positions of the stays on `cell`."""
+        ranks, visited = self.ranks(np.array([cell], dtype=np.int64))
+        if not visited[0]:
+            return np.empty(0, dtype=np.int64)
+        rank = int(ranks[0])
+        return np.arange(self.visits.offsets[rank], self.visits.offsets[rank + 1])
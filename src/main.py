@@ -1,13 +1,27 @@
-from src.execute import execute_simulation_multiples_cars, execute_simulation_one_car
+import sys
+
+from src.cache import get_cache, scenario_key
+from src.execute import get_stats, run_simulation
 from src.parser import parse_args
 
 
 def main():
     field, cars = parse_args()
 
-    if len(cars) == 1:
-        car = execute_simulation_one_car(field, cars[0])
-        print(format(car))
+    if cache := get_cache():
+        cars = list(cars)
+        key = scenario_key(field, cars)
+        result = cache.get(key)
+        if result is None:
+            result = run_simulation(field, cars)
+            cache.put(key, result)
+        # The lookup does not wait for the lock, its count may still be unsaved
+        cache.save()
     else:
-        result = execute_simulation_multiples_cars(field, cars)
-        print(result)
+        result = run_simulation(field, cars)
+    print(result)
+
+    if stats := get_stats():
+        print(format(stats), file=sys.stderr)
+        if cache:
+            print(format(cache), file=sys.stderr)
@@ -0,0 +1,153 @@
+"""Static obstacles: cells of the field no car can move onto.
+
+Obstacles are declared as rectangles and never expanded cell by cell. Up to
+DENSE_BYTES, they are stored as a packed bitmap with one bit per cell, so a lookup
+is a byte index and a shift. On larger fields the rectangles are kept in a sparse
+grid of buckets, each listing the few rectangles overlapping it, and a lookup only
+tests those. Either way a move is checked in O(1).
+"""
+
+from collections.abc import Iterable
+
+import numpy as np
+
+from src.schemas import DX, DY
+
+# Largest bitmap kept, larger fields use the sparse buckets
+DENSE_BYTES = 1 << 24
+# Buckets are 2**shift cells wide, the shift is raised until the rectangles are
+# registered in at most this many buckets each on average
+BUCKETS_PER_RECTANGLE = 4
+MIN_BUCKET_SHIFT = 6
+# Forward runs longer than this are first tested against the rectangles as a whole
+SCAN_LIMIT = 64
+
+
+class Obstacles:
+    """Blocked cells of a `width` x `height` field, given as (x0, y0, x1, y1) rectangles.
+
+    Both corners of a rectangle are blocked. In the bitmap, each column of the field
+    is padded to whole bytes: (x, y) is bit y % 8 of byte x * stride + y // 8.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        rectangles: Iterable[tuple[int, int, int, int]],
+        dense: bool | None = None,
+    ):
+        self.width = width
+        self.height = height
+        self.rectangles = [tuple(rectangle) for rectangle in rectangles]
+        for x0, y0, x1, y1 in self.rectangles:
+            if not (0 <= x0 <= x1 < width and 0 <= y0 <= y1 < height):
+                raise ValueError(f"Obstacle {x0} {y0} {x1} {y1} is not a rectangle in the field")
+        self.boxes = np.array(self.rectangles, dtype=np.int64).reshape(-1, 4)
+        self.stride = (height + 7) // 8
+        if dense is None:
+            dense = width * self.stride <= DENSE_BYTES
+
+        self.bits = self.buckets = None
+        self.shift = 0
+        if dense:
+            self.bits = self.pack()
+        else:
+            self.shift, self.buckets = self.bucket()
+
+    def pack(self) -> bytes:
+        """Packed bitmap of the blocked cells, filled a rectangle at a time."""
+        grid = np.zeros((self.width, self.stride), dtype=np.uint8)
+        column = np.zeros(self.stride * 8, dtype=bool)
+        for x0, y0, x1, y1 in self.rectangles:
+            # Every column of a rectangle holds the same bits
+            column[:] = False
+            column[y0 : y1 + 1] = True
+            grid[x0 : x1 + 1] |= np.packbits(column, bitorder="little")
+
+        return grid.tobytes()
+
+    def bucket(self) -> tuple[int, dict[tuple[int, int], list[tuple[int, int, int, int]]]]:
+        """Pick the bucket shift and list the rectangles overlapping every bucket."""
+        boxes = self.boxes
+        shift = MIN_BUCKET_SHIFT
+        while shift < 63:
+            spans = (boxes[:, 2:] >> shift) - (boxes[:, :2] >> shift) + 1
+            if int(spans.prod(axis=1).sum()) <= BUCKETS_PER_RECTANGLE * max(len(boxes), 1):
+                break
+            shift += 1
+
+        buckets = {}
+        for rectangle in self.rectangles:
+            x0, y0, x1, y1 = rectangle
+            for bucket_x in range(x0 >> shift, (x1 >> shift) + 1):
+                for bucket_y in range(y0 >> shift, (y1 >> shift) + 1):
+                    buckets.setdefault((bucket_x, bucket_y), []).append(rectangle)
+
+        return shift, buckets
+
+    def blocked(self, x: int, y: int) -> bool:
+        """Whether (x, y), a cell of the field, is blocked."""
+        if (bits := self.bits) is not None:
+            return (bits[x * self.stride + (y >> 3)] >> (y & 7)) & 1 == 1
+        for x0, y0, x1, y1 in self.buckets.get((x >> self.shift, y >> self.shift), ()):
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                return True
+        return False
+
+    def blocked_cells(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Vectorised `blocked` over arrays of cells of the field."""
+        if self.bits is not None:
+            bits = np.frombuffer(self.bits, dtype=np.uint8)
+            return ((bits[x * self.stride + (y >> 3)] >> (y & 7)) & 1).astype(bool)
+
+        blocked = np.zeros(np.shape(x), dtype=bool)
+        for x0, y0, x1, y1 in self.rectangles:
+            blocked |= (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+        return blocked
+
+    def overlaps(self, x0: int, y0: int, x1: int, y1: int) -> bool:
+        """Whether any cell of the rectangle with corners (x0, y0) and (x1, y1) is blocked."""
+        boxes = self.boxes
+        return bool(
+            np.any(
+                (boxes[:, 0] <= x1)
+                & (boxes[:, 2] >= x0)
+                & (boxes[:, 1] <= y1)
+                & (boxes[:, 3] >= y0)
+            )
+        )
+
+    def free_run(self, x: int, y: int, direction: int, steps: int) -> int:
+        """How many of `steps` forward moves from (x, y) are played before an edge or an obstacle."""
+        dx, dy = DX[direction], DY[direction]
+        if dx:
+            room = self.width - 1 - x if dx > 0 else x
+        else:
+            room = self.height - 1 - y if dy > 0 else y
+        steps = min(steps, room)
+        if steps > SCAN_LIMIT:
+            end_x, end_y = x + dx * steps, y + dy * steps
+            if not self.overlaps(min(x, end_x), min(y, end_y), max(x, end_x), max(y, end_y)):
+                return steps
+
+        for moves in range(steps):
+            x += dx
+            y += dy
+            if self.blocked(x, y):
+                return moves
+        return steps
+
+    def __eq__(self, other):
+        if not isinstance(other, Obstacles):
+            return NotImplemented
+        return (self.width, self.height, self.rectangles) == (
+            other.width,
+            other.height,
+            other.rectangles,
+        )
+
+    def __repr__(self):
+        return (
+            f"Obstacles(width={self.width}, height={self.height}, rectangles={self.rectangles!r})"
+        )
@@ -1,8 +1,49 @@
 import argparse
-import string
-
+import re
+import sys
+from collections.abc import Iterable, Iterator
+from itertools import chain, islice
+
+from src.binary import is_binary_scenario, load_scenario
+from src.cache import DEFAULT_CACHE_SIZE, enable_cache
+from src.execute import enable_stats
+from src.obstacles import Obstacles
+from src.repeat import ProgramError, RepeatedCommands, parse_plain, parse_program
 from src.schemas import Car, Field
 
+# Car ids are words, written back as is in the collision output
+CAR_ID = re.compile(r"[A-Za-z0-9_-]+")
+INVALID_CAR_ID = re.compile(r"[^A-Za-z0-9_-]")
+TOKEN = re.compile(r"\S+")
+START_POSITION_FORMAT = "Start Position must have the format => x y direction, where x, y are int and direction one of N, W, S, E"
+OBSTACLE_FORMAT = "Obstacles must have the format => x0 y0 x1 y1, the int corners of a rectangle"
+# Errors listed when a Part 2 input is rejected, the others are only counted
+MAX_ERRORS = 20
+READ_BLOCK_SIZE = 1 << 20
+
+
+class ScenarioError(Exception):
+    """Raised by ScenarioParser when an input cannot be parsed."""
+
+
+class InputError(ValueError):
+    """Error found by the tokenizer, at `column` (from 1) of the line."""
+
+    def __init__(self, message: str, column: int = 1):
+        super().__init__(message)
+        self.column = column
+
+
+class ScenarioParser:
+    """Stand-in for the argparse parser that raises instead of exiting.
+
+    Used when many inputs are parsed in the same process and a bad one must not
+    stop the others.
+    """
+
+    def error(self, message):
+        raise ScenarioError(message)
+
 
 def parse_args():
     part1_instructions = """
@@ -10,6 +51,8 @@ def parse_args():
         The fist line indicates the width and height of the field. 
         The second line indicates the current position and facing direction of the car. 
         The last line shows the subsequent commands it will execute. 
+        Obstacles may be declared between the first two lines, one rectangle of
+        blocked cells per line (x0 y0 x1 y1, both corners included).
 
         For example:
         10 10
@@ -19,10 +62,12 @@ def parse_args():
 
     part2_instructions = """
         Your input must consist of field dimensions followed by multiple car definitions.
-        The first line indicates the width and height of the field.
+        The first line indicates the width and height of the field, optionally followed
+        by obstacles, one rectangle of blocked cells per line (x0 y0 x1 y1, both
+        corners included).
         Then, for each car, you need to provide:
         - A blank line
-        - The car's identifier (a single letter)
+        - The car's identifier (letters, digits, _ or -)
         - The car's starting position and direction (x y direction)
         - The car's command sequence
         
@@ -40,6 +85,12 @@ def parse_args():
 
     parser = argparse.ArgumentParser(description="Auto Driving Car Simulation")
     parser.add_argument("text", nargs="?", default=None, help="Input text")
+    parser.add_argument(
+        "-i",
+        "--input",
+        default=None,
+        help="Read the input from a file instead of the command line, - for stdin",
+    )
     parser.add_argument(
         "-p",
         "--part",
@@ -49,8 +100,53 @@ def parse_args():
         help="Define the functioning mode: 1 or 2",
     )
 
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Collect simulation counters and print them on stderr",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="DIR",
+        default=None,
+        help="Look results up in an on-disk cache, shared by every run using DIR",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help="Bytes of results kept in the cache, least recently used evicted first",
+    )
+
     args = parser.parse_args()
 
+    if args.stats:
+        enable_stats()
+
+    if args.cache_size <= 0:
+        parser.error("The cache size must be positive")
+    if args.cache is not None:
+        try:
+            enable_cache(args.cache, args.cache_size)
+        except OSError as error:
+            parser.error(f"Cannot use the cache directory: {error}")
+
+    if args.text is not None and args.input is not None:
+        parser.error("Provide the input either as text or with --input, not both")
+
+    if args.input is not None:
+        if args.input != "-" and is_binary_scenario(args.input):
+            try:
+                return load_scenario(args.input)
+            except ValueError as error:
+                parser.error(str(error))
+
+        if args.part == 1:
+            lines = read_input_lines(parser, args.input)
+            return parse_part1(parser, "".join(lines).rstrip("\n"))
+        else:
+            return parse_part2_stream(parser, read_input_lines(parser, args.input, binary=True))
+
     if args.text is None:
         if args.part == 1:
             parser.error(part1_instructions)
@@ -63,15 +159,62 @@ def parse_args():
         return parse_part2(parser, args.text)
 
 
+def read_input_lines(parser, path: str, binary: bool = False) -> Iterator[str | bytes]:
+    """Open the input file, or stdin for -, and yield its lines as they are read.
+
+    In `binary` mode the lines are bytes, without their line feed, read in large
+    blocks: a line of commands is never decoded and costs a single copy.
+    """
+    if path == "-":
+        if binary and hasattr(sys.stdin, "buffer"):
+            return split_lines(sys.stdin.buffer)
+        return iter(sys.stdin)
+
+    def lines():
+        with open(path, "rb" if binary else "r") as stream:
+            yield  # opened
+            yield from split_lines(stream) if binary else stream
+
+    # Started right away, so the file is opened, or fails to, before any line is read
+    reader = lines()
+    try:
+        next(reader)
+    except OSError as error:
+        parser.error(f"Cannot read the input file: {error}")
+
+    return reader
+
+
+def split_lines(stream, block_size: int = READ_BLOCK_SIZE) -> Iterator[bytes]:
+    """Yield the lines of a binary stream, read `block_size` bytes at a time."""
+    pending = []
+    while block := stream.read(block_size):
+        if block.find(b"\n") < 0:
+            # Inside a long line, which is copied only once, when it ends
+            pending.append(block)
+            continue
+        lines = block.split(b"\n")
+        pending.append(lines[0])
+        yield b"".join(pending)
+        yield from lines[1:-1]
+        pending = [lines[-1]]
+
+    if last := b"".join(pending):
+        yield last
+
+
 def parse_part1(parser, text):
     """Parse input for Part 1 with a single car."""
-    dimensions, start_position, commands = parse_lines(parser, text)
+    dimensions, obstacles, start_position, commands = parse_lines(parser, text)
     width, height = parse_dimensions(parser, dimensions)
     x, y, direction = parse_start_position(parser, start_position)
     command_list = parse_commands(parser, commands)
     check_starting_conditions(parser, width, height, x, y)
+    obstacles = parse_obstacles(parser, obstacles, width, height)
+    if obstacles is not None and obstacles.blocked(x, y):
+        parser.error("The starting position is on an obstacle")
 
-    field = Field(width=width, height=height)
+    field = Field(width=width, height=height, obstacles=obstacles)
     car = Car(id="A", x=x, y=y, direction=direction, command_list=command_list)
 
     return field, [car]
@@ -79,48 +222,258 @@ def parse_part1(parser, text):
 
 def parse_part2(parser, text):
     """Parse input for Part 2 with multiple cars."""
+    field, cars = parse_part2_stream(parser, iter(text.rstrip().split("\n")))
+    return field, list(cars)
+
+
+def parse_part2_stream(parser, lines: Iterable[str | bytes]) -> tuple[Field, Iterator[Car]]:
+    """Parse the field of a Part 2 input and return a generator over its cars.
+
+    Cars are only read from `lines` as the generator is consumed, so the input is
+    never held in memory as a whole. Lines may be str or bytes. The lines between the
+    dimensions and the first blank line declare the obstacles.
+    """
+    lines = iter(lines)
+    # Parse field dimensions from the first non-blank line
+    number = 0
+    dimensions = ""
+    for number, dimensions in enumerate(lines, start=1):
+        if dimensions.strip():
+            break
     try:
-        lines = text.strip().split("\n")
+        width, height = tokenize_dimensions(decode_line(dimensions))
+    except InputError as error:
+        parser.error(f"line {max(number, 1)}, column {error.column}: {error}")
+
+    rectangles = []
+    errors = []
+    separator = None
+    line_number = number
+    for line_number, line in enumerate(lines, start=number + 1):
+        if not line.strip():
+            separator = line
+            break
+        try:
+            rectangles.append(tokenize_obstacle(decode_line(line), width, height))
+        except InputError as error:
+            errors.append(f"line {line_number}, column {error.column}: {error}")
+    else:
+        line_number += 1
+    # Line of the separator, where the first car definition starts
+    number = line_number
+    if errors:
+        # Cars cannot be checked against obstacles that are not known
+        parser.error("\n".join(errors[:MAX_ERRORS]))
+    obstacles = Obstacles(width, height, rectangles) if rectangles else None
+    field = Field(width=width, height=height, obstacles=obstacles)
+
+    if separator is not None:
+        lines = chain([separator], lines)
+    return field, iter_cars(parser, lines, width, height, first_line=number, obstacles=obstacles)
+
+
+def iter_cars(
+    parser,
+    lines: Iterator[str | bytes],
+    width: int,
+    height: int,
+    first_line: int = 1,
+    obstacles: Obstacles | None = None,
+) -> Iterator[Car]:
+    """Yield the cars of a Part 2 input, reading their definitions four lines at a time.
+
+    `first_line` is the number of the first line of `lines` in the input. The input
+    is validated in a single pass: every error is collected with its line and column,
+    no car is yielded after the first one, and all of them are reported together
+    once the input is read.
+    """
+    errors = []
+    error_count = 0
+
+    def record(number, error):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_ERRORS:
+            errors.append(f"line {number}, column {error.column}: {error}")
+
+    # Index of every car by id: ids are only kept to spot duplicates, the engines
+    # track cars by their position in the fleet
+    indices = {}
+    number = first_line
+    lines = iter(lines)
+    # Each car definition should be 4 lines:
+    # Empty line, ID, position, commands
+    while chunk := list(islice(lines, 4)):
+        if not any(line.strip() for line in chunk):
+            # Blank lines only end the input when nothing else follows them
+            following = []
+            for line in lines:
+                following.append(line)
+                if line.strip():
+                    break
+            else:
+                break  # trailing blank lines
+            lines = chain(following, lines)
+        if len(chunk) != 4:
+            error_count += 1
+            errors.append(f"line {number}: Incomplete car definition")
+            break
+
+        try:
+            car_id = tokenize_car_id(decode_line(chunk[1]))
+            if car_id in indices:
+                raise InputError(f"Duplicate car ID {car_id}", indent(chunk[1]) + 1)
+            indices[car_id] = len(indices)
+        except InputError as error:
+            record(number + 1, error)
+        try:
+            x, y, direction = tokenize_start_position(
+                decode_line(chunk[2]), width, height, obstacles
+            )
+        except InputError as error:
+            record(number + 2, error)
+        try:
+            commands = tokenize_commands(chunk[3])
+        except InputError as error:
+            record(number + 3, error)
+        number += 4
+
+        if not error_count:
+            yield Car(id=car_id, x=x, y=y, direction=direction, command_list=commands)
+        # Once an error is found, the rest is still validated but not simulated
+
+    if error_count:
+        if error_count > len(errors):
+            errors.append(f"and {error_count - len(errors)} more errors")
+        parser.error("\n".join(errors))
+    if not indices:
+        parser.error("No cars defined in the input")
+
+
+def decode_line(line: str | bytes) -> str:
+    """Text of a short line; invalid bytes are replaced, so they fail validation."""
+    return line if isinstance(line, str) else line.decode("ascii", "replace")
+
+
+def indent(line: str | bytes) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def token_column(line: str, index: int) -> int:
+    """Column of the token at `index` in the line, or just after the last one."""
+    tokens = list(TOKEN.finditer(line))
+    return tokens[index].start() + 1 if index < len(tokens) else len(line.rstrip()) + 1
+
+
+def tokenize_dimensions(line: str) -> tuple[int, int]:
+    tokens = line.split()
+    try:
+        width, height = map(int, tokens)
+    except ValueError:
+        invalid = next((i for i, token in enumerate(tokens) if not token.isdigit()), 2)
+        raise InputError("Dimensions must be int => 10 10", token_column(line, invalid)) from None
+    if width <= 0 or height <= 0:
+        raise InputError("The field is invalid", token_column(line, 0))
 
-        # Parse field dimensions from first line
-        width, height = parse_dimensions(parser, lines[0])
-        field = Field(width=width, height=height)
+    return width, height
 
-        # Remove the first line
-        lines = lines[1:]
-        cars = []
-        # Parse cars four lines at a time
-        for i in range(0, len(lines), 4):
-            chunk = lines[i : i + 4]
-            # Each car definition should be 4 lines:
-            # Empty line, ID, position, commands
-            if len(chunk) != 4:
-                parser.error("Incomplete car definition")
 
-            car_id = parse_car_id(parser, chunk[1].strip())
-            x, y, direction = parse_start_position(parser, chunk[2].strip())
-            command_list = parse_commands(parser, chunk[3].strip())
-            check_starting_conditions(parser, width, height, x, y)
+def tokenize_car_id(line: str) -> str:
+    car_id = line.strip()
+    if not CAR_ID.fullmatch(car_id):
+        column = len(line) - len(line.lstrip()) + 1
+        if invalid := INVALID_CAR_ID.search(car_id):
+            column += invalid.start()
+        raise InputError("Car ID must only contain letters, digits, _ or -", column)
 
-            car = Car(id=car_id, x=x, y=y, direction=direction, command_list=command_list)
-            cars.append(car)
+    return car_id
 
-        if not cars:
-            parser.error("No cars defined in the input")
 
-        return field, cars
+def tokenize_start_position(
+    line: str,
+    width: int | None = None,
+    height: int | None = None,
+    obstacles: Obstacles | None = None,
+) -> tuple[int, int, str]:
+    """Parse `x y direction`, checked against the field and its obstacles if given."""
+    tokens = line.split()
+    if len(tokens) != 3:
+        raise InputError(START_POSITION_FORMAT, token_column(line, 3))
+    for index in (0, 1):
+        try:
+            tokens[index] = int(tokens[index])
+        except ValueError:
+            raise InputError(START_POSITION_FORMAT, token_column(line, index)) from None
+    x, y, direction = tokens
+    if direction not in ("N", "W", "S", "E"):
+        raise InputError(START_POSITION_FORMAT, token_column(line, 2))
+
+    if width is not None and not (0 <= x < width and 0 <= y < height):
+        column = token_column(line, 0 if not 0 <= x < width else 1)
+        raise InputError("The starting position must be in the field", column)
+    if obstacles is not None and obstacles.blocked(x, y):
+        raise InputError("The starting position is on an obstacle", token_column(line, 0))
+
+    return x, y, direction
 
-    except Exception:
-        parser.error("Error parsing Part 2")
 
+def tokenize_obstacle(line: str, width: int, height: int) -> tuple[int, int, int, int]:
+    """Parse `x0 y0 x1 y1`, a rectangle of blocked cells in the field."""
+    tokens = line.split()
+    if len(tokens) != 4:
+        raise InputError(OBSTACLE_FORMAT, token_column(line, 4))
+    for index in range(4):
+        try:
+            tokens[index] = int(tokens[index])
+        except ValueError:
+            raise InputError(OBSTACLE_FORMAT, token_column(line, index)) from None
+    x0, y0, x1, y1 = tokens
+
+    for index, (low, high, size) in enumerate(((x0, x1, width), (y0, y1, height))):
+        if not 0 <= low <= high < size:
+            column = token_column(line, index if not 0 <= low < size else index + 2)
+            raise InputError(
+                "The obstacle must be in the field, with x0 <= x1 and y0 <= y1", column
+            )
+
+    return x0, y0, x1, y1
+
+
+def tokenize_commands(line: str | bytes) -> bytes | RepeatedCommands:
+    """Validate a whole line of commands at once and return its compact form.
+
+    Plain commands are checked with a single bytes.translate, and only searched for
+    the column of the first invalid command when there is one.
+    """
+    commands = line.strip()
+    if isinstance(commands, str) and commands.isascii():
+        commands = commands.encode("ascii")
+    if isinstance(commands, bytes) and not commands.translate(None, b"FRL"):
+        return commands
 
-def parse_lines(parser, text: str) -> tuple[str, str, str]:
     try:
-        dimensions, start_position, commands = text.split("\n")
+        if isinstance(commands, bytes):
+            if b"(" not in commands and b")" not in commands:
+                return parse_plain(commands)
+            try:
+                commands = commands.decode("ascii")
+            except UnicodeDecodeError as error:
+                raise ProgramError(
+                    "The commands must only contain F, R and L", error.start
+                ) from None
+        return parse_program(commands)
+    except ProgramError as error:
+        raise InputError(str(error), indent(line) + error.position + 1) from None
+
+
+def parse_lines(parser, text: str) -> tuple[str, list[str], str, str]:
+    """Split a Part 1 input into its dimensions, obstacles, start position and commands."""
+    try:
+        dimensions, *obstacles, start_position, commands = text.split("\n")
     except Exception:
         parser.error("Error parsing input lines")
 
-    return dimensions, start_position, commands
+    return dimensions, obstacles, start_position, commands
 
 
 def parse_dimensions(parser, dimensions: str) -> tuple[int, int]:
@@ -132,44 +485,36 @@ def parse_dimensions(parser, dimensions: str) -> tuple[int, int]:
     return width, height
 
 
+def parse_obstacles(parser, lines: list[str], width: int, height: int) -> Obstacles | None:
+    try:
+        rectangles = [tokenize_obstacle(line, width, height) for line in lines]
+    except InputError as error:
+        parser.error(str(error))
+
+    return Obstacles(width, height, rectangles) if rectangles else None
+
+
 def parse_car_id(parser, car_id: str) -> str:
     try:
-        if len(car_id) != 1 or car_id not in string.ascii_uppercase:
-            raise ValueError()
-    except Exception:
-        parser.error("Car ID must be a single character")
+        car_id = tokenize_car_id(car_id)
+    except InputError as error:
+        parser.error(str(error))
 
     return car_id
 
 
 def parse_start_position(parser, start_position: str) -> tuple[int, int, str]:
     try:
-        result = start_position.strip().split()
-        if len(result) != 3:
-            raise ValueError()
-
-        x = int(result[0])
-        y = int(result[1])
-        if result[2] in ["N", "W", "S", "E"]:
-            direction = result[2]
-        else:
-            raise ValueError()
-    except Exception:
-        parser.error(
-            "Start Position must have the format => x y direction, where x, y are int and direction one of N, W, S, E"
-        )
+        x, y, direction = tokenize_start_position(start_position)
+    except InputError as error:
+        parser.error(str(error))
 
     return x, y, direction
 
 
-def parse_commands(parser, commands: str) -> list[str]:
+def parse_commands(parser, commands: str) -> bytes | RepeatedCommands:
     try:
-        command_list = []
-        for command in commands.strip():
-            if command not in ["F", "R", "L"]:
-                raise ValueError()
-            command_list.append(command)
-
+        command_list = parse_program(commands.strip())
     except Exception:
         parser.error("The commands must have the format => XXX where each X is one of F, R, L")
 
@@ -0,0 +1,221 @@
+"""Commands written with repetitions, e.g. F(FFRFL)*1000000R.
+
+A program is kept as a tree: a RepeatedCommands node holds parts, plain commands
+or nested nodes, played `repeat` times. Its length can be far larger than what
+would fit in memory once expanded.
+"""
+
+import re
+import sys
+from collections.abc import Iterator, Sequence
+
+# Longest expansion produced at once when iterating over a program
+CHUNK_SIZE = 1 << 16
+# Longest program, its length must be a valid len()
+MAX_LENGTH = sys.maxsize
+# Deepest nesting of repetitions, programs are walked recursively
+MAX_NESTING = 64
+INVALID_COMMAND = re.compile(rb"[^FRL]")
+
+
+class ProgramError(ValueError):
+    """Invalid program, `position` is the offset of the error in the text."""
+
+    def __init__(self, message: str, position: int):
+        super().__init__(message)
+        self.position = position
+
+
+class RepeatedCommands(Sequence):
+    """Read-only sequence of command codes over a repeat tree."""
+
+    __slots__ = ("body_length", "length", "parts", "repeat")
+
+    def __init__(self, parts: Sequence["bytes | RepeatedCommands"], repeat: int = 1):
+        self.parts = tuple(parts)
+        self.repeat = repeat
+        self.body_length = sum(len(part) for part in self.parts)
+        self.length = self.body_length * repeat
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, stride = index.indices(self.length)
+            if stride != 1:
+                return bytes(self)[index]
+            return b"".join(self.chunks(start, stop))
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("command index out of range")
+
+        index %= self.body_length
+        for part in self.parts:
+            if index < len(part):
+                return part[index]
+            index -= len(part)
+
+    def chunks(self, start: int = 0, stop: int | None = None) -> Iterator[bytes]:
+        """Yield the commands in [start, stop) expanded, a bounded piece at a time."""
+        stop = self.length if stop is None else min(stop, self.length)
+        if start >= stop:
+            return
+
+        # Offset of the current part from the start of the program
+        position = start // self.body_length * self.body_length
+        while position < stop:
+            for part in self.parts:
+                part_start = max(start - position, 0)
+                part_stop = min(stop - position, len(part))
+                if part_start < part_stop:
+                    if isinstance(part, RepeatedCommands):
+                        yield from part.chunks(part_start, part_stop)
+                    else:
+                        for offset in range(part_start, part_stop, CHUNK_SIZE):
+                            yield part[offset : min(offset + CHUNK_SIZE, part_stop)]
+                position += len(part)
+
+    def window(self, start: int = 0, stop: int | None = None) -> "RepeatedCommands":
+        """The commands in [start, stop) as a repeat tree, the repetitions left unexpanded."""
+        stop = self.length if stop is None else min(stop, self.length)
+        start = max(start, 0)
+        if start == 0 and stop == self.length:
+            return self
+        if start >= stop:
+            return RepeatedCommands(())
+
+        body = self.body_length
+        first, last = start // body, (stop - 1) // body
+        if first == last:
+            return self.body_window(start - first * body, stop - first * body)
+
+        parts = []
+        if start > first * body:
+            parts.append(self.body_window(start - first * body, body))
+            first += 1
+        # Repetitions in the window as a whole, then the beginning of the last one
+        whole = last + 1 if stop == (last + 1) * body else last
+        if whole > first:
+            parts.append(RepeatedCommands(self.parts, whole - first))
+        if whole == last:
+            parts.append(self.body_window(0, stop - last * body))
+        return RepeatedCommands(parts)
+
+    def body_window(self, start: int, stop: int) -> "RepeatedCommands":
+        """Commands [start, stop) of a single repetition of the body."""
+        parts = []
+        position = 0
+        for part in self.parts:
+            part_start = max(start - position, 0)
+            part_stop = min(stop - position, len(part))
+            if part_start < part_stop:
+                if isinstance(part, RepeatedCommands):
+                    parts.append(part.window(part_start, part_stop))
+                else:
+                    parts.append(part[part_start:part_stop])
+            position += len(part)
+        return RepeatedCommands(parts)
+
+    def __iter__(self) -> Iterator[int]:
+        for chunk in self.chunks():
+            yield from chunk
+
+    def count(self, value) -> int:
+        """Occurrences of a command, given as a code or as a one-byte bytes."""
+        return self.repeat * sum(part.count(value) for part in self.parts)
+
+    def __bytes__(self):
+        return b"".join(self.chunks())
+
+    def __eq__(self, other):
+        return bytes(self) == bytes(other)
+
+    def __lt__(self, other):
+        return bytes(self) < bytes(other)
+
+    def __str__(self):
+        body = "".join(
+            str(part) if isinstance(part, RepeatedCommands) else part.decode("ascii")
+            for part in self.parts
+        )
+        return body if self.repeat == 1 else f"({body})*{self.repeat}"
+
+    def __repr__(self):
+        return f"RepeatedCommands({str(self)!r})"
+
+
+def parse_program(text: str) -> bytes | RepeatedCommands:
+    """Parse commands with (...)*N repetitions, possibly nested.
+
+    Plain commands are returned as bytes. Raise ValueError on invalid syntax.
+    """
+    if "(" not in text and ")" not in text:
+        return parse_plain(text)
+
+    program, position = parse_sequence(text, 0)
+    if position != len(text):
+        raise ProgramError(f"Unexpected {text[position]!r} at position {position}", position)
+    return program
+
+
+def parse_sequence(text: str, position: int, depth: int = 0) -> tuple[RepeatedCommands, int]:
+    """Parse parts up to a closing parenthesis or the end of `text`, nested `depth` times."""
+    parts = []
+    length = 0
+    start = position
+    while position < len(text) and text[position] != ")":
+        if text[position] != "(":
+            position += 1
+            continue
+
+        if start < position:
+            parts.append(parse_plain(text[start:position], start))
+            length += len(parts[-1])
+        opening = position
+        if depth == MAX_NESTING:
+            raise ProgramError("Too many nested repetitions", opening)
+        body, position = parse_sequence(text, position + 1, depth + 1)
+        if position >= len(text) or text[position] != ")":
+            raise ProgramError("Unclosed parenthesis", opening)
+        if text[position + 1 : position + 2] != "*":
+            raise ProgramError(
+                f"Missing *N after the parenthesis at position {position}", position + 1
+            )
+
+        position += 2
+        digits = position
+        while position < len(text) and text[position] in "0123456789":
+            position += 1
+        if digits == position:
+            raise ProgramError(f"Missing repeat count at position {digits}", digits)
+        # Counts longer than the digits of MAX_LENGTH are not even converted
+        count = text[digits:position].lstrip("0")
+        if len(count) > len(str(MAX_LENGTH)) or len(body) * int(count or 0) > MAX_LENGTH:
+            raise ProgramError("Repeat count too large", digits)
+        parts.append(RepeatedCommands(body.parts, int(count or 0)))
+        length += len(parts[-1])
+        if length > MAX_LENGTH:
+            raise ProgramError("Repeat count too large", digits)
+        start = position
+
+    if start < position:
+        parts.append(parse_plain(text[start:position], start))
+        if length + len(parts[-1]) > MAX_LENGTH:
+            raise ProgramError("Program too long", start)
+    return RepeatedCommands(parts), position
+
+
+def parse_plain(text: str | bytes, start: int = 0) -> bytes:
+    """Validate plain commands in bulk, `start` is their offset in the whole program."""
+    try:
+        commands = text.encode("ascii") if isinstance(text, str) else text
+    except UnicodeEncodeError as error:
+        raise ProgramError(
+            "The commands must only contain F, R and L", start + error.start
+        ) from None
+    if commands.translate(None, b"FRL"):
+        position = INVALID_COMMAND.search(commands).start()
+        raise ProgramError("The commands must only contain F, R and L", start + position)
+    return commands
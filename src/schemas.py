@@ -1,61 +1,119 @@
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from src.obstacles import Obstacles
 
-@dataclass
+# Directions are encoded as ints 0-3, clockwise, so a right turn is +1 and a left turn +3
+DIRECTIONS = "NESW"
+DX = (0, 1, 0, -1)
+DY = (1, 0, -1, 0)
+
+# Commands are kept as bytes, one ASCII code per command
+FORWARD, RIGHT, LEFT = b"FRL"
+TURNS = {RIGHT: 1, LEFT: 3, "R": 1, "L": 3}
+
+
+@dataclass(slots=True)
 class Field:
     width: int
     height: int
+    # Blocked cells, see src.obstacles
+    obstacles: "Obstacles | None" = None
 
     def __format__(self, format_spec):
         return f"{self.width} {self.height}"
 
 
-@dataclass
 class Car:
-    id: str
-    x: int
-    y: int
-    direction: str
-    command_list: list[str]
+    """A car on the field.
+
+    The state is slotted, the direction is stored as an int (see DIRECTIONS) in
+    `heading` and the commands as bytes in `commands`, which keeps a car down to a
+    few dozen bytes plus one byte per command. `commands` may also be any other
+    sequence of command codes, e.g. commands packed in a memory-mapped file.
+    """
+
+    __slots__ = ("commands", "heading", "id", "x", "y")
+
+    def __init__(
+        self,
+        id: str,
+        x: int,
+        y: int,
+        direction: str | int,
+        command_list: Sequence[int] | Iterable[str] = b"",
+    ):
+        self.id = id
+        self.x = x
+        self.y = y
+        self.direction = direction
+        if isinstance(command_list, (str, list, tuple)):
+            self.commands = "".join(command_list).encode("ascii")
+        else:
+            # bytes, or any other sequence of command codes such as packed commands
+            self.commands = command_list
+
+    @property
+    def direction(self) -> str:
+        return DIRECTIONS[self.heading]
+
+    @direction.setter
+    def direction(self, direction: str | int):
+        self.heading = direction if isinstance(direction, int) else DIRECTIONS.index(direction)
+
+    @property
+    def command_list(self) -> list[str]:
+        """Decoded copy of the commands, one string per command."""
+        return [chr(command) for command in self.commands]
+
+    def copy(self, commands: Sequence[int] | None = None) -> "Car":
+        """Copy of the car, with `commands` instead of its own if given."""
+        return Car(
+            self.id, self.x, self.y, self.heading, self.commands if commands is None else commands
+        )
 
     def is_move_valid_for_field(self, field: Field) -> bool:
-        if self.direction == "N" and self.y + 1 >= field.height:
-            return False
-        elif self.direction == "S" and self.y - 1 < 0:
-            return False
-        elif self.direction == "E" and self.x + 1 >= field.width:
+        x = self.x + DX[self.heading]
+        y = self.y + DY[self.heading]
+        if not (0 <= x < field.width and 0 <= y < field.height):
             return False
-        elif self.direction == "W" and self.x - 1 < 0:
-            return False
-        else:
-            return True
+        return field.obstacles is None or not field.obstacles.blocked(x, y)
 
     def collision_with_car(self, cars: list) -> bool:
         for car in cars:
-            if self.id != car.id and (self.x, self.y) == (car.x, car.y):
+            if car is not self and (self.x, self.y) == (car.x, car.y):
                 return car.id
 
         return None
 
     def move(self):
-        if self.direction == "N":
-            self.y += 1
-        elif self.direction == "S":
-            self.y -= 1
-        elif self.direction == "E":
-            self.x += 1
-        elif self.direction == "W":
-            self.x -= 1
-        else:
-            raise ValueError("Invalid direction")
+        self.x += DX[self.heading]
+        self.y += DY[self.heading]
 
-    def change_direction(self, command: str):
-        if command == "R":
-            self.direction = {"N": "E", "E": "S", "S": "W", "W": "N"}[self.direction]
-        elif command == "L":
-            self.direction = {"N": "W", "W": "S", "S": "E", "E": "N"}[self.direction]
-        else:
-            raise ValueError("Invalid direction")
+    def change_direction(self, command: str | int):
+        try:
+            self.heading = (self.heading + TURNS[command]) % 4
+        except KeyError:
+            raise ValueError("Invalid direction") from None
+
+    def __eq__(self, other):
+        if not isinstance(other, Car):
+            return NotImplemented
+        return (self.id, self.x, self.y, self.heading, self.commands) == (
+            other.id,
+            other.x,
+            other.y,
+            other.heading,
+            other.commands,
+        )
+
+    def __repr__(self):
+        return (
+            f"Car(id={self.id!r}, x={self.x}, y={self.y}, "
+            f"direction={self.direction!r}, commands={self.commands!r})"
+        )
 
     def __format__(self, format_spec):
         return f"{self.x} {self.y} {self.direction}"
@@ -0,0 +1,243 @@
+"""Long-running simulation service.
+
+Clients connect over TCP or a Unix socket and send one JSON request per line,
+{"id": ..., "part": 1|2, "input": "..."}, "id" being optional and echoed back.
+Every request gets one JSON line, {"id": ..., "result": "..."} or
+{"id": ..., "error": "..."}, in completion order.
+
+Requests from all connections are queued and sent to a pool of worker processes
+in batches. The queue is bounded: once full, connections stop being read until
+a batch completes.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.batch import check_scenario, run_scenario
+from src.parser import ScenarioError
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Longest request line accepted, scenarios included
+LINE_LIMIT = 1 << 24
+
+
+def run_scenarios(scenarios: list[tuple[int, str]]) -> list[dict]:
+    """Worker entry point: simulate one batch of scenarios."""
+    return [run_scenario(scenario) for scenario in scenarios]
+
+
+def parse_request(line: bytes, part: int = 2) -> tuple[object, tuple[int, str]]:
+    """Return the id and the (part, input) scenario of a request line.
+
+    Only the record is checked here, see check_scenario for its part and input.
+    """
+    try:
+        record = json.loads(line)
+        return record.get("id"), (record.get("part", part), record["input"])
+    except (ValueError, KeyError, AttributeError):
+        raise ScenarioError("Invalid scenario record") from None
+
+
+class SimulationServer:
+    """Batch the requests of every connection onto a worker pool.
+
+    A batch is sent as soon as `batch_size` requests are waiting, or `batch_delay`
+    seconds after its first request. At most two batches per worker are in
+    flight, and at most `queue_size` requests wait behind them. A request that is
+    not answered within `timeout` seconds gets an error instead. With a single
+    worker the batches run on a thread of the server process.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        batch_size: int = 32,
+        batch_delay: float = 0.001,
+        queue_size: int = 1024,
+        timeout: float | None = 10.0,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.executor: Executor | None = None
+        self.slots = None
+        self.tasks = set()
+        self.dispatcher = None
+
+    async def __aenter__(self):
+        workers = self.workers or os.cpu_count() or 1
+        if workers == 1:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            # Forked workers would inherit the client sockets and keep them open after
+            # the server closes them
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        # Start the workers now rather than on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self.executor, run_scenarios, []) for _ in range(workers))
+        )
+        self.slots = asyncio.Semaphore(2 * workers)
+        self.dispatcher = asyncio.create_task(self.dispatch())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.dispatcher.cancel()
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(self.dispatcher, *self.tasks, return_exceptions=True)
+        self.executor.shutdown(cancel_futures=True)
+
+    def spawn(self, coroutine):
+        # Keep a reference so the task is not garbage collected while it runs
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def submit(self, scenario: tuple[int, str]) -> asyncio.Future:
+        """Queue a scenario, waiting for room in the queue, and return its future result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((scenario, future))
+        return future
+
+    async def dispatch(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.batch_delay and self.queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.batch_delay)
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            # Requests that timed out while queued are dropped
+            batch = [(scenario, future) for scenario, future in batch if not future.done()]
+            if batch:
+                await self.slots.acquire()
+                self.spawn(self.run_batch(batch))
+
+    async def run_batch(self, batch: list[tuple[tuple[int, str], asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor, run_scenarios, [scenario for scenario, _ in batch]
+            )
+        except BrokenProcessPool as error:  # a worker process died
+            results = [{"error": f"Simulation failed: {error!r}"}] * len(batch)
+        finally:
+            self.slots.release()
+
+        for (_, future), result in zip(batch, results, strict=True):
+            if not future.done():
+                future.set_result(result)
+
+    async def answer(self, request_id, future: asyncio.Future, writer: asyncio.StreamWriter):
+        try:
+            response = await asyncio.wait_for(future, self.timeout)
+        except TimeoutError:
+            response = {"error": "Timed out"}
+        writer.write(json.dumps({"id": request_id, **response}).encode() + b"\n")
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        answers = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                try:
+                    request_id, scenario = parse_request(line)
+                except ScenarioError as error:
+                    writer.write(json.dumps({"id": None, "error": str(error)}).encode() + b"\n")
+                    await writer.drain()
+                    continue
+                try:
+                    check_scenario(*scenario)
+                except ScenarioError as error:
+                    # Answered right away, without holding a place in a batch
+                    response = {"id": request_id, "error": str(error)}
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+                    continue
+
+                # Waiting for room in the queue is what holds back a client sending too fast
+                future = await self.submit(scenario)
+                answer = asyncio.create_task(self.answer(request_id, future, writer))
+                answers.add(answer)
+                answer.add_done_callback(answers.discard)
+
+            await asyncio.gather(*answers)
+        except (ConnectionError, ValueError):
+            pass  # the client went away or sent a line over LINE_LIMIT
+        finally:
+            for answer in answers:
+                answer.cancel()
+            writer.close()
+
+    async def listen_tcp(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        return await asyncio.start_server(self.handle_connection, host, port, limit=LINE_LIMIT)
+
+    async def listen_unix(self, path: str):
+        return await asyncio.start_unix_server(self.handle_connection, path, limit=LINE_LIMIT)
+
+
+async def serve(args: argparse.Namespace):
+    async with SimulationServer(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        batch_delay=args.batch_delay,
+        queue_size=args.queue_size,
+        timeout=args.timeout,
+    ) as server:
+        if args.unix:
+            listener = await server.listen_unix(args.unix)
+        else:
+            listener = await server.listen_tcp(args.host, args.port)
+        async with listener:
+            await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto Driving Car Simulation - server mode")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="TCP address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on")
+    parser.add_argument("--unix", metavar="PATH", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="Number of worker processes"
+    )
+    parser.add_argument("--batch-size", type=int, default=32, help="Scenarios sent at once")
+    parser.add_argument(
+        "--batch-delay", type=float, default=0.001, help="Seconds to wait to fill a batch"
+    )
+    parser.add_argument(
+        "--queue-size", type=int, default=1024, help="Requests waiting before reads pause"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10.0, help="Seconds before a request times out"
+    )
+
+    args = parser.parse_args()
+
+    if args.workers is not None and args.workers < 1:
+        parser.error("The number of workers must be positive")
+    if args.batch_size < 1 or args.queue_size < 1:
+        parser.error("The batch and queue sizes must be positive")
+    if args.timeout <= 0:
+        parser.error("The timeout must be positive")
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
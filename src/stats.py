@@ -0,0 +1,60 @@
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+LATENCY_BUCKETS = 48
+
+
+@dataclass
+class SimulationStats:
+    """Counters filled by the engines while instrumentation is enabled.
+
+    `step_latency[i]` counts the steps that took between 2**(i-1) and 2**i
+    nanoseconds. `callback` is called with the stats at the end of every
+    simulation, e.g. to push them to an external metrics system.
+    """
+
+    moves: int = 0
+    rejected_moves: int = 0
+    rotations: int = 0
+    collision_checks: int = 0
+    simulations: int = 0
+    step_latency: list[int] = field(default_factory=lambda: [0] * LATENCY_BUCKETS)
+    callback: Callable[["SimulationStats"], None] | None = None
+
+    @property
+    def steps(self) -> int:
+        return sum(self.step_latency)
+
+    def record_commands(self, executed: Iterable[bytes], rejected_moves: int = 0):
+        """Count the moves and rotations of the commands the cars have executed."""
+        forward = rotations = 0
+        for commands in executed:
+            forward += commands.count(b"F")
+            rotations += len(commands) - commands.count(b"F")
+
+        self.moves += forward - rejected_moves
+        self.rejected_moves += rejected_moves
+        self.rotations += rotations
+
+    def record_step(self, nanoseconds: int):
+        self.step_latency[min(nanoseconds.bit_length(), LATENCY_BUCKETS - 1)] += 1
+
+    def finish(self):
+        self.simulations += 1
+        if self.callback is not None:
+            self.callback(self)
+
+    def __format__(self, format_spec):
+        lines = [
+            f"simulations: {self.simulations}",
+            f"moves: {self.moves}",
+            f"rejected moves: {self.rejected_moves}",
+            f"rotations: {self.rotations}",
+            f"collision checks: {self.collision_checks}",
+            f"steps: {self.steps}",
+        ]
+        for bucket, count in enumerate(self.step_latency):
+            if count:
+                lines.append(f"steps under {2**bucket} ns: {count}")
+
+        return "\n".join(lines)
@@ -0,0 +1,253 @@
+"""Tile-sharded multi-process engine.
+
+The field is cut into a grid of rectangular tiles, one task per tile. Every window
+of steps runs in two phases on a process pool:
+
+1. each tile computes the trajectories of the cars it owns (the cars standing on it
+   at the start of the window) and the range of tiles each of them reaches;
+2. each tile searches its own cells for collisions, looking at every car whose
+   trajectory reaches it.
+
+A collision happens on one cell, so it is found by the tile holding that cell, and
+the earliest (step, mover) over all tiles is the global first collision, with the
+same tie-breaking as the single-process engines. At the end of a window cars are
+handed over to the tile they stand on.
+
+The fleet's commands and trajectories live in shared memory, workers only receive
+a tile number and the window bounds.
+"""
+
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from src.schemas import Car, Field
+from src.trajectories import WINDOW_POSITIONS, compute_trajectories, find_earliest_collision
+from src.vectorized import build_command_matrix
+
+# Buffers of the tasks running in the current process, set by attach_buffers
+_buffers = None
+# The main process owns the blocks, workers must not have them cleaned up when they exit
+ATTACH_OPTIONS = {"track": False} if sys.version_info >= (3, 13) else {}
+
+
+class TileBuffers:
+    """Arrays shared by the tile tasks, each in its own shared memory block.
+
+    - `commands`: the (steps, cars) command matrix;
+    - `xs`, `ys`, `headings`: the (window + 1, cars) trajectories of the current
+      window, row 0 holding the state at the start of the window;
+    - `owner`: the tile owning each car during the current window;
+    - `reach`: the first and last tile column and row each car reaches in the window.
+    """
+
+    def __init__(self, field: Field, columns: int, rows: int, layout: dict, create: bool = False):
+        self.field = field
+        self.columns = columns
+        self.rows = rows
+        self.layout = layout
+        self.blocks = []
+        for name, (block, shape, dtype) in layout.items():
+            if create:
+                size = max(math.prod(shape) * np.dtype(dtype).itemsize, 1)
+                memory = SharedMemory(block, create=True, size=size)
+            else:
+                memory = SharedMemory(block, **ATTACH_OPTIONS)
+            self.blocks.append(memory)
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+
+    @classmethod
+    def allocate(cls, field: Field, columns: int, rows: int, steps: int, cars: int, window: int):
+        shapes = {
+            "commands": ((steps, cars), np.uint8),
+            "xs": ((window + 1, cars), np.int64),
+            "ys": ((window + 1, cars), np.int64),
+            "headings": ((window + 1, cars), np.int64),
+            "owner": ((cars,), np.int64),
+            "reach": ((cars, 4), np.int64),
+        }
+        token = os.urandom(6).hex()
+        layout = {
+            name: (f"tiles-{token}-{name}", shape, dtype) for name, (shape, dtype) in shapes.items()
+        }
+        return cls(field, columns, rows, layout, create=True)
+
+    def arguments(self) -> tuple:
+        """What another process needs to attach to the same buffers."""
+        return self.field, self.columns, self.rows, self.layout
+
+    def tile_column(self, x: np.ndarray) -> np.ndarray:
+        return x * self.columns // self.field.width
+
+    def tile_row(self, y: np.ndarray) -> np.ndarray:
+        return y * self.rows // self.field.height
+
+    def close(self, unlink: bool = False):
+        # Drop the views before closing the blocks they point into
+        for name in self.layout:
+            setattr(self, name, None)
+        for memory in self.blocks:
+            memory.close()
+            if unlink:
+                memory.unlink()
+
+
+def attach_buffers(field: Field, columns: int, rows: int, layout: dict):
+    """Pool initializer: map the buffers created by the main process."""
+    global _buffers
+    _buffers = TileBuffers(field, columns, rows, layout)
+
+
+def tile_grid(field: Field, tiles: int) -> tuple[int, int]:
+    """Split the field in up to `tiles` tiles, picking the (columns, rows) with the squarest tiles.
+
+    Fewer tiles are used when the field cannot be split evenly in that many.
+    """
+    for count in range(tiles, 1, -1):
+        grids = [
+            (abs(math.log(field.width * count / columns**2 / field.height)), columns)
+            for columns in range(1, count + 1)
+            if count % columns == 0 and columns <= field.width and count // columns <= field.height
+        ]
+        if grids:
+            columns = min(grids)[1]
+            return columns, count // columns
+
+    return 1, 1
+
+
+def advance_tile(tile: int, start: int, length: int):
+    """Phase 1: trajectories of the cars owned by `tile` for steps [start, start + length)."""
+    buffers = _buffers
+    owned = np.flatnonzero(buffers.owner == tile)
+    if owned.size == 0:
+        return
+
+    xs, ys, headings = compute_trajectories(
+        buffers.field,
+        buffers.xs[0, owned],
+        buffers.ys[0, owned],
+        buffers.headings[0, owned],
+        buffers.commands[start : start + length, owned],
+    )
+    buffers.xs[: length + 1, owned] = xs
+    buffers.ys[: length + 1, owned] = ys
+    buffers.headings[: length + 1, owned] = headings
+    columns = buffers.tile_column(np.stack((xs.min(axis=0), xs.max(axis=0))))
+    rows = buffers.tile_row(np.stack((ys.min(axis=0), ys.max(axis=0))))
+    buffers.reach[owned] = np.concatenate((columns, rows)).T
+
+
+def search_tile(tile: int, length: int) -> tuple[int, int, int] | None:
+    """Phase 2: first collision of the window on the cells of `tile`, in global car indices."""
+    buffers = _buffers
+    column, row = tile % buffers.columns, tile // buffers.columns
+    reach = buffers.reach
+    visitors = np.flatnonzero(
+        (reach[:, 0] <= column)
+        & (column <= reach[:, 1])
+        & (reach[:, 2] <= row)
+        & (row <= reach[:, 3])
+    )
+    if visitors.size < 2:
+        return None
+
+    xs = buffers.xs[: length + 1, visitors]
+    ys = buffers.ys[: length + 1, visitors]
+    cells = xs * buffers.field.height + ys
+    # Positions on other tiles get a key of their own so they can never match
+    outside = (buffers.tile_column(xs) != column) | (buffers.tile_row(ys) != row)
+    cells[outside] = -1 - np.flatnonzero(outside.ravel())
+    if collision := find_earliest_collision(cells):
+        step, mover, occupant = collision
+        return step, int(visitors[mover]), int(visitors[occupant])
+
+    return None
+
+
+def execute_simulation_multiples_cars_tiles(
+    field: Field,
+    cars: list[Car],
+    workers: int | None = None,
+    tiles: int | None = None,
+    window: int | None = None,
+) -> str:
+    """Tile-sharded version of execute_simulation_multiples_cars for very large fields.
+
+    `tiles` defaults to the number of workers, itself defaulting to the number of
+    CPUs. With a single worker the tiles are processed in the current process.
+    Windows grow like in the trajectory engine.
+    """
+    global _buffers
+    cars = list(cars)
+    commands = build_command_matrix(cars)
+    workers = workers or os.cpu_count() or 1
+    columns, rows = tile_grid(field, tiles or workers)
+    # Windows never need more rows than there are steps
+    largest_window = max(1, min(window or WINDOW_POSITIONS // max(len(cars), 1), len(commands)))
+    window = window or min(16, largest_window)
+
+    buffers = TileBuffers.allocate(field, columns, rows, len(commands), len(cars), largest_window)
+    previous = _buffers
+    executor = None
+    try:
+        buffers.commands[:] = commands
+        buffers.xs[0] = [car.x for car in cars]
+        buffers.ys[0] = [car.y for car in cars]
+        buffers.headings[0] = [car.heading for car in cars]
+        if workers == 1:
+            _buffers = buffers
+            run = map
+        else:
+            executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=attach_buffers, initargs=buffers.arguments()
+            )
+            run = executor.map
+
+        result = "no collision"
+        start = 0
+        all_tiles = range(columns * rows)
+        while start < len(commands):
+            length = min(window, len(commands) - start)
+            # Hand the cars over to the tile they stand on
+            buffers.owner[:] = buffers.tile_row(buffers.ys[0]) * columns + buffers.tile_column(
+                buffers.xs[0]
+            )
+            list(run(advance_tile, all_tiles, [start] * len(all_tiles), [length] * len(all_tiles)))
+            found = [
+                collision
+                for collision in run(search_tile, all_tiles, [length] * len(all_tiles))
+                if collision
+            ]
+            if found:
+                step, mover, occupant = min(found)
+                # Cars after the mover have not played the colliding step
+                played = np.arange(len(cars)) <= mover
+                for array in (buffers.xs, buffers.ys, buffers.headings):
+                    array[0] = np.where(played, array[step], array[step - 1])
+                result = (
+                    f"{cars[occupant].id} {cars[mover].id}\n"
+                    f"{buffers.xs[0, mover]} {buffers.ys[0, mover]}\n{start + step}"
+                )
+                break
+
+            for array in (buffers.xs, buffers.ys, buffers.headings):
+                array[0] = array[length]
+            start += length
+            window = min(2 * window, largest_window)
+
+        for index, car in enumerate(cars):
+            car.x = int(buffers.xs[0, index])
+            car.y = int(buffers.ys[0, index])
+            car.heading = int(buffers.headings[0, index])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        _buffers = previous
+        buffers.close(unlink=True)
+
+    return result
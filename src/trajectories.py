@@ -0,0 +1,165 @@
+import numpy as np
+
+from src.schemas import FORWARD, Car, Field
+from src.vectorized import STEP_X, STEP_Y, TURNS, build_command_matrix
+
+# Number of (step, car) positions held at once by the trajectory engine
+WINDOW_POSITIONS = 1 << 22
+# Largest command matrix stacked at once (one byte per position); longer runs
+# stack their commands a window at a time
+MATRIX_POSITIONS = 1 << 28
+
+
+def compute_trajectories(
+    field: Field, x: np.ndarray, y: np.ndarray, heading: np.ndarray, commands: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Positions and headings of every car after each row of `commands`, collisions ignored.
+
+    Row 0 of the result is the starting state. Only collisions couple the cars, so
+    each column is the car's own trajectory clamped to the field and stopped by its
+    obstacles.
+    """
+    steps, count = commands.shape
+    xs = np.empty((steps + 1, count), dtype=np.int64)
+    ys = np.empty((steps + 1, count), dtype=np.int64)
+    headings = np.empty((steps + 1, count), dtype=np.int64)
+    xs[0], ys[0], headings[0] = x, y, heading
+
+    for step, column in enumerate(commands):
+        direction = (headings[step] + TURNS[column]) & 3
+        forward = column == FORWARD
+        new_x = xs[step] + STEP_X[direction] * forward
+        new_y = ys[step] + STEP_Y[direction] * forward
+        inside = (new_x >= 0) & (new_x < field.width) & (new_y >= 0) & (new_y < field.height)
+        if field.obstacles is not None:
+            inside[inside] = ~field.obstacles.blocked_cells(new_x[inside], new_y[inside])
+        xs[step + 1] = np.where(inside, new_x, xs[step])
+        ys[step + 1] = np.where(inside, new_y, ys[step])
+        headings[step + 1] = direction
+
+    return xs, ys, headings
+
+
+def find_earliest_collision(cells: np.ndarray) -> tuple[int, int, int] | None:
+    """Return (step, mover, occupant) of the first collision in a grid of trajectories.
+
+    `cells[step, car]` is the cell of a car after `step`. Cars play a step in fleet
+    order, so mover i meets car j if j < i is on the destination after the step or
+    j > i still is before it. Every position is keyed by (step, cell) and matching
+    keys are found by sorting, the first colliding (step, car) in row-major order
+    wins.
+    """
+    steps = cells.shape[0] - 1
+    count = cells.shape[1]
+    if steps == 0:
+        return None
+
+    # Number the distinct cells densely so (step, cell) fits in a single int64 key
+    _, dense = np.unique(cells, return_inverse=True)
+    dense = dense.reshape(cells.shape)
+    rows = np.arange(1, steps + 1, dtype=np.int64)[:, None] * (int(dense.max()) + 1)
+    after = (rows + dense[1:]).ravel()
+    before = (rows + dense[:-1]).ravel()
+    moved = (cells[1:] != cells[:-1]).ravel()
+    car = np.tile(np.arange(count), steps)
+
+    # A car ahead in the fleet already arrived on the cell: the key is not first of its group
+    order = np.argsort(after, kind="stable")
+    arrived = np.empty(after.size, dtype=bool)
+    arrived[order] = np.concatenate(([False], after[order][1:] == after[order][:-1]))
+
+    # A car behind in the fleet has not left the cell yet: compare with the last car
+    # holding the same key before the step
+    order = np.argsort(before, kind="stable")
+    last = np.searchsorted(before[order], after, "right") - 1
+    holder = order[np.maximum(last, 0)]
+    waiting = (last >= 0) & (before[holder] == after) & (car[holder] > car)
+
+    collisions = np.flatnonzero(moved & (arrived | waiting))
+    if collisions.size == 0:
+        return None
+
+    step, mover = divmod(int(collisions[0]), count)
+    step += 1
+    cell = cells[step, mover]
+    ahead = np.flatnonzero(cells[step, :mover] == cell)
+    if ahead.size:
+        return step, mover, int(ahead[0])
+
+    return step, mover, mover + 1 + int(np.flatnonzero(cells[step - 1, mover + 1 :] == cell)[0])
+
+
+def execute_simulation_multiples_cars_trajectories(
+    field: Field, cars: list[Car], window: int | None = None, visits=None, export=None
+) -> str:
+    """Trajectory-based version of execute_simulation_multiples_cars.
+
+    Trajectories are computed for every car independently, a window of steps at a
+    time to bound memory, then searched for their earliest collision. Cars with shorter
+    command lists stay idle once their commands are exhausted.
+
+    The cells of the steps played are recorded in `visits`, a VisitIndex, and the
+    states written to `export`, a TrajectoryWriter (see src.export), if given.
+    Commands are stacked once if they fit in MATRIX_POSITIONS, a window at a time
+    otherwise.
+    """
+    cars = list(cars)
+    steps = max((len(car.commands) for car in cars), default=0)
+    x = np.array([car.x for car in cars], dtype=np.int64)
+    y = np.array([car.y for car in cars], dtype=np.int64)
+    heading = np.array([car.heading for car in cars], dtype=np.int64)
+    # Without a fixed window, start small so early collisions are found early, then
+    # double up to the memory bound
+    largest_window = window or max(1, WINDOW_POSITIONS // max(len(cars), 1))
+    window = window or min(16, largest_window)
+    commands = build_command_matrix(cars) if steps * len(cars) <= MATRIX_POSITIONS else None
+
+    result = "no collision"
+    if visits is not None:
+        visits.record(0, (x * field.height + y)[None])
+    if export is not None:
+        export.record(0, x[None], y[None], heading[None])
+    start = 0
+    while start < steps:
+        if commands is not None:
+            window_commands = commands[start : start + window]
+        else:
+            window_commands = build_command_matrix(cars, start, start + window)
+        xs, ys, headings = compute_trajectories(field, x, y, heading, window_commands)
+        cells = xs * field.height + ys
+        if collision := find_earliest_collision(cells):
+            step, mover, occupant = collision
+            # Cars after the mover have not played the colliding step
+            played = np.arange(len(cars)) <= mover
+            x = np.where(played, xs[step], xs[step - 1])
+            y = np.where(played, ys[step], ys[step - 1])
+            heading = np.where(played, headings[step], headings[step - 1])
+            result = f"{cars[occupant].id} {cars[mover].id}\n{x[mover]} {y[mover]}\n{start + step}"
+            if visits is not None:
+                visits.record(start, np.vstack((cells[:step], x * field.height + y)))
+            if export is not None:
+                export.record(
+                    start,
+                    *(
+                        np.vstack((rows[:step], last))
+                        for rows, last in ((xs, x), (ys, y), (headings, heading))
+                    ),
+                )
+            break
+
+        if visits is not None:
+            visits.record(start, cells)
+        if export is not None:
+            export.record(start, xs, ys, headings)
+        x, y, heading = xs[-1], ys[-1], headings[-1]
+        start += window
+        window = min(2 * window, largest_window)
+
+    if visits is not None:
+        visits.finish()
+    for index, car in enumerate(cars):
+        car.x = int(x[index])
+        car.y = int(y[index])
+        car.heading = int(heading[index])
+
+    return result
@@ -0,0 +1,237 @@
+"""Index of which cars stood on which cell, and during which steps.
+
+The trajectory engine records every arrival of a car on a cell while it runs: the
+starting cells, then every move. Once the simulation is over, the arrivals become
+stays, `[arrive, leave)` step intervals, grouped by cell and sorted by arrival so a
+cell is found by binary search and a step window cuts a contiguous run of its
+stays. A car is on a cell at step s when it stands there after playing s commands.
+"""
+
+import argparse
+
+import numpy as np
+
+from src.binary import is_binary_scenario, load_scenario
+from src.files import atomic_write
+from src.parser import ScenarioError, ScenarioParser, parse_part2_stream
+from src.schemas import Car, Field
+from src.trajectories import execute_simulation_multiples_cars_trajectories
+
+
+class VisitIndex:
+    """Stays of every car, by cell, for the steps played by a simulation.
+
+    Record the cells of a window of steps with `record`, then call `finish` before
+    querying. Cells are keyed `x * height + y`, like in the trajectory engine.
+    """
+
+    def __init__(self, field: Field, ids: list[str]):
+        self.field = field
+        self.ids = ids
+        # Last step played, the cars stay on their last cell until steps + 1
+        self.steps = 0
+        # (cell, arrive, car) arrays of the windows recorded so far
+        self.arrivals = []
+        self.cells = self.offsets = self.arrive = self.leave = self.car = None
+
+    def record(self, start: int, cells: np.ndarray):
+        """Record the arrivals in `cells[row, car]`, the cell of each car after step start + row.
+
+        Row 0 is the state the window starts from: only the first call records it,
+        as the starting cells.
+        """
+        if not self.arrivals:
+            count = cells.shape[1]
+            self.arrivals.append((cells[0], np.zeros(count, dtype=np.int64), np.arange(count)))
+
+        step, car = np.nonzero(cells[1:] != cells[:-1])
+        self.arrivals.append((cells[1:][step, car], start + 1 + step, car))
+        self.steps = max(self.steps, start + len(cells) - 1)
+
+    def finish(self):
+        """Turn the arrivals into stays grouped by cell."""
+        cells, arrive, car = (
+            np.concatenate(column).astype(np.int64) for column in zip(*self.arrivals, strict=True)
+        )
+        self.arrivals = []
+
+        # A stay ends when the same car arrives somewhere else
+        order = np.lexsort((arrive, car))
+        leave = np.full(len(car), self.steps + 1, dtype=np.int64)
+        same_car = car[order][1:] == car[order][:-1]
+        leave[order[:-1][same_car]] = arrive[order][1:][same_car]
+
+        order = np.lexsort((car, arrive, cells))
+        cells, self.arrive, self.leave, self.car = (
+            cells[order],
+            arrive[order],
+            leave[order],
+            car[order],
+        )
+        starts = np.flatnonzero(np.concatenate(([True], cells[1:] != cells[:-1])))
+        self.cells = cells[starts]
+        self.offsets = np.append(starts, len(cells))
+
+    def __len__(self):
+        """Number of stays in the index."""
+        return len(self.car)
+
+    def cell(
+        self, x: int, y: int, start: int = 0, stop: int | None = None
+    ) -> list[tuple[str, int, int]]:
+        """Return the (car id, arrive, leave) stays on (x, y) overlapping steps [start, stop)."""
+        if not (0 <= x < self.field.width and 0 <= y < self.field.height):
+            return []
+        key = x * self.field.height + y
+        position = np.searchsorted(self.cells, key)
+        if position == len(self.cells) or self.cells[position] != key:
+            return []
+
+        first, last = self.offsets[position], self.offsets[position + 1]
+        if stop is not None:
+            # Stays of a cell are sorted by arrival, the later ones are cut at once
+            last = first + np.searchsorted(self.arrive[first:last], stop)
+        stays = first + np.flatnonzero(self.leave[first:last] > start)
+        return [
+            (self.ids[car], arrive, leave)
+            for car, arrive, leave in zip(
+                self.car[stays].tolist(),
+                self.arrive[stays].tolist(),
+                self.leave[stays].tolist(),
+                strict=True,
+            )
+        ]
+
+    def region(
+        self, x0: int, y0: int, x1: int, y1: int, start: int = 0, stop: int | None = None
+    ) -> list[tuple[str, int, int, int, int]]:
+        """Return the (car id, x, y, arrive, leave) stays in the rectangle overlapping [start, stop).
+
+        The rectangle includes both corners. Stays are ordered by cell, then arrival.
+        """
+        height = self.field.height
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.field.width - 1), min(y1, height - 1)
+        if x0 > x1 or y0 > y1:
+            return []
+
+        # Occupied cells between the corners, the rectangle is cut to their columns
+        first = int(np.searchsorted(self.cells, x0 * height + y0))
+        last = int(np.searchsorted(self.cells, x1 * height + y1, "right"))
+        if first == last:
+            return []
+        x0 = max(x0, int(self.cells[first]) // height)
+        x1 = min(x1, int(self.cells[last - 1]) // height)
+
+        if last - first <= x1 - x0 + 1:
+            # Fewer occupied cells than columns: keep those in the rows of the rectangle
+            rows = self.cells[first:last] % height
+            occupied = np.flatnonzero((rows >= y0) & (rows <= y1)) + first
+            firsts = self.offsets[occupied]
+            lasts = self.offsets[occupied + 1]
+        else:
+            # Every column of the rectangle is a contiguous range of keys, hence of stays
+            columns = np.arange(x0, x1 + 1, dtype=np.int64) * height
+            firsts = self.offsets[np.searchsorted(self.cells, columns + y0)]
+            lasts = self.offsets[np.searchsorted(self.cells, columns + y1, "right")]
+        lengths = lasts - firsts
+        stays = np.repeat(firsts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+        keep = self.leave[stays] > start
+        if stop is not None:
+            keep &= self.arrive[stays] < stop
+        stays = stays[keep]
+        cells = self.cells[np.searchsorted(self.offsets, stays, "right") - 1]
+        return [
+            (self.ids[car], cell // height, cell % height, arrive, leave)
+            for car, cell, arrive, leave in zip(
+                self.car[stays].tolist(),
+                cells.tolist(),
+                self.arrive[stays].tolist(),
+                self.leave[stays].tolist(),
+                strict=True,
+            )
+        ]
+
+    def save(self, path):
+        """Write the index atomically as an uncompressed .npz archive."""
+        with atomic_write(path) as temporary, open(temporary, "wb") as stream:
+            np.savez(
+                stream,
+                field=np.array([self.field.width, self.field.height, self.steps]),
+                ids=np.array(self.ids, dtype=str),
+                cells=self.cells,
+                offsets=self.offsets,
+                arrive=self.arrive,
+                leave=self.leave,
+                car=self.car,
+            )
+
+    @classmethod
+    def load(cls, path) -> "VisitIndex":
+        with np.load(path) as data:
+            width, height, steps = data["field"].tolist()
+            index = cls(Field(width, height), data["ids"].tolist())
+            index.steps = steps
+            for name in ("cells", "offsets", "arrive", "leave", "car"):
+                setattr(index, name, data[name])
+
+        return index
+
+
+def build_visit_index(field: Field, cars: list[Car]) -> tuple[str, VisitIndex]:
+    """Run the trajectory engine on the fleet, return its output and the stays of its cars."""
+    cars = list(cars)
+    index = VisitIndex(field, [car.id for car in cars])
+    result = execute_simulation_multiples_cars_trajectories(field, cars, visits=index)
+    return result, index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto Driving Car Simulation - visit index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Simulate a Part 2 input and index its visits")
+    build.add_argument("input", help="Input in the text format or binary scenario")
+    build.add_argument("index", help="Index file to write")
+    query = commands.add_parser("query", help="List the stays on a cell or in a rectangle")
+    query.add_argument("index", help="Index file written by build")
+    where = query.add_mutually_exclusive_group(required=True)
+    where.add_argument("--cell", type=int, nargs=2, metavar=("X", "Y"))
+    where.add_argument("--region", type=int, nargs=4, metavar=("X0", "Y0", "X1", "Y1"))
+    query.add_argument(
+        "--steps",
+        type=int,
+        nargs=2,
+        default=(0, None),
+        metavar=("START", "STOP"),
+        help="Only list the stays overlapping steps [START, STOP)",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        try:
+            if is_binary_scenario(args.input):
+                field, cars = load_scenario(args.input)
+            else:
+                with open(args.input) as stream:
+                    field, cars = parse_part2_stream(ScenarioParser(), stream)
+                    cars = list(cars)
+        except (OSError, ValueError, ScenarioError) as error:
+            parser.error(str(error))
+        result, index = build_visit_index(field, cars)
+        index.save(args.index)
+        print(result)
+        return
+
+    index = VisitIndex.load(args.index)
+    if args.cell:
+        for car_id, arrive, leave in index.cell(*args.cell, *args.steps):
+            print(f"{car_id} {arrive} {leave}")
+    else:
+        for car_id, x, y, arrive, leave in index.region(*args.region, *args.steps):
+            print(f"{car_id} {x} {y} {arrive} {leave}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import pytest
+
+from src.schemas import Car
+
+
+@pytest.fixture
+def sample_fleet():
+    """The two cars of the part 2 example, they collide at (5, 4) on step 7."""
+    return [
+        Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFFRRL")),
+        Car(id="B", x=7, y=8, direction="W", command_list=list("FFLFFFFFFF")),
+    ]
@@ -0,0 +1,156 @@
+import io
+import json
+
+import pytest
+
+from src.batch import (
+    main,
+    read_jsonl_scenarios,
+    read_text_scenarios,
+    run_batch,
+    run_scenario,
+    write_text_results,
+)
+
+PART1_INPUT = "10 10\n1 2 N\nFFRFFFRRLF"
+PART2_INPUT = "10 10\n\nA\n1 2 N\nFFRFFFFRRL\n\nB\n7 8 W\nFFLFFFFFFF"
+
+
+class TestRunScenario:
+    def test_part1(self):
+        assert run_scenario((1, PART1_INPUT)) == {"result": "4 3 S"}
+
+    def test_part2(self):
+        assert run_scenario((2, PART2_INPUT)) == {"result": "A B\n5 4\n7"}
+
+    def test_invalid_input_is_reported(self):
+        result = run_scenario((1, "10 10\n1 2 N"))
+        assert result == {"error": "Error parsing input lines"}
+
+    @pytest.mark.parametrize(
+        "scenario, error",
+        [
+            ((3, PART1_INPUT), "The part must be 1 or 2"),
+            (("1", PART1_INPUT), "The part must be 1 or 2"),
+            ((True, PART1_INPUT), "The part must be 1 or 2"),
+            ((1, 5), "The input must be a string"),
+            ((2, None), "The input must be a string"),
+        ],
+    )
+    def test_invalid_scenario_is_reported(self, scenario, error):
+        assert run_scenario(scenario) == {"error": error}
+
+
+class TestRunBatch:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_results_keep_input_order(self, workers):
+        scenarios = [(1, PART1_INPUT), (2, PART2_INPUT), (1, "bad")] * 5
+
+        results = list(run_batch(scenarios, workers=workers, chunksize=2))
+        assert (
+            results
+            == [
+                {"result": "4 3 S"},
+                {"result": "A B\n5 4\n7"},
+                {"error": "Error parsing input lines"},
+            ]
+            * 5
+        )
+
+
+class TestScenarioReaders:
+    def test_read_jsonl_scenarios(self):
+        lines = [
+            json.dumps({"part": 1, "input": PART1_INPUT}) + "\n",
+            "\n",
+            json.dumps({"input": PART2_INPUT}) + "\n",
+        ]
+
+        scenarios = list(read_jsonl_scenarios(lines, part=2))
+        assert scenarios == [(1, PART1_INPUT), (2, PART2_INPUT)]
+
+    def test_read_jsonl_scenarios_invalid_record(self):
+        lines = ['{"input": "x"}\n', '{"part": 1}\n', "[1]\n", '{"input": "y"}\n']
+
+        scenarios = list(read_jsonl_scenarios(lines, part=2))
+        assert scenarios[::3] == [(2, "x"), (2, "y")]
+        assert [str(error) for error in scenarios[1:3]] == [
+            "Invalid scenario record on line 2",
+            "Invalid scenario record on line 3",
+        ]
+        assert run_scenario(scenarios[1]) == {"error": "Invalid scenario record on line 2"}
+
+    def test_read_text_scenarios(self):
+        lines = io.StringIO(f"{PART2_INPUT}\n---\n{PART2_INPUT}\n---\n\n")
+
+        scenarios = list(read_text_scenarios(lines, part=2))
+        assert scenarios == [(2, PART2_INPUT), (2, PART2_INPUT)]
+
+    def test_write_text_results(self):
+        stream = io.StringIO()
+
+        write_text_results(stream, [{"result": "4 3 S"}, {"error": "oops"}])
+        assert stream.getvalue() == "4 3 S\n---\nerror: oops\n"
+
+
+class TestBatchMain:
+    def test_jsonl_batch(self, monkeypatch, tmp_path):
+        scenarios = tmp_path / "scenarios.jsonl"
+        scenarios.write_text(
+            json.dumps({"part": 1, "input": PART1_INPUT})
+            + "\n"
+            + json.dumps({"input": PART2_INPUT})
+            + "\n"
+        )
+        output = tmp_path / "results.jsonl"
+        monkeypatch.setattr("sys.argv", ["batch", str(scenarios), "-o", str(output), "-w", "1"])
+
+        main()
+        results = [json.loads(line) for line in output.read_text().splitlines()]
+        assert results == [{"result": "4 3 S"}, {"result": "A B\n5 4\n7"}]
+
+    def test_text_batch(self, monkeypatch, tmp_path, capsys):
+        scenarios = tmp_path / "scenarios.txt"
+        scenarios.write_text(f"{PART1_INPUT}\n---\n{PART1_INPUT}\n")
+        monkeypatch.setattr("sys.argv", ["batch", str(scenarios), "-p", "1", "-w", "1"])
+
+        main()
+        assert capsys.readouterr().out == "4 3 S\n---\n4 3 S\n"
+
+    def test_invalid_part_or_input_is_reported_per_record(self, monkeypatch, tmp_path):
+        scenarios = tmp_path / "scenarios.jsonl"
+        scenarios.write_text(
+            json.dumps({"input": 5})
+            + "\n"
+            + json.dumps({"part": "1", "input": PART1_INPUT})
+            + "\n"
+            + json.dumps({"part": 1, "input": PART1_INPUT})
+            + "\n"
+        )
+        output = tmp_path / "results.jsonl"
+        monkeypatch.setattr("sys.argv", ["batch", str(scenarios), "-o", str(output), "-w", "2"])
+
+        main()
+        results = [json.loads(line) for line in output.read_text().splitlines()]
+        assert results == [
+            {"error": "The input must be a string"},
+            {"error": "The part must be 1 or 2"},
+            {"result": "4 3 S"},
+        ]
+
+    @pytest.mark.parametrize("workers", ["1", "2"])
+    def test_invalid_record_is_reported_per_record(self, monkeypatch, tmp_path, workers):
+        scenarios = tmp_path / "scenarios.jsonl"
+        scenarios.write_text(
+            "not json\n" + json.dumps({"part": 1, "input": PART1_INPUT}) + "\n{}\n"
+        )
+        output = tmp_path / "results.jsonl"
+        monkeypatch.setattr("sys.argv", ["batch", str(scenarios), "-o", str(output), "-w", workers])
+
+        main()
+        results = [json.loads(line) for line in output.read_text().splitlines()]
+        assert results == [
+            {"error": "Invalid scenario record on line 1"},
+            {"result": "4 3 S"},
+            {"error": "Invalid scenario record on line 3"},
+        ]
@@ -0,0 +1,191 @@
+import pytest
+
+from src.binary import (
+    HEADER,
+    RECORD,
+    PackedCommands,
+    is_binary_scenario,
+    load_scenario,
+    pack_commands,
+    unpack_commands,
+    write_scenario,
+)
+from src.convert import convert
+from src.execute import execute_simulation_multiples_cars, execute_simulation_one_car_run_length
+from src.obstacles import Obstacles
+from src.parser import ScenarioError
+from src.schemas import Car, Field
+from src.vectorized import execute_simulation_multiples_cars_vectorized
+
+
+@pytest.fixture
+def scenario(tmp_path):
+    field = Field(width=10, height=10)
+    cars = [
+        Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFFRRL")),
+        Car(id="B", x=7, y=8, direction="W", command_list=list("FFLFFFFFFF")),
+    ]
+    path = tmp_path / "scenario.bin"
+    write_scenario(path, field, cars)
+    return path
+
+
+class TestPacking:
+    @pytest.mark.parametrize("commands", [b"", b"F", b"RL", b"FRL", b"FRLF", b"LLRRFFRLFRL"])
+    def test_round_trip(self, commands):
+        packed = pack_commands(commands)
+
+        assert len(packed) == (len(commands) + 3) // 4
+        assert unpack_commands(packed, len(commands)) == commands
+
+    def test_first_command_in_lowest_bits(self):
+        assert pack_commands(b"RLFR") == bytes([0b01_00_10_01])
+
+
+class TestPackedCommands:
+    def test_sequence_access(self):
+        commands = PackedCommands(pack_commands(b"FRLLF"), 5)
+
+        assert len(commands) == 5
+        assert list(commands) == list(b"FRLLF")
+        assert commands[1] == ord("R")
+        assert commands[-1] == ord("F")
+        assert commands[1:3] == b"RL"
+        assert bytes(commands) == b"FRLLF"
+        assert commands == b"FRLLF"
+
+        with pytest.raises(IndexError):
+            commands[5]
+
+    def test_slices_decode_only_their_bytes(self):
+        program = b"FRLLFFRLRRFLF"
+        commands = PackedCommands(pack_commands(program), len(program))
+
+        for start in range(len(program) + 1):
+            for stop in range(len(program) + 2):
+                assert commands[start:stop] == program[start:stop]
+        assert commands[::2] == program[::2]
+        assert commands[-3:] == program[-3:]
+
+    def test_car_accepts_packed_commands(self):
+        commands = PackedCommands(pack_commands(b"FRL"), 3)
+        car = Car(id="A", x=0, y=0, direction="N", command_list=commands)
+
+        assert car.commands is commands
+        assert car.command_list == ["F", "R", "L"]
+
+
+class TestScenarioFile:
+    def test_layout(self, scenario):
+        data = scenario.read_bytes()
+
+        # Header, two records, two ids and two streams of 10 commands
+        assert len(data) == HEADER.size + 2 * RECORD.size + 2 + 2 * 3
+        assert is_binary_scenario(scenario)
+
+    def test_load_scenario(self, scenario):
+        field, cars = load_scenario(scenario)
+
+        assert (field.width, field.height) == (10, 10)
+        assert [car.id for car in cars] == ["A", "B"]
+        assert [format(car) for car in cars] == ["1 2 N", "7 8 W"]
+        assert isinstance(cars[0].commands, PackedCommands)
+        assert cars[0].commands == b"FFRFFFFRRL"
+
+    @pytest.mark.parametrize(
+        "engine", [execute_simulation_multiples_cars, execute_simulation_multiples_cars_vectorized]
+    )
+    def test_engines_read_packed_commands(self, scenario, engine):
+        field, cars = load_scenario(scenario)
+
+        assert engine(field, cars) == "A B\n5 4\n7"
+
+    def test_single_car_engine_reads_packed_commands(self, tmp_path):
+        path = tmp_path / "scenario.bin"
+        car = Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFRRLF"))
+        write_scenario(path, Field(width=10, height=10), [car])
+
+        field, cars = load_scenario(path)
+        assert format(execute_simulation_one_car_run_length(field, cars[0])) == "4 3 S"
+
+    def test_obstacles(self, tmp_path):
+        path = tmp_path / "scenario.bin"
+        obstacles = Obstacles(10, 10, [(3, 0, 3, 8), (6, 6, 9, 9)])
+        car = Car(id="A", x=0, y=0, direction="E", command_list="FFFFFFLF")
+        write_scenario(path, Field(width=10, height=10, obstacles=obstacles), [car])
+
+        field, cars = load_scenario(path)
+        assert field.obstacles == obstacles
+        assert format(execute_simulation_one_car_run_length(field, cars[0])) == "2 1 N"
+
+    def test_load_invalid_file(self, tmp_path):
+        path = tmp_path / "scenario.txt"
+        path.write_text("10 10\n1 2 N\nF")
+
+        assert not is_binary_scenario(path)
+        with pytest.raises(ValueError):
+            load_scenario(path)
+
+    def test_load_without_cars(self, tmp_path):
+        path = tmp_path / "scenario.bin"
+        write_scenario(path, Field(width=10, height=10), [])
+
+        with pytest.raises(ValueError, match="^No cars defined in the input$"):
+            load_scenario(path)
+
+    def test_load_truncated_file(self, scenario):
+        scenario.write_bytes(scenario.read_bytes()[: HEADER.size + 10])
+
+        with pytest.raises(ValueError):
+            load_scenario(scenario)
+
+    def test_load_truncated_command_stream(self, scenario):
+        scenario.write_bytes(scenario.read_bytes()[:-3])
+
+        with pytest.raises(ValueError, match="Car record 2: truncated"):
+            load_scenario(scenario)
+
+    @pytest.mark.parametrize(
+        "car, message",
+        [
+            (Car(id="B", x=7, y=8, direction=7), "invalid direction 7"),
+            (Car(id="B", x=10, y=8, direction="W"), "must be in the field"),
+            (Car(id="B", x=7, y=10, direction="W"), "must be in the field"),
+            (Car(id="A", x=7, y=8, direction="W"), "duplicate car ID A"),
+            (Car(id="", x=7, y=8, direction="W"), "car ID is empty"),
+        ],
+    )
+    def test_load_invalid_record(self, tmp_path, car, message):
+        path = tmp_path / "scenario.bin"
+        write_scenario(
+            path, Field(width=10, height=10), [Car(id="A", x=1, y=2, direction="N"), car]
+        )
+
+        with pytest.raises(ValueError, match=f"Car record 2: .*{message}"):
+            load_scenario(path)
+
+    def test_load_car_on_obstacle(self, tmp_path):
+        path = tmp_path / "scenario.bin"
+        field = Field(width=10, height=10, obstacles=Obstacles(10, 10, [(3, 0, 3, 8)]))
+        write_scenario(path, field, [Car(id="A", x=3, y=4, direction="N")])
+
+        with pytest.raises(
+            ValueError, match="Car record 1: the starting position is on an obstacle"
+        ):
+            load_scenario(path)
+
+
+class TestConvert:
+    def test_convert_part2(self, tmp_path):
+        path = tmp_path / "scenario.bin"
+        convert("10 10\n\nA\n1 2 N\nFRLF\n\nB\n5 5 E\nRRFF", 2, path)
+
+        _, cars = load_scenario(path)
+        assert [(car.id, format(car), bytes(car.commands)) for car in cars] == [
+            ("A", "1 2 N", b"FRLF"),
+            ("B", "5 5 E", b"RRFF"),
+        ]
+
+    def test_convert_invalid_input(self, tmp_path):
+        with pytest.raises(ScenarioError):
+            convert("10 10\n1 2 N", 1, tmp_path / "scenario.bin")
@@ -0,0 +1,173 @@
+import fcntl
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.binary import load_scenario, write_scenario
+from src.cache import KEY_VERSION, ResultCache, disable_cache, get_cache, scenario_key
+from src.execute import disable_stats
+from src.main import main
+from src.obstacles import Obstacles
+from src.repeat import parse_program
+from src.schemas import Car, Field
+
+PART1_INPUT = "10 10\n1 2 N\nFFRFFFRRLF"
+
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    yield
+    disable_cache()
+    disable_stats()
+
+
+def fill_cache(directory, keys):
+    cache = ResultCache(directory, max_bytes=1 << 20)
+    for key in keys:
+        cache.put(key, "x" * 100)
+
+
+class TestScenarioKey:
+    def test_same_scenario_from_any_input(self, tmp_path, sample_fleet):
+        field = Field(10, 10)
+        write_scenario(tmp_path / "fleet.bin", field, sample_fleet)
+
+        assert scenario_key(field, sample_fleet) == scenario_key(
+            *load_scenario(tmp_path / "fleet.bin")
+        )
+
+    def test_scenarios_differ(self, sample_fleet):
+        fleet = sample_fleet
+        turned = [car.copy() for car in fleet]
+        turned[1].direction = "E"
+
+        assert scenario_key(Field(10, 10), fleet) != scenario_key(Field(10, 10), turned)
+        assert scenario_key(Field(10, 10), fleet) != scenario_key(Field(10, 11), fleet)
+        blocked = Field(10, 10, Obstacles(10, 10, [(0, 0, 0, 0)]))
+        assert scenario_key(Field(10, 10), fleet) != scenario_key(blocked, fleet)
+
+    def test_repeated_commands_are_not_expanded(self):
+        car = Car(id="A", x=1, y=2, direction="N", command_list=parse_program("(FR)*10000000000"))
+
+        assert scenario_key(Field(10, 10), [car]) != scenario_key(
+            Field(10, 10), [Car(id="A", x=1, y=2, direction="N", command_list="FR")]
+        )
+
+    def test_key_version(self, monkeypatch, sample_fleet):
+        key = scenario_key(Field(10, 10), sample_fleet)
+        monkeypatch.setattr("src.cache.KEY_VERSION", KEY_VERSION + 1)
+
+        assert scenario_key(Field(10, 10), sample_fleet) != key
+
+
+class TestResultCache:
+    def test_hits_and_misses(self, tmp_path):
+        cache = ResultCache(tmp_path)
+
+        assert cache.get("ab12") is None
+        cache.put("ab12", "A B\n5 4\n7")
+        assert cache.get("ab12") == "A B\n5 4\n7"
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert ResultCache(tmp_path).totals() == (len("A B\n5 4\n7"), 1, 1)
+
+    def test_lookups_do_not_wait_for_the_lock(self, tmp_path):
+        cache = ResultCache(tmp_path)
+        cache.put("ab12", "4 3 S")
+
+        # Another process holding the lock, e.g. while evicting
+        with open(cache.state_path, "rb") as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX)
+            assert cache.get("ab12") == "4 3 S"
+            assert cache.get("cd34") is None
+        assert cache.totals() == (5, 1, 1)
+
+    def test_save_waits_for_the_lock(self, tmp_path):
+        cache = ResultCache(tmp_path)
+        cache.put("ab12", "4 3 S")
+        with open(cache.state_path, "rb") as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX)
+            cache.get("ab12")
+
+        cache.save()
+        assert (cache.unsaved_hits, cache.unsaved_misses) == (0, 0)
+        assert ResultCache(tmp_path).totals() == (5, 1, 0)
+
+    def test_result_evicted_after_its_read_is_a_hit(self, monkeypatch, tmp_path):
+        cache = ResultCache(tmp_path)
+        cache.put("ab12", "4 3 S")
+
+        def evicted(path):
+            raise FileNotFoundError(path)
+
+        monkeypatch.setattr("src.cache.os.utime", evicted)
+        assert cache.get("ab12") == "4 3 S"
+        assert (cache.hits, cache.misses) == (1, 0)
+
+    def test_least_recently_used_are_evicted(self, tmp_path):
+        cache = ResultCache(tmp_path, max_bytes=250)
+        for age, key in enumerate(["aa01", "bb02"]):
+            cache.put(key, "x" * 100)
+            os.utime(cache.path(key), ns=(age * 10**9, age * 10**9))
+        # Reading aa01 makes bb02 the least recently used
+        assert cache.get("aa01") is not None
+
+        cache.put("cc03", "x" * 100)
+        assert cache.get("bb02") is None
+        assert cache.get("aa01") is not None
+        assert cache.get("cc03") is not None
+        assert cache.totals()[0] == 200
+
+    def test_rewriting_a_result_keeps_the_size(self, tmp_path):
+        cache = ResultCache(tmp_path)
+        cache.put("ab12", "4 3 S")
+        cache.put("ab12", "4 3 S")
+
+        assert cache.totals()[0] == 5
+
+    def test_concurrent_processes(self, tmp_path):
+        batches = [[f"{worker:02x}{index:04x}" for index in range(50)] for worker in range(4)]
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(fill_cache, [tmp_path] * 4, batches))
+
+        cache = ResultCache(tmp_path)
+        assert cache.totals()[0] == 4 * 50 * 100
+        assert all(cache.get(key) == "x" * 100 for batch in batches for key in batch)
+
+
+class TestMainWithCache:
+    def test_second_run_is_a_hit(self, monkeypatch, capsys, tmp_path):
+        arguments = ["program", "-p", "1", "--cache", str(tmp_path), "--stats", PART1_INPUT]
+        monkeypatch.setattr("sys.argv", arguments)
+
+        main()
+        main()
+        output = capsys.readouterr()
+        assert output.out == "4 3 S\n4 3 S\n"
+        assert "cache hits: 1\ncache misses: 0\ncache total hits: 1\ncache total misses: 1" in (
+            output.err
+        )
+        assert get_cache().totals() == (len("4 3 S"), 1, 1)
+
+    def test_hit_counted_when_the_lock_was_taken(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(
+            "sys.argv", ["program", "-p", "1", "--cache", str(tmp_path), PART1_INPUT]
+        )
+        main()
+        get = ResultCache.get
+
+        def contended_get(cache, key):
+            with open(cache.state_path, "rb") as stream:
+                fcntl.flock(stream, fcntl.LOCK_EX)
+                return get(cache, key)
+
+        monkeypatch.setattr(ResultCache, "get", contended_get)
+        main()
+        assert ResultCache(tmp_path).totals() == (len("4 3 S"), 1, 1)
+
+    def test_invalid_cache_size(self, monkeypatch, tmp_path):
+        arguments = ["program", "-p", "1", "--cache", str(tmp_path), "--cache-size", "0"]
+        monkeypatch.setattr("sys.argv", [*arguments, PART1_INPUT])
+
+        with pytest.raises(SystemExit):
+            main()
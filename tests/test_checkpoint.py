@@ -0,0 +1,131 @@
+import pytest
+
+from src.binary import write_scenario
+from src.checkpoint import Checkpoint, load_checkpoint, save_checkpoint
+from src.execute import execute_simulation_multiples_cars
+from src.generator import generate_scenario
+from src.schemas import Car, Field
+
+
+def split_commands(cars, size):
+    """The commands of the fleet as successive batches of `size` commands per car."""
+    length = len(cars[0].commands)
+    return [
+        {car.id: bytes(car.commands[start : start + size]) for car in cars}
+        for start in range(0, length, size)
+    ]
+
+
+class TestResume:
+    @pytest.mark.parametrize("seed", range(12))
+    def test_batches_match_a_full_replay(self, seed):
+        field, cars = generate_scenario(
+            seed=seed, width=8, height=8, cars=6, commands=60, forward_ratio=0.8
+        )
+        reference = [car.copy() for car in cars]
+        expected = execute_simulation_multiples_cars(field, reference)
+
+        checkpoint = Checkpoint(field, [car.copy(b"") for car in cars])
+        for batch in split_commands(cars, 7):
+            result = checkpoint.resume(batch)
+        assert result == expected
+        assert [format(car) for car in checkpoint.cars] == [format(car) for car in reference]
+
+    def test_one_car(self):
+        checkpoint = Checkpoint(Field(10, 10), [Car("A", 1, 2, "N")])
+
+        assert checkpoint.resume({"A": "FFRFF"}) == "3 4 E"
+        assert checkpoint.resume({"A": "FRRL"}) == "4 4 S"
+        assert checkpoint.step == 9
+
+    def test_collision_ends_the_simulation(self):
+        field = Field(width=10, height=10)
+        cars = [Car("A", 1, 2, "N"), Car("B", 7, 8, "W")]
+        checkpoint = Checkpoint(field, cars)
+
+        assert checkpoint.resume({"A": "FFRFF", "B": "FFLFF"}) == "no collision"
+        result = checkpoint.resume({"A": "FFRRL", "B": "FFFFF"})
+        assert result == "A B\n5 4\n7"
+        assert checkpoint.step == 7
+        assert checkpoint.resume({"A": "F", "B": "F"}) == result
+
+    def test_pending_commands_are_played_first(self):
+        checkpoint = Checkpoint(Field(10, 10), [Car("A", 1, 2, "N", "FF")])
+
+        assert checkpoint.resume({"A": "RF"}) == "2 4 E"
+
+    def test_unknown_car(self):
+        checkpoint = Checkpoint(Field(10, 10), [Car("A", 1, 2, "N")])
+
+        with pytest.raises(ValueError, match="Unknown car 'B'"):
+            checkpoint.resume({"B": "F"})
+
+    def test_invalid_commands(self):
+        checkpoint = Checkpoint(Field(10, 10), [Car("A", 1, 2, "N")])
+
+        with pytest.raises(ValueError, match="F, R and L"):
+            checkpoint.resume({"A": "FX"})
+
+    def test_fleet_commands_of_different_lengths(self):
+        cars = [Car("A", 1, 2, "N"), Car("B", 1, 5, "S")]
+        checkpoint = Checkpoint(Field(10, 10), cars)
+
+        # B stops after one move and waits, A runs into it on the second step
+        assert checkpoint.resume({"A": "FF", "B": "F"}) == "B A\n1 4\n2"
+        assert checkpoint.step == 2
+
+    def test_unequal_batches_differ_from_a_full_replay(self):
+        cars = [Car("A", 1, 2, "N"), Car("B", 1, 6, "S")]
+        checkpoint = Checkpoint(Field(10, 10), [car.copy() for car in cars])
+
+        # B waits for the second batch while A moves, a replay has B move right away
+        assert checkpoint.resume({"A": "FF", "B": ""}) == "no collision"
+        assert checkpoint.resume({"A": "F", "B": "FFF"}) == "A B\n1 5\n3"
+        replay = [Car("A", 1, 2, "N", "FFF"), Car("B", 1, 6, "S", "FFF")]
+        assert execute_simulation_multiples_cars(Field(10, 10), replay) == "A B\n1 4\n2"
+
+
+class TestCheckpointFile:
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "state.ckpt"
+        field, cars = generate_scenario(seed=1, width=50, height=50, cars=5, commands=40)
+        batches = split_commands(cars, 20)
+        reference = [car.copy() for car in cars]
+        expected = execute_simulation_multiples_cars(field, reference)
+
+        checkpoint = Checkpoint(field, [car.copy(b"") for car in cars])
+        checkpoint.resume(batches[0])
+        save_checkpoint(path, checkpoint)
+
+        loaded = load_checkpoint(path)
+        assert loaded.field == field
+        assert loaded.step == 20
+        assert loaded.result is None
+        assert loaded.resume(batches[1]) == expected
+        assert [format(car) for car in loaded.cars] == [format(car) for car in reference]
+
+    def test_collision_result_is_kept(self, tmp_path):
+        path = tmp_path / "state.ckpt"
+        checkpoint = Checkpoint(Field(10, 10), [Car("A", 1, 2, "N"), Car("B", 7, 8, "W")])
+        checkpoint.resume({"A": "FFRFFFFRRL", "B": "FFLFFFFFFF"})
+        save_checkpoint(path, checkpoint)
+
+        loaded = load_checkpoint(path)
+        assert (loaded.step, loaded.result) == (7, "A B\n5 4\n7")
+        assert loaded.resume({"A": "F", "B": "F"}) == "A B\n5 4\n7"
+
+    def test_overwrite_a_mapped_checkpoint(self, tmp_path):
+        path = tmp_path / "state.ckpt"
+        save_checkpoint(path, Checkpoint(Field(10, 10), [Car("A", 1, 2, "N", "FFR")]))
+
+        loaded = load_checkpoint(path)
+        save_checkpoint(path, loaded)
+        assert bytes(loaded.cars[0].commands) == b"FFR"
+        assert load_checkpoint(path).resume() == "1 4 E"
+
+    def test_scenario_without_trailer(self, tmp_path):
+        path = tmp_path / "fleet.bin"
+        write_scenario(path, Field(10, 10), [Car("A", 1, 2, "N", "FF")])
+
+        with pytest.raises(ValueError, match="Not a checkpoint file"):
+            load_checkpoint(path)
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from src.command_index import CommandIndex
+from src.execute import execute_simulation_one_car
+from src.obstacles import Obstacles
+from src.schemas import Car, Field
+
+
+def replay(field, car, step):
+    replayed = car.copy(car.commands[:step])
+    execute_simulation_one_car(field, replayed)
+    return replayed.x, replayed.y, replayed.heading
+
+
+class TestCommandIndex:
+    def test_sample_from_instructions(self):
+        field = Field(width=10, height=10)
+        car = Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFRRLF"))
+
+        index = CommandIndex(field, car, block_size=2)
+        assert index.state_at(0) == (1, 2, 0)
+        assert index.state_at(5) == (3, 4, 1)
+        assert format(index.car_at(10)) == "4 3 S"
+        assert index.car_at(7).commands == b"RLF"
+
+    def test_moves_against_an_edge(self):
+        field = Field(width=3, height=3)
+        car = Car(id="A", x=1, y=1, direction="N", command_list="FFFFRRFF")
+
+        index = CommandIndex(field, car, block_size=2)
+        assert [index.state_at(step)[:2] for step in range(len(car.commands) + 1)] == [
+            (1, 1),
+            (1, 2),
+            (1, 2),
+            (1, 2),
+            (1, 2),
+            (1, 2),
+            (1, 2),
+            (1, 1),
+            (1, 0),
+        ]
+
+    def test_no_commands(self):
+        index = CommandIndex(Field(5, 5), Car(id="A", x=1, y=2, direction="W"))
+
+        assert len(index) == 0
+        assert index.state_at(0) == (1, 2, 3)
+
+    def test_step_out_of_range(self):
+        index = CommandIndex(Field(5, 5), Car(id="A", x=1, y=2, direction="W", command_list="F"))
+
+        with pytest.raises(IndexError):
+            index.state_at(2)
+
+    @pytest.mark.parametrize("block_size", [1, 3, 64])
+    @pytest.mark.parametrize("seed", range(10))
+    def test_matches_replay(self, seed, block_size):
+        rng = random.Random(seed)
+        field = Field(width=rng.randint(1, 20), height=rng.randint(1, 20))
+        commands = bytes(rng.choices(b"FRL", [rng.uniform(0.5, 3), 0.5, 0.5], k=400))
+        car = Car("A", rng.randrange(field.width), rng.randrange(field.height), 0, commands)
+
+        index = CommandIndex(field, car, block_size=block_size)
+        # Queries in random order also exercise the replayed positions kept between them
+        for step in rng.sample(range(len(commands) + 1), 50):
+            assert index.state_at(step) == replay(field, car, step)
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_obstacles_match_replay(self, seed):
+        rng = random.Random(seed)
+        field = Field(width=40, height=40)
+        rectangles = []
+        for _ in range(8):
+            x0, y0 = rng.randrange(40), rng.randrange(40)
+            if (x0, y0) != (20, 20):
+                rectangles.append((x0, y0, x0, y0))
+        field.obstacles = Obstacles(40, 40, rectangles)
+        car = Car("A", 20, 20, 0, bytes(rng.choices(b"FFFRL", k=400)))
+
+        index = CommandIndex(field, car, block_size=8)
+        for step in rng.sample(range(len(car.commands) + 1), 50):
+            assert index.state_at(step) == replay(field, car, step)
@@ -1,7 +1,23 @@
+import copy
+import random
+
 import pytest
 
-from src.execute import execute_simulation_multiples_cars, execute_simulation_one_car
+from src.execute import (
+    build_occupancy,
+    execute_simulation_multiples_cars,
+    execute_simulation_one_car,
+    execute_simulation_one_car_run_length,
+    pick_bucket_size,
+    pick_occupancy_backend,
+    split_by_neighbourhood,
+)
+from src.generator import generate_scenario
+from src.obstacles import Obstacles
+from src.repeat import parse_program
 from src.schemas import Car, Field
+from src.trajectories import execute_simulation_multiples_cars_trajectories
+from src.vectorized import execute_simulation_multiples_cars_vectorized
 
 
 @pytest.fixture
@@ -9,6 +25,18 @@ def field():
     return Field(width=5, height=5)
 
 
+def add_obstacles(rng, field, cars, count, size, dense=None):
+    """Block random rectangles of the field, away from the starting cells of the cars."""
+    rectangles = []
+    for _ in range(count):
+        x0, y0 = rng.randrange(field.width), rng.randrange(field.height)
+        x1 = min(x0 + rng.randrange(size), field.width - 1)
+        y1 = min(y0 + rng.randrange(size), field.height - 1)
+        if not any(x0 <= car.x <= x1 and y0 <= car.y <= y1 for car in cars):
+            rectangles.append((x0, y0, x1, y1))
+    field.obstacles = Obstacles(field.width, field.height, rectangles, dense=dense)
+
+
 class TestMoveMultiplesCars:
     def test_no_collision(self, field):
         car1 = Car(id="A", x=0, y=0, direction="N", command_list=["F", "F"])
@@ -77,6 +105,23 @@ class TestMoveMultiplesCars:
         result = execute_simulation_multiples_cars(field, [car1, car2, car3])
         assert result == "C A\n2 0\n2"
 
+    def test_programs_of_different_lengths(self, field):
+        # "R" sorts after "FFF": the longest program is found by length
+        car1 = Car(id="A", x=0, y=0, direction="N", command_list=["R"])
+        car2 = Car(id="B", x=2, y=0, direction="N", command_list=["F", "F", "F"])
+
+        result = execute_simulation_multiples_cars(field, [car1, car2])
+        assert result == "no collision"
+        assert format(car1) == "0 0 E"
+        assert format(car2) == "2 3 N"
+
+    def test_finished_cars_stay_on_the_field(self, field):
+        car1 = Car(id="A", x=2, y=4, direction="S", command_list=["F"])
+        car2 = Car(id="B", x=2, y=0, direction="N", command_list=["F", "F", "F"])
+
+        result = execute_simulation_multiples_cars(field, [car1, car2])
+        assert result == "A B\n2 3\n3"
+
 
 class TestMoveOneCar:
     def test_basic_forward_movement(self, field):
@@ -166,3 +211,345 @@ class TestMoveOneCar:
         assert result.y == 2
         assert result.x == 2
         assert result.direction == "N"  # Should complete a full 360° rotation
+
+
+class TestOccupancyIndex:
+    def test_build_occupancy_keeps_fleet_order(self):
+        car1 = Car(id="A", x=1, y=1, direction="N", command_list=[])
+        car2 = Car(id="B", x=1, y=1, direction="S", command_list=[])
+        car3 = Car(id="C", x=2, y=1, direction="S", command_list=[])
+
+        field = Field(width=3, height=2)
+
+        occupancy = build_occupancy(field, [car1, car2, car3])
+        assert occupancy == {3: [0, 1], 5: [2]}
+        assert build_occupancy(field, [car1, car2, car3], [1, 2]) == {3: [1], 5: [2]}
+        assert build_occupancy(field, [car1, car2, car3], dense=True) == [
+            None,
+            None,
+            None,
+            [0, 1],
+            None,
+            [2],
+        ]
+
+    def test_pick_occupancy_backend(self):
+        assert pick_occupancy_backend(Field(width=10, height=10), 50) == "dense"
+        assert pick_occupancy_backend(Field(width=1000, height=1000), 50) == "sparse"
+        assert pick_occupancy_backend(Field(width=10**9, height=10**9), 50) == "sparse"
+        # Crowded, but too large for a list over every cell
+        assert pick_occupancy_backend(Field(width=10**4, height=10**4), 10**6) == "sparse"
+
+    def test_unknown_backend(self, field):
+        with pytest.raises(ValueError, match="Unknown occupancy backend"):
+            execute_simulation_multiples_cars(field, [Car("A", 0, 0, "N")], backend="tree")
+
+    @pytest.mark.parametrize("bucket_size", [1, 16])
+    @pytest.mark.parametrize("seed", range(10))
+    def test_backends_match(self, seed, bucket_size):
+        field, cars = generate_scenario(
+            seed=seed, width=60, height=60, cars=30, commands=150, forward_ratio=0.9
+        )
+        rng = random.Random(seed)
+        for car in cars:
+            car.commands = car.commands[: rng.randrange(len(car.commands) + 1)]
+        # Some cars start on a cell shared with another one
+        for car in rng.sample(cars[1:], 3):
+            car.x, car.y = cars[0].x, cars[0].y
+        sparse = copy.deepcopy(cars)
+
+        expected = execute_simulation_multiples_cars(field, sparse, bucket_size, backend="sparse")
+        result = execute_simulation_multiples_cars(field, cars, bucket_size, backend="dense")
+        assert result == expected
+        assert [format(car) for car in cars] == [format(car) for car in sparse]
+
+    def test_collision_reports_first_car_of_a_shared_cell(self, field):
+        car1 = Car(id="A", x=0, y=1, direction="E", command_list=["F"])
+        car2 = Car(id="B", x=1, y=1, direction="N", command_list=["L"])
+        car3 = Car(id="C", x=1, y=1, direction="N", command_list=["R"])
+
+        result = execute_simulation_multiples_cars(field, [car1, car2, car3])
+        assert result == "B A\n1 1\n1"
+
+    def test_leaving_a_shared_cell_keeps_the_other_occupant(self, field):
+        car1 = Car(id="A", x=1, y=1, direction="N", command_list=["F", "R"])
+        car2 = Car(id="B", x=1, y=1, direction="N", command_list=["R", "R"])
+        car3 = Car(id="C", x=0, y=1, direction="E", command_list=["R", "L"])
+        car4 = Car(id="D", x=2, y=1, direction="S", command_list=["R", "F"])
+
+        result = execute_simulation_multiples_cars(field, [car1, car2, car3, car4])
+        assert result == "B D\n1 1\n2"
+
+
+class TestMoveOneCarRunLength:
+    def test_sample_from_instructions(self):
+        field = Field(width=10, height=10)
+        car = Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFRRLF"))
+
+        result = execute_simulation_one_car_run_length(field, car)
+        assert format(result) == "4 3 S"
+
+    def test_forward_run_is_clamped_to_the_field(self, field):
+        car = Car(id="A", x=1, y=1, direction="E", command_list=["F"] * 1000)
+
+        result = execute_simulation_one_car_run_length(field, car)
+        assert format(result) == "4 1 E"
+
+    def test_rotation_run_is_folded(self, field):
+        car = Car(id="A", x=2, y=2, direction="N", command_list=list("RRRRRLLLLLLL"))
+
+        result = execute_simulation_one_car_run_length(field, car)
+        assert format(result) == "2 2 S"
+
+    def test_empty_command_list(self, field):
+        car = Car(id="A", x=2, y=2, direction="W", command_list=[])
+
+        result = execute_simulation_one_car_run_length(field, car)
+        assert format(result) == "2 2 W"
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_matches_reference_engine(self, seed):
+        rng = random.Random(seed)
+        field = Field(width=rng.randint(1, 12), height=rng.randint(1, 12))
+        car = Car(
+            id="A",
+            x=rng.randrange(field.width),
+            y=rng.randrange(field.height),
+            direction=rng.choice("NESW"),
+            command_list=rng.choices("FFFFRL", k=200),
+        )
+
+        expected = execute_simulation_one_car(field, copy.deepcopy(car))
+        result = execute_simulation_one_car_run_length(field, car)
+        assert format(result) == format(expected)
+
+
+class TestFastForward:
+    def test_translation_loop(self):
+        field = Field(width=10**13, height=10**13)
+        car = Car(
+            id="A", x=5, y=5, direction="N", command_list=parse_program("(FFRFL)*1000000000000")
+        )
+
+        result = execute_simulation_one_car_run_length(field, car)
+        assert format(result) == "1000000000005 2000000000005 N"
+
+    def test_loop_stuck_in_a_corner(self, field):
+        car = Car(
+            id="A", x=1, y=1, direction="N", command_list=parse_program("(FFFFFFRFFFFFFFL)*1000000")
+        )
+
+        result = execute_simulation_one_car_run_length(field, car)
+        assert format(result) == "4 4 N"
+
+    def test_rotating_loop_comes_back(self):
+        field = Field(width=100, height=100)
+        car = Car(id="A", x=50, y=50, direction="N", command_list=parse_program("(FFR)*4003"))
+
+        result = execute_simulation_one_car_run_length(field, car)
+        # Every 4 repetitions drive around a square back to the start
+        assert format(result) == "52 50 W"
+
+    @pytest.mark.parametrize(
+        "program", ["(F(FR)*3L)*7", "R(F(F)*9R(LF)*2)*13", "(FFFL)*0F", "((((F)*2)*2)*2R)*5"]
+    )
+    @pytest.mark.parametrize("seed", range(10))
+    def test_matches_expanded_program(self, seed, program):
+        rng = random.Random(seed)
+        field = Field(width=rng.randint(1, 12), height=rng.randint(1, 12))
+        x, y, direction = rng.randrange(field.width), rng.randrange(field.height), rng.randrange(4)
+        commands = parse_program(program)
+
+        expected = execute_simulation_one_car(field, Car("A", x, y, direction, bytes(commands)))
+        result = execute_simulation_one_car_run_length(field, Car("A", x, y, direction, commands))
+        assert format(result) == format(expected)
+
+
+class TestRepeatedFleets:
+    def test_last_car_is_fast_forwarded(self):
+        car1 = Car(id="A", x=0, y=0, direction="N", command_list=parse_program("(F)*1000000000"))
+        car2 = Car(id="B", x=5, y=5, direction="E", command_list="FF")
+
+        result = execute_simulation_multiples_cars(Field(width=10, height=10), [car1, car2])
+        assert result == "no collision"
+        assert (format(car1), format(car2)) == ("0 9 N", "7 5 E")
+
+    def test_last_car_runs_into_a_stopped_car(self):
+        program = parse_program("(FFRFL)*1000000000")
+        car1 = Car(id="A", x=0, y=0, direction="E", command_list=program)
+        car2 = Car(id="B", x=7, y=0, direction="N", command_list="R")
+
+        result = execute_simulation_multiples_cars(Field(width=10, height=10), [car1, car2])
+        assert result == "B A\n7 0\n16"
+
+    def test_nested_repetitions_after_the_fleet_stopped(self):
+        program = parse_program("F((FR)*1000000L(F)*3)*1000000000")
+        car1 = Car(id="A", x=0, y=0, direction="N", command_list="FF")
+        car2 = Car(id="B", x=9, y=9, direction="S", command_list=program)
+
+        result = execute_simulation_multiples_cars(Field(width=10, height=10), [car1, car2])
+        assert result == "no collision"
+
+    @pytest.mark.parametrize("bucket_size", [1, 16])
+    @pytest.mark.parametrize("seed", range(30))
+    def test_matches_expanded_programs(self, seed, bucket_size):
+        rng = random.Random(seed)
+        size = rng.randint(4, 40)
+        field, cars = generate_scenario(
+            seed=seed, width=size, height=size, cars=rng.randint(2, 5), commands=0
+        )
+        for car in cars:
+            body = "".join(rng.choices("FFFRL", k=rng.randint(1, 6)))
+            car.commands = parse_program(f"{body[:2]}({body})*{rng.randint(1, 300)}")
+        reference = [car.copy(bytes(car.commands)) for car in cars]
+
+        expected = execute_simulation_multiples_cars(field, reference, bucket_size=bucket_size)
+        result = execute_simulation_multiples_cars(field, cars, bucket_size=bucket_size)
+        assert result == expected
+        assert [format(car) for car in cars] == [format(car) for car in reference]
+
+    @pytest.mark.parametrize("seed", range(40))
+    def test_last_car_matches_expanded_program(self, seed):
+        rng = random.Random(seed)
+        size = rng.randint(4, 12)
+        field, cars = generate_scenario(
+            seed=seed, width=size, height=size, cars=rng.randint(2, 8), commands=0
+        )
+        for car in cars:
+            body = "".join(rng.choices("FFFRL", k=rng.randint(1, 6)))
+            car.commands = parse_program(f"{body[:2]}({body})*{rng.randint(1, 3)}")
+        # The last car keeps driving among the stopped ones
+        body = "".join(rng.choices("FFFRL", k=rng.randint(1, 8)))
+        cars[-1].commands = parse_program(f"({body})*{rng.randint(10, 300)}R")
+        reference = [car.copy(bytes(car.commands)) for car in cars]
+
+        expected = execute_simulation_multiples_cars(field, reference)
+        result = execute_simulation_multiples_cars(field, cars)
+        assert result == expected
+        assert [format(car) for car in cars] == [format(car) for car in reference]
+
+
+class TestCollisionScheduling:
+    def test_split_by_neighbourhood(self):
+        car1 = Car(id="A", x=0, y=0, direction="N", command_list=[])
+        car2 = Car(id="B", x=15, y=15, direction="N", command_list=[])
+        car3 = Car(id="C", x=40, y=0, direction="N", command_list=[])
+
+        crowded, isolated = split_by_neighbourhood([car1, car2, car3], bucket_size=10)
+        assert crowded == [0, 1]
+        assert isolated == [2]
+
+    def test_pick_bucket_size(self):
+        assert pick_bucket_size(Field(width=600, height=600), 100) == 10
+        assert pick_bucket_size(Field(width=5, height=5), 2) == 0
+
+    def test_isolated_cars_stop_with_the_fleet(self):
+        field = Field(width=100, height=100)
+        car1 = Car(id="A", x=0, y=0, direction="E", command_list=["F", "F", "F"])
+        car2 = Car(id="B", x=50, y=50, direction="N", command_list=["F", "F", "F"])
+        car3 = Car(id="C", x=2, y=0, direction="W", command_list=["R", "F", "F"])
+        car4 = Car(id="D", x=90, y=10, direction="S", command_list=["F", "F", "F"])
+
+        result = execute_simulation_multiples_cars(field, [car2, car1, car3, car4], 16)
+        assert result == "C A\n2 0\n2"
+        # B played the colliding step, D did not
+        assert format(car2) == "50 52 N"
+        assert format(car4) == "90 9 S"
+
+    @pytest.mark.parametrize("bucket_size", [16, 40])
+    @pytest.mark.parametrize("seed", range(15))
+    def test_matches_unscheduled_run(self, seed, bucket_size):
+        field, cars = generate_scenario(
+            seed=seed, width=120, height=80, cars=40, commands=200, forward_ratio=0.9
+        )
+        reference = copy.deepcopy(cars)
+
+        expected = execute_simulation_multiples_cars(field, reference, bucket_size=1)
+        result = execute_simulation_multiples_cars(field, cars, bucket_size=bucket_size)
+        assert result == expected
+        assert [format(car) for car in cars] == [format(car) for car in reference]
+
+    @pytest.mark.parametrize("bucket_size", [1, 16])
+    @pytest.mark.parametrize("seed", range(10))
+    def test_ragged_fleet_matches_vectorized(self, seed, bucket_size):
+        field, cars = generate_scenario(
+            seed=seed, width=150, height=150, cars=20, commands=120, forward_ratio=0.9
+        )
+        rng = random.Random(seed)
+        for car in cars:
+            car.commands = car.commands[: rng.randrange(len(car.commands) + 1)]
+        reference = copy.deepcopy(cars)
+
+        expected = execute_simulation_multiples_cars_vectorized(field, reference)
+        result = execute_simulation_multiples_cars(field, cars, bucket_size=bucket_size)
+        assert result == expected
+        assert [format(car) for car in cars] == [format(car) for car in reference]
+
+
+class TestObstacles:
+    @pytest.mark.parametrize(
+        "engine", [execute_simulation_one_car, execute_simulation_one_car_run_length]
+    )
+    def test_car_stops_before_an_obstacle(self, engine):
+        field = Field(width=10, height=10, obstacles=Obstacles(10, 10, [(3, 0, 3, 8)]))
+
+        assert format(engine(field, Car("A", 0, 0, "E", "FFFFFFLF"))) == "2 1 N"
+        assert format(engine(field, Car("A", 0, 9, "E", "FFFFFF"))) == "6 9 E"
+
+    def test_obstacles_are_not_collisions(self):
+        field = Field(width=10, height=10, obstacles=Obstacles(10, 10, [(5, 0, 5, 9)]))
+        car1 = Car(id="A", x=4, y=0, direction="E", command_list="FFLF")
+        car2 = Car(id="B", x=6, y=1, direction="W", command_list="FFRF")
+
+        assert execute_simulation_multiples_cars(field, [car1, car2]) == "no collision"
+        assert (format(car1), format(car2)) == ("4 1 N", "6 2 N")
+
+    @pytest.mark.parametrize("program", ["(FFRFL)*1000", "(F(FR)*3L)*7", "((((F)*2)*2)*2R)*5"])
+    @pytest.mark.parametrize("seed", range(10))
+    def test_repeated_commands_match_expanded_program(self, seed, program):
+        rng = random.Random(seed)
+        field = Field(width=rng.randint(1, 30), height=rng.randint(1, 30))
+        car = Car("A", rng.randrange(field.width), rng.randrange(field.height), rng.randrange(4))
+        add_obstacles(rng, field, [car], count=10, size=4, dense=rng.random() < 0.5)
+        commands = parse_program(program)
+
+        expected = execute_simulation_one_car(
+            field, Car("A", car.x, car.y, car.heading, bytes(commands))
+        )
+        result = execute_simulation_one_car_run_length(
+            field, Car("A", car.x, car.y, car.heading, commands)
+        )
+        assert format(result) == format(expected)
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_run_length_matches_reference_engine(self, seed):
+        rng = random.Random(seed)
+        field = Field(width=rng.randint(1, 100), height=rng.randint(1, 100))
+        car = Car(
+            id="A",
+            x=rng.randrange(field.width),
+            y=rng.randrange(field.height),
+            direction=rng.choice("NESW"),
+            command_list=rng.choices("FFFFFFFFFFRL", k=400),
+        )
+        add_obstacles(rng, field, [car], count=20, size=10, dense=rng.random() < 0.5)
+
+        expected = execute_simulation_one_car(field, copy.deepcopy(car))
+        result = execute_simulation_one_car_run_length(field, car)
+        assert format(result) == format(expected)
+
+    @pytest.mark.parametrize("bucket_size", [1, 16])
+    @pytest.mark.parametrize("seed", range(10))
+    def test_fleet_matches_array_engines(self, seed, bucket_size):
+        field, cars = generate_scenario(
+            seed=seed, width=150, height=150, cars=20, commands=200, forward_ratio=0.9
+        )
+        rng = random.Random(seed)
+        add_obstacles(rng, field, cars, count=60, size=30, dense=rng.random() < 0.5)
+        vectorized, trajectories = copy.deepcopy(cars), copy.deepcopy(cars)
+
+        expected = execute_simulation_multiples_cars_vectorized(field, vectorized)
+        assert execute_simulation_multiples_cars_trajectories(field, trajectories) == expected
+        assert execute_simulation_multiples_cars(field, cars, bucket_size=bucket_size) == expected
+        assert [format(car) for car in cars] == [format(car) for car in vectorized]
+        assert [format(car) for car in cars] == [format(car) for car in trajectories]
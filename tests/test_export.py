@@ -0,0 +1,104 @@
+import io
+import random
+
+import numpy as np
+import pytest
+
+from src.execute import execute_simulation_multiples_cars
+from src.export import HEADER_SIZE, TrajectoryWriter, export_simulation, load_trajectories
+from src.generator import generate_scenario
+from src.schemas import Car, Field
+
+
+def replay_states(field, cars, steps):
+    """State of every car after every step, found by replaying the fleet up to it."""
+    states = []
+    for step in range(steps + 1):
+        fleet = [car.copy(car.commands[:step]) for car in cars]
+        execute_simulation_multiples_cars(field, fleet)
+        states.append([[car.x, car.y, car.heading] for car in fleet])
+
+    return states
+
+
+class TestExport:
+    def test_sample_from_instructions(self, tmp_path, sample_fleet):
+        field = Field(width=10, height=10)
+
+        assert export_simulation(field, sample_fleet, tmp_path) == "A B\n5 4\n7"
+        trajectories = load_trajectories(tmp_path)
+        assert trajectories.ids == ["A", "B"]
+        assert trajectories.steps == 7
+        assert isinstance(trajectories.x, np.memmap)
+        x, y, heading = trajectories.car("B")
+        assert (x[0], y[0], heading[0]) == (7, 8, 3)
+        assert (x[-1], y[-1], heading[-1]) == (5, 4, 2)
+
+    def test_cars_after_the_mover_have_not_played_the_last_step(self, tmp_path):
+        field = Field(width=10, height=10)
+        cars = [
+            Car(id="A", x=0, y=0, direction="E", command_list="FF"),
+            Car(id="B", x=2, y=0, direction="W", command_list="FF"),
+            Car(id="C", x=5, y=5, direction="N", command_list="FF"),
+        ]
+
+        assert export_simulation(field, cars, tmp_path) == "A B\n1 0\n1"
+        trajectories = load_trajectories(tmp_path)
+        assert trajectories.x.tolist() == [[0, 2, 5], [1, 1, 5]]
+        assert trajectories.y.tolist() == [[0, 0, 5], [0, 0, 5]]
+
+    def test_single_car(self, tmp_path):
+        field = Field(width=10, height=10)
+        car = Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFRRLF"))
+
+        assert export_simulation(field, [car], tmp_path) == "4 3 S"
+        assert load_trajectories(tmp_path).steps == 10
+
+    def test_rows_are_readable_after_every_chunk(self, tmp_path):
+        rows = np.arange(12, dtype=np.int64).reshape(6, 2)
+        writer = TrajectoryWriter(tmp_path, ["A", "B"], chunk_rows=4)
+        writer.record(0, rows, rows, rows % 4)
+
+        # One chunk written, two rows buffered
+        assert (tmp_path / "x.npy").stat().st_size == HEADER_SIZE + 4 * 2 * 8
+        assert np.load(tmp_path / "x.npy").tolist() == rows[:4].tolist()
+        writer.record(5, rows[:3] + 100, rows[:3], rows[:3] % 4)
+        writer.close()
+
+        # Row 0 of a later window is the state it starts from, already recorded
+        expected = np.vstack((rows, rows[1:3] + 100))
+        trajectories = load_trajectories(tmp_path)
+        assert trajectories.x.tolist() == expected.tolist()
+        assert trajectories.heading.dtype == np.uint8
+
+    def test_streams_are_closed_if_one_cannot_be_opened(self, monkeypatch, tmp_path):
+        opened = []
+
+        def open_until_heading(path, mode):
+            if path.name == "heading.npy":
+                raise PermissionError(path)
+            opened.append(io.BytesIO())
+            return opened[-1]
+
+        monkeypatch.setattr("src.export.open", open_until_heading, raising=False)
+        with pytest.raises(PermissionError):
+            TrajectoryWriter(tmp_path, ["A", "B"])
+        assert len(opened) == 2
+        assert all(stream.closed for stream in opened)
+
+    @pytest.mark.parametrize("chunk_rows", [1, 7, None])
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_replay(self, tmp_path, seed, chunk_rows):
+        field, cars = generate_scenario(
+            seed=seed, width=40, height=30, cars=6, commands=60, forward_ratio=0.8
+        )
+        rng = random.Random(seed)
+        for car in cars:
+            car.commands = car.commands[: rng.randrange(len(car.commands) + 1)]
+        reference = [car.copy() for car in cars]
+        expected = execute_simulation_multiples_cars(field, [car.copy() for car in cars])
+
+        assert export_simulation(field, cars, tmp_path, chunk_rows) == expected
+        trajectories = load_trajectories(tmp_path)
+        states = np.stack((trajectories.x, trajectories.y, trajectories.heading), axis=2)
+        assert states.tolist() == replay_states(field, reference, trajectories.steps)
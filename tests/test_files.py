@@ -0,0 +1,29 @@
+import pytest
+
+from src.files import atomic_write
+
+
+class TestAtomicWrite:
+    def test_replaces_the_file(self, tmp_path):
+        path = tmp_path / "data"
+        path.write_text("old")
+
+        with atomic_write(path) as temporary:
+            with open(temporary, "w") as stream:
+                stream.write("new")
+            assert path.read_text() == "old"
+
+        assert path.read_text() == "new"
+        assert [entry.name for entry in tmp_path.iterdir()] == ["data"]
+
+    def test_failed_write_keeps_the_file(self, tmp_path):
+        path = tmp_path / "data"
+        path.write_text("old")
+
+        with pytest.raises(RuntimeError), atomic_write(path) as temporary:
+            with open(temporary, "w") as stream:
+                stream.write("partial")
+            raise RuntimeError
+
+        assert path.read_text() == "old"
+        assert [entry.name for entry in tmp_path.iterdir()] == ["data"]
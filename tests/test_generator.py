@@ -0,0 +1,60 @@
+import pytest
+
+from src.generator import car_ids, format_scenario, generate_scenario
+from src.parser import ScenarioParser, parse_part2
+
+
+class TestCarIds:
+    def test_car_ids(self):
+        ids = car_ids(30)
+
+        assert ids[:3] == ["A", "B", "C"]
+        assert ids[25:] == ["Z", "AA", "AB", "AC", "AD"]
+        assert car_ids(703)[-1] == "AAA"
+
+
+class TestGenerateScenario:
+    def test_is_reproducible(self):
+        first = generate_scenario(seed=3, cars=20, commands=50)
+        second = generate_scenario(seed=3, cars=20, commands=50)
+        other = generate_scenario(seed=4, cars=20, commands=50)
+
+        assert first == second
+        assert first != other
+
+    def test_parameters(self):
+        field, cars = generate_scenario(width=30, height=20, cars=15, commands=40)
+
+        assert (field.width, field.height) == (30, 20)
+        assert len(cars) == 15
+        assert all(len(car.commands) == 40 for car in cars)
+        assert all(0 <= car.x < 30 and 0 <= car.y < 20 for car in cars)
+        assert len({(car.x, car.y) for car in cars}) == 15
+
+    def test_density_packs_cars_in_the_center(self):
+        _, cars = generate_scenario(width=100, height=100, cars=25, density=1.0)
+
+        assert {(car.x, car.y) for car in cars} == {
+            (x, y) for x in range(47, 52) for y in range(47, 52)
+        }
+
+    def test_forward_ratio(self):
+        _, cars = generate_scenario(cars=1, commands=100, forward_ratio=1.0)
+
+        assert cars[0].commands == b"F" * 100
+
+    def test_invalid_parameters(self):
+        with pytest.raises(ValueError):
+            generate_scenario(width=2, height=2, cars=5)
+
+        with pytest.raises(ValueError):
+            generate_scenario(density=0)
+
+
+class TestFormatScenario:
+    def test_round_trip_through_the_parser(self):
+        field, cars = generate_scenario(seed=1, width=12, height=8, cars=5, commands=20)
+
+        parsed_field, parsed_cars = parse_part2(ScenarioParser(), format_scenario(field, cars))
+        assert parsed_field == field
+        assert parsed_cars == cars
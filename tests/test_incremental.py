@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from src.execute import execute_simulation_multiples_cars
+from src.generator import generate_scenario
+from src.incremental import FleetCache
+from src.schemas import Car, Field
+
+
+def simulate_with(field, cars, candidate):
+    return execute_simulation_multiples_cars(
+        field, [car.copy() for car in (*cars, candidate)], bucket_size=1
+    )
+
+
+@pytest.fixture
+def field():
+    return Field(width=10, height=10)
+
+
+class TestFleetCache:
+    def test_candidate_runs_into_the_fleet(self, field):
+        cache = FleetCache(field, [Car(id="A", x=1, y=2, direction="N", command_list="FFRFFFFRRL")])
+        candidate = Car(id="B", x=7, y=8, direction="W", command_list="FFLFFFFFFF")
+
+        assert cache.check(candidate) == "A B\n5 4\n7"
+        # The candidate is left untouched
+        assert format(candidate) == "7 8 W"
+
+    def test_fleet_runs_into_a_candidate_that_stopped(self, field):
+        cache = FleetCache(field, [Car(id="A", x=0, y=0, direction="E", command_list="FFFF")])
+
+        assert cache.check(Car(id="B", x=3, y=1, direction="S", command_list="F")) == "B A\n3 0\n3"
+        assert cache.check(Car(id="C", x=5, y=0, direction="N", command_list="F")) == "no collision"
+
+    def test_candidate_standing_in_the_way_of_a_fleet_car(self, field):
+        cache = FleetCache(field, [Car(id="A", x=0, y=0, direction="E", command_list="FF")])
+
+        # The fleet moves first, the candidate has not left (1, 0) yet
+        assert cache.check(Car(id="B", x=1, y=0, direction="N", command_list="F")) == "B A\n1 0\n1"
+
+    def test_fleet_collision_bounds_the_candidate(self, field):
+        fleet = [
+            Car(id="A", x=0, y=0, direction="N", command_list="FFFF"),
+            Car(id="C", x=9, y=0, direction="N", command_list="FFFF"),
+            Car(id="B", x=0, y=4, direction="S", command_list="FFFF"),
+        ]
+        cache = FleetCache(field, fleet)
+        assert cache.result == "A B\n0 2\n2"
+
+        # C would only run into D on step 3, after the fleet collided
+        assert cache.check(Car(id="D", x=9, y=5, direction="S", command_list="FFF")) == cache.result
+        # C moves before B on the colliding step, and runs into the candidate
+        assert cache.check(Car(id="E", x=9, y=2, direction="N", command_list="")) == ("E C\n9 2\n2")
+
+    def test_duplicate_candidate_id(self, field):
+        cache = FleetCache(field, [Car(id="A", x=0, y=0, direction="N")])
+
+        with pytest.raises(ValueError, match="Duplicate car ID A"):
+            cache.check(Car(id="A", x=5, y=5, direction="N"))
+
+    def test_empty_fleet(self, field):
+        with pytest.raises(ValueError, match="at least one car"):
+            FleetCache(field, [])
+
+    @pytest.mark.parametrize("seed", range(40))
+    def test_matches_full_simulation(self, seed):
+        rng = random.Random(seed)
+        width, height = rng.randint(3, 15), rng.randint(3, 15)
+        field, cars = generate_scenario(
+            seed=seed,
+            width=width,
+            height=height,
+            cars=rng.randint(2, min(9, width * height)),
+            commands=rng.randint(0, 40),
+            forward_ratio=rng.uniform(0.4, 0.95),
+        )
+        for car in cars:
+            car.commands = car.commands[: rng.randrange(len(car.commands) + 1)]
+        candidate = cars.pop(rng.randrange(len(cars)))
+        if rng.random() < 0.3:
+            # Start on a cell shared with the fleet
+            candidate.x, candidate.y = cars[0].x, cars[0].y
+
+        cache = FleetCache(field, cars)
+        assert cache.check(candidate) == simulate_with(field, cars, candidate)
+
+    def test_candidate_longer_than_the_fleet(self):
+        cache = FleetCache(Field(4, 2), [Car("A", 3, 0, "N", b"FFRFFFFFFF")])
+
+        # A's stays would otherwise be looked up beyond its last step
+        assert cache.check(Car("B", 2, 1, "E", b"RFFFLFFRLFRFRFRFFFFFFRFF")) == "A B\n3 1\n23"
+
+    @pytest.mark.parametrize("seed", range(200))
+    def test_long_candidates_match_full_simulation(self, seed):
+        rng = random.Random(seed)
+        width, height = rng.randint(3, 6), rng.randint(3, 6)
+        field, cars = generate_scenario(
+            seed=seed,
+            width=width,
+            height=height,
+            cars=rng.randint(2, 4),
+            commands=rng.randint(1, 4),
+            forward_ratio=0.9,
+        )
+        candidate = cars.pop()
+        # The candidate keeps playing well after the fleet has stopped
+        candidate.commands = bytes(rng.choices(b"FFFRL", k=rng.randint(20, 60)))
+
+        cache = FleetCache(field, cars)
+        assert cache.check(candidate) == simulate_with(field, cars, candidate)
@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.obstacles import Obstacles
+
+
+def random_rectangles(rng, width, height, count):
+    rectangles = []
+    for _ in range(count):
+        x0, x1 = sorted(rng.randrange(width) for _ in range(2))
+        y0, y1 = sorted(rng.randrange(height) for _ in range(2))
+        rectangles.append((x0, y0, x1, y1))
+    return rectangles
+
+
+class TestObstacles:
+    def test_rectangles_include_both_corners(self):
+        obstacles = Obstacles(10, 10, [(2, 3, 4, 5)])
+
+        assert obstacles.blocked(2, 3)
+        assert obstacles.blocked(4, 5)
+        assert not obstacles.blocked(5, 5)
+        assert not obstacles.blocked(2, 6)
+
+    def test_rectangle_outside_the_field(self):
+        with pytest.raises(ValueError, match="not a rectangle in the field"):
+            Obstacles(10, 10, [(8, 0, 10, 0)])
+        with pytest.raises(ValueError, match="not a rectangle in the field"):
+            Obstacles(10, 10, [(3, 4, 2, 4)])
+
+    def test_layout_follows_the_field_size(self):
+        assert Obstacles(1000, 1000, [(0, 0, 999, 999)]).bits is not None
+        # A bitmap of this field would take 125 GB
+        huge = Obstacles(10**6, 10**6, [(0, 0, 10**6 - 1, 10**6 - 1), (5, 5, 5, 5)])
+        assert huge.bits is None
+        assert len(huge.buckets) <= 8
+        assert huge.blocked(123456, 654321)
+
+    @pytest.mark.parametrize("dense", [True, False])
+    @pytest.mark.parametrize("seed", range(10))
+    def test_matches_the_cells_of_the_rectangles(self, seed, dense):
+        rng = random.Random(seed)
+        width, height = rng.randint(1, 300), rng.randint(1, 300)
+        rectangles = random_rectangles(rng, width, height, rng.randint(0, 20))
+        obstacles = Obstacles(width, height, rectangles, dense=dense)
+
+        cells = {
+            (x, y)
+            for x0, y0, x1, y1 in rectangles
+            for x in range(x0, x1 + 1)
+            for y in range(y0, y1 + 1)
+        }
+        xs, ys = np.meshgrid(np.arange(width), np.arange(height), indexing="ij")
+        blocked = obstacles.blocked_cells(xs.ravel(), ys.ravel())
+        assert set(zip(xs.ravel()[blocked].tolist(), ys.ravel()[blocked].tolist())) == cells
+        for _ in range(200):
+            x, y = rng.randrange(width), rng.randrange(height)
+            assert obstacles.blocked(x, y) == ((x, y) in cells)
+
+    def test_overlaps(self):
+        obstacles = Obstacles(100, 100, [(10, 10, 20, 20)])
+
+        assert obstacles.overlaps(0, 0, 10, 10)
+        assert obstacles.overlaps(15, 0, 15, 99)
+        assert not obstacles.overlaps(21, 0, 99, 99)
+
+    @pytest.mark.parametrize("dense", [True, False])
+    def test_free_run(self, dense):
+        obstacles = Obstacles(200, 10, [(150, 0, 150, 9), (3, 5, 3, 5)], dense=dense)
+
+        # East: stopped by the wall at x = 150, scanned past the short runs limit
+        assert obstacles.free_run(0, 0, 1, 1000) == 149
+        assert obstacles.free_run(0, 0, 1, 20) == 20
+        # North: stopped by the edge of the field
+        assert obstacles.free_run(3, 0, 0, 20) == 4
+        assert obstacles.free_run(4, 0, 0, 20) == 9
+        # West and south, from next to an obstacle
+        assert obstacles.free_run(4, 5, 3, 3) == 0
+        assert obstacles.free_run(3, 9, 2, 10) == 3
@@ -1,14 +1,25 @@
+import io
 import sys
 
 import pytest
 
+from src.binary import write_scenario
+from src.generator import format_scenario, generate_scenario
+from src.obstacles import Obstacles
 from src.parser import (
+    MAX_ERRORS,
+    START_POSITION_FORMAT,
     Car,
     Field,
+    ScenarioError,
+    ScenarioParser,
     parse_args,
     parse_part1,
     parse_part2,
+    parse_part2_stream,
+    split_lines,
 )
+from src.repeat import parse_program
 
 
 @pytest.fixture
@@ -84,6 +95,54 @@ class TestArgParser:
         assert cars[1].direction == "E"
         assert cars[1].command_list == ["R", "R", "F", "F"]
 
+    def test_parse_args_input_file_part1(self, monkeypatch, tmp_path):
+        path = tmp_path / "input.txt"
+        path.write_text("10 10\n1 2 N\nFRLF\n")
+        monkeypatch.setattr("sys.argv", ["program", "-p", "1", "--input", str(path)])
+
+        field, cars = parse_args()
+        assert (field.width, field.height) == (10, 10)
+        assert cars[0].command_list == ["F", "R", "L", "F"]
+
+    def test_parse_args_input_file_part2_is_streamed(self, monkeypatch, tmp_path):
+        path = tmp_path / "input.txt"
+        path.write_text("10 10\n\nA\n1 2 N\nFRLF\n\nB\n5 5 E\nRRFF\n")
+        monkeypatch.setattr("sys.argv", ["program", "-p", "2", "-i", str(path)])
+
+        field, cars = parse_args()
+        assert (field.width, field.height) == (10, 10)
+        assert not isinstance(cars, list)
+        assert [car.id for car in cars] == ["A", "B"]
+
+    def test_parse_args_input_stdin(self, monkeypatch):
+        monkeypatch.setattr("sys.stdin", io.StringIO("10 10\n\nA\n1 2 N\nFRLF\n"))
+        monkeypatch.setattr("sys.argv", ["program", "-p", "2", "-i", "-"])
+
+        _, cars = parse_args()
+        assert [format(car) for car in cars] == ["1 2 N"]
+
+    def test_parse_args_input_binary_file(self, monkeypatch, tmp_path):
+        path = tmp_path / "input.bin"
+        write_scenario(path, Field(width=10, height=10), [Car("A", 1, 2, "N", ["F", "R"])])
+        monkeypatch.setattr("sys.argv", ["program", "-p", "2", "-i", str(path)])
+
+        field, cars = parse_args()
+        assert (field.width, field.height) == (10, 10)
+        assert [format(car) for car in cars] == ["1 2 N"]
+        assert cars[0].command_list == ["F", "R"]
+
+    def test_parse_args_input_missing_file(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("sys.argv", ["program", "-p", "2", "-i", str(tmp_path / "missing")])
+
+        with pytest.raises(SystemExit):
+            parse_args()
+
+    def test_parse_args_text_and_input(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("sys.argv", ["program", "-p", "1", "-i", "-", "10 10\n1 2 N\nF"])
+
+        with pytest.raises(SystemExit):
+            parse_args()
+
 
 class TestParserPart1:
     def test_parse_part1_valid(self, parser_mock):
@@ -126,6 +185,20 @@ class TestParserPart1:
         with pytest.raises(SystemExit):
             parse_part1(parser_mock, "5 5\n10 10 N\nFRLF")
 
+    def test_parse_part1_obstacles(self, parser_mock):
+        field, cars = parse_part1(parser_mock, "10 10\n0 0 3 3\n5 0 5 9\n4 2 N\nFRF")
+
+        assert field.obstacles == Obstacles(10, 10, [(0, 0, 3, 3), (5, 0, 5, 9)])
+        assert format(cars[0]) == "4 2 N"
+
+    def test_parse_part1_invalid_obstacles(self):
+        with pytest.raises(ScenarioError, match="^Obstacles must have the format"):
+            parse_part1(ScenarioParser(), "10 10\n0 0 3\n4 2 N\nFRF")
+        with pytest.raises(ScenarioError, match="^The obstacle must be in the field"):
+            parse_part1(ScenarioParser(), "10 10\n0 0 10 3\n4 2 N\nFRF")
+        with pytest.raises(ScenarioError, match="^The starting position is on an obstacle$"):
+            parse_part1(ScenarioParser(), "10 10\n0 0 3 3\n2 2 N\nFRF")
+
 
 class TestParserPart2:
     def test_parse_part2_valid(self, parser_mock):
@@ -197,12 +270,24 @@ class TestParserPart2:
         # Test invalid car ID
         text = """10 10
         
-        123
+        car 1
         1 2 N
         FRLF"""
         with pytest.raises(SystemExit):
             parse_part2(parser_mock, text)
 
+    def test_parse_part2_duplicate_car_id(self, parser_mock):
+        text = "10 10\n\ncar-7\n1 2 N\nF\n\ncar-7\n5 5 E\nF"
+        with pytest.raises(SystemExit):
+            parse_part2(parser_mock, text)
+
+    def test_parse_part2_long_car_ids(self, parser_mock):
+        field, cars = generate_scenario(seed=3, width=50, height=50, cars=800, commands=5)
+
+        _, parsed = parse_part2(parser_mock, format_scenario(field, cars))
+        assert [car.id for car in parsed] == [car.id for car in cars]
+        assert parsed[-1].id == "ADT"
+
     def test_parse_part2_invalid_position(self, parser_mock):
         # Test invalid position
         text = """10 10
@@ -247,3 +332,132 @@ class TestParserPart2:
         1 2 N"""
         with pytest.raises(SystemExit):
             parse_part2(parser_mock, text)
+
+
+class TestParserPart2Stream:
+    def test_cars_are_read_lazily(self, parser_mock):
+        lines = iter(["10 10\n", "\n", "A\n", "1 2 N\n", "FRLF\n", "\n", "B\n", "5 5 E\n"])
+        field, cars = parse_part2_stream(parser_mock, lines)
+        assert (field.width, field.height) == (10, 10)
+
+        car = next(cars)
+        assert (car.id, car.x, car.y, car.direction) == ("A", 1, 2, "N")
+        assert car.command_list == ["F", "R", "L", "F"]
+        # The second car has not been read yet
+        assert next(lines) == "\n"
+
+    def test_trailing_blank_lines_are_ignored(self, parser_mock):
+        lines = io.StringIO("\n10 10\n\nA\n1 2 N\nFRLF\n\n\n")
+        _, cars = parse_part2_stream(parser_mock, lines)
+        assert [car.id for car in cars] == ["A"]
+
+    @pytest.mark.parametrize("blank_lines", [4, 5, 8, 11])
+    def test_many_trailing_blank_lines_are_ignored(self, blank_lines):
+        lines = io.StringIO("10 10\n\nA\n1 2 N\nFRLF\n" + "\n" * blank_lines)
+        _, cars = parse_part2_stream(ScenarioParser(), lines)
+        assert [car.id for car in cars] == ["A"]
+
+    def test_blank_lines_between_cars(self):
+        lines = io.StringIO("10 10\n\nA\n1 2 N\nF\n\n\n\n\nB\n1 3 N\nF\n")
+        _, cars = parse_part2_stream(ScenarioParser(), lines)
+        with pytest.raises(ScenarioError, match="^line 7, column 2: Car ID"):
+            list(cars)
+
+    def test_incomplete_car_definition(self, parser_mock):
+        lines = io.StringIO("10 10\n\nA\n1 2 N\n")
+        _, cars = parse_part2_stream(parser_mock, lines)
+        with pytest.raises(SystemExit):
+            list(cars)
+
+    def test_no_cars(self, parser_mock):
+        _, cars = parse_part2_stream(parser_mock, io.StringIO("10 10\n"))
+        with pytest.raises(SystemExit):
+            list(cars)
+
+    def test_empty_input(self, parser_mock):
+        with pytest.raises(SystemExit):
+            parse_part2_stream(parser_mock, io.StringIO(""))
+
+
+class TestParserPart2Errors:
+    def test_every_error_is_reported_with_its_position(self):
+        text = "10 10\n\nA\n1 2 N\nFFXF\n\nB B\n1 x N\nF(FR\n\nA\n20 2 N\nFR"
+
+        with pytest.raises(ScenarioError) as error:
+            parse_part2(ScenarioParser(), text)
+        assert str(error.value).split("\n") == [
+            "line 5, column 3: The commands must only contain F, R and L",
+            "line 7, column 2: Car ID must only contain letters, digits, _ or -",
+            f"line 8, column 3: {START_POSITION_FORMAT}",
+            "line 9, column 2: Unclosed parenthesis",
+            "line 11, column 1: Duplicate car ID A",
+            "line 12, column 1: The starting position must be in the field",
+        ]
+
+    def test_line_numbers_count_leading_blank_lines(self):
+        with pytest.raises(ScenarioError, match="^line 3, column 4: Dimensions"):
+            parse_part2_stream(ScenarioParser(), io.StringIO("\n\n10 x\n"))
+
+    def test_incomplete_car_definition(self):
+        with pytest.raises(ScenarioError, match="^line 2: Incomplete car definition$"):
+            parse_part2(ScenarioParser(), "10 10\n\nA\n1 2 N")
+
+    def test_number_of_errors_is_bounded(self):
+        text = "10 10" + "\n\nA\n1 2 N\nX" * 30
+
+        with pytest.raises(ScenarioError) as error:
+            parse_part2(ScenarioParser(), text)
+        lines = str(error.value).split("\n")
+        assert len(lines) == MAX_ERRORS + 1
+        # 30 invalid commands and 29 duplicate ids
+        assert lines[-1] == f"and {59 - MAX_ERRORS} more errors"
+
+    def test_no_car_is_yielded_after_an_error(self):
+        lines = io.StringIO("10 10\n\nA\n1 2 N\nF\n\nB\n1 2 Q\nF\n\nC\n5 5 N\nF\n")
+        _, cars = parse_part2_stream(ScenarioParser(), lines)
+
+        assert next(cars).id == "A"
+        with pytest.raises(ScenarioError, match="line 8, column 5"):
+            next(cars)
+
+    def test_obstacles(self):
+        text = "10 10\n0 0 3 3\n 5 0 5 9 \n\nA\n4 2 N\nF\n\nB\n6 2 N\nF"
+        field, cars = parse_part2(ScenarioParser(), text)
+
+        assert field.obstacles == Obstacles(10, 10, [(0, 0, 3, 3), (5, 0, 5, 9)])
+        assert [car.id for car in cars] == ["A", "B"]
+        assert parse_part2(ScenarioParser(), "10 10\n\nA\n4 2 N\nF")[0].obstacles is None
+
+    def test_obstacle_errors(self):
+        text = "10 10\n0 0 3\n2 x 3 3\n0 0 3 10\n\nA\n4 2 N\nF"
+
+        with pytest.raises(ScenarioError) as error:
+            parse_part2(ScenarioParser(), text)
+        assert str(error.value).split("\n") == [
+            "line 2, column 6: Obstacles must have the format => x0 y0 x1 y1, the int corners of a rectangle",
+            "line 3, column 3: Obstacles must have the format => x0 y0 x1 y1, the int corners of a rectangle",
+            "line 4, column 7: The obstacle must be in the field, with x0 <= x1 and y0 <= y1",
+        ]
+
+    def test_car_on_an_obstacle(self):
+        text = "10 10\n0 0 3 3\n\nA\n4 2 N\nF\n\nB\n 2 2 N\nF"
+
+        with pytest.raises(
+            ScenarioError, match="^line 9, column 2: The starting position is on an obstacle$"
+        ):
+            parse_part2(ScenarioParser(), text)
+
+    def test_binary_lines(self):
+        lines = split_lines(io.BytesIO(b"10 10\n\nA\n1 2 N\nFF(R)*3\n\nB\n2 2 N\nFFR\xc3\n"))
+        _, cars = parse_part2_stream(ScenarioParser(), lines)
+
+        assert next(cars).commands == parse_program("FF(R)*3")
+        with pytest.raises(ScenarioError, match="^line 9, column 4: The commands"):
+            next(cars)
+
+    @pytest.mark.parametrize("block_size", [1, 3, 1 << 20])
+    def test_split_lines(self, block_size):
+        data = b"10 10\n\nA\n1 2 N\n" + b"F" * 100 + b"\n\n"
+
+        lines = list(split_lines(io.BytesIO(data), block_size))
+        assert lines == data.split(b"\n")[:-1]
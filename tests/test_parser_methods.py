@@ -3,12 +3,14 @@ import sys
 import pytest
 
 from src.parser import (
+    InputError,
     check_starting_conditions,
     parse_car_id,
     parse_commands,
     parse_dimensions,
     parse_lines,
     parse_start_position,
+    tokenize_commands,
 )
 
 
@@ -21,9 +23,20 @@ class TestParserLines:
     def test_parse_lines_valid(self, parser_mock):
         # Test valid input with 3 lines
         text = "10 10\n1 2 N\nFRLF"
-        dimensions, start_position, commands = parse_lines(parser_mock, text)
+        dimensions, obstacles, start_position, commands = parse_lines(parser_mock, text)
 
         assert dimensions == "10 10"
+        assert obstacles == []
+        assert start_position == "1 2 N"
+        assert commands == "FRLF"
+
+    def test_parse_lines_with_obstacles(self, parser_mock):
+        # Lines between the dimensions and the start position declare obstacles
+        text = "10 10\n0 0 1 1\n5 5 5 9\n1 2 N\nFRLF"
+        dimensions, obstacles, start_position, commands = parse_lines(parser_mock, text)
+
+        assert dimensions == "10 10"
+        assert obstacles == ["0 0 1 1", "5 5 5 9"]
         assert start_position == "1 2 N"
         assert commands == "FRLF"
 
@@ -32,10 +45,6 @@ class TestParserLines:
         with pytest.raises(SystemExit):
             parse_lines(parser_mock, "10 10\n1 2 N")
 
-        # Test with excess lines (should split into first 3)
-        with pytest.raises(SystemExit):
-            parse_lines(parser_mock, "10 10\n1 2 N\nFRLF\nextra")
-
 
 class TestParserDimensions:
     def test_parse_dimensions_valid(self, parser_mock):
@@ -70,21 +79,20 @@ class TestParseCarId:
     def test_parse_car_id_valid(self, parser_mock):
         # Test valid car IDs
         assert parse_car_id(parser_mock, "A") == "A"
-        assert parse_car_id(parser_mock, "B") == "B"
         assert parse_car_id(parser_mock, "Z") == "Z"
+        assert parse_car_id(parser_mock, "AB") == "AB"
+        assert parse_car_id(parser_mock, "truck_12") == "truck_12"
+        assert parse_car_id(parser_mock, "1") == "1"
+        assert parse_car_id(parser_mock, "x" * 100) == "x" * 100
 
     def test_parse_car_id_invalid(self, parser_mock):
-        # Test non-single letter IDs
+        # Test empty IDs
         with pytest.raises(SystemExit):
-            parse_car_id(parser_mock, "AB")
+            parse_car_id(parser_mock, "")
 
-        # Test non-uppercase letters
+        # Test IDs with spaces, which would break the collision output
         with pytest.raises(SystemExit):
-            parse_car_id(parser_mock, "a")
-
-        # Test numbers
-        with pytest.raises(SystemExit):
-            parse_car_id(parser_mock, "1")
+            parse_car_id(parser_mock, "A B")
 
         # Test special characters
         with pytest.raises(SystemExit):
@@ -134,14 +142,14 @@ class TestParserCommands:
     def test_parse_commands_valid(self, parser_mock):
         # Test valid commands
         commands = parse_commands(parser_mock, "FRL")
-        assert commands == ["F", "R", "L"]
+        assert commands == b"FRL"
 
         commands = parse_commands(parser_mock, "FFRFFFRRLF")
-        assert commands == ["F", "F", "R", "F", "F", "F", "R", "R", "L", "F"]
+        assert commands == b"FFRFFFRRLF"
 
         # Test with whitespace
         commands = parse_commands(parser_mock, "  FRL  ")
-        assert commands == ["F", "R", "L"]
+        assert commands == b"FRL"
 
     def test_parse_commands_invalid(self, parser_mock):
         # Test invalid commands
@@ -154,6 +162,42 @@ class TestParserCommands:
         with pytest.raises(SystemExit):
             parse_commands(parser_mock, "FR L")
 
+        # Test non-ASCII commands
+        with pytest.raises(SystemExit):
+            parse_commands(parser_mock, "FRÉ")
+
+    def test_parse_commands_repeated(self, parser_mock):
+        commands = parse_commands(parser_mock, "F(FFRFL)*1000000R")
+        assert len(commands) == 5_000_002
+        assert str(commands) == "F(FFRFL)*1000000R"
+
+    @pytest.mark.parametrize("commands", ["(FR)", "(FR)*", "(FR*2", "FR)*2", "(FX)*2"])
+    def test_parse_commands_invalid_repeat(self, parser_mock, commands):
+        with pytest.raises(SystemExit):
+            parse_commands(parser_mock, commands)
+
+    @pytest.mark.parametrize("line", ["  FFRL  ", b"  FFRL  \r"])
+    def test_tokenize_commands(self, line):
+        assert tokenize_commands(line) == b"FFRL"
+
+    @pytest.mark.parametrize(
+        ("line", "column"),
+        [
+            ("FFXL", 3),
+            ("  FF L", 5),
+            (b"  FRL\xff", 6),
+            ("F(FR", 2),
+            (b" (FR)*", 7),
+            ("F(F)*99999999999999999999", 6),
+            ("F(F)*" + "9" * 5000, 6),
+            (" " + "(" * 5000 + "F" + ")*2" * 5000, 66),
+        ],
+    )
+    def test_tokenize_commands_error_column(self, line, column):
+        with pytest.raises(InputError) as error:
+            tokenize_commands(line)
+        assert error.value.column == column
+
 
 class TestStartingConditions:
     def test_check_starting_conditions_valid(self, parser_mock):
@@ -0,0 +1,103 @@
+import pytest
+
+from src.repeat import CHUNK_SIZE, ProgramError, RepeatedCommands, parse_program
+
+
+class TestParseProgram:
+    def test_plain_commands(self):
+        assert parse_program("FFRL") == b"FFRL"
+
+    def test_repeat_tree(self):
+        program = parse_program("F(FR(L)*2)*3R")
+
+        assert isinstance(program, RepeatedCommands)
+        assert bytes(program) == b"F" + b"FRLL" * 3 + b"R"
+        assert str(program) == "F(FR(L)*2)*3R"
+
+    def test_empty_repeat(self):
+        assert bytes(parse_program("F(RL)*0F")) == b"FF"
+
+    @pytest.mark.parametrize(
+        ("text", "message"),
+        [
+            ("(FR", "Unclosed parenthesis"),
+            ("(FR)", "Missing \\*N"),
+            ("(FR)*x", "Missing repeat count"),
+            ("FR)", "Unexpected"),
+            ("(FA)*2", "F, R and L"),
+            ("(F)*99999999999999999999", "Repeat count too large"),
+            ("(F)*" + "9" * 5000, "Repeat count too large"),
+            ("((FR)*4611686018427387904)*2", "Repeat count too large"),
+            ("(F)*9223372036854775807(F)*1", "Repeat count too large"),
+            ("(F)*9223372036854775807F", "Program too long"),
+            ("(" * 5000 + "F" + ")*2" * 5000, "Too many nested repetitions"),
+        ],
+    )
+    def test_invalid_syntax(self, text, message):
+        with pytest.raises(ValueError, match=message):
+            parse_program(text)
+
+    def test_largest_program(self):
+        program = parse_program("(F)*9223372036854775807")
+
+        assert len(program) == 9223372036854775807
+        assert len(parse_program("(F)*000000000000000000000002")) == 2
+
+    def test_deepest_nesting(self):
+        program = parse_program("(" * 64 + "F" + ")*1" * 64)
+
+        assert bytes(program) == b"F"
+
+    @pytest.mark.parametrize(
+        ("text", "position"),
+        [
+            ("F(FR", 1),
+            ("(FR)x", 4),
+            ("(FR)*x", 5),
+            ("FR)", 2),
+            ("F(FRA)*2", 4),
+            ("FRÉ", 2),
+            ("F(F)*99999999999999999999", 5),
+            ("(" * 100 + ")*2" * 100, 64),
+        ],
+    )
+    def test_error_position(self, text, position):
+        with pytest.raises(ProgramError) as error:
+            parse_program(text)
+        assert error.value.position == position
+
+
+class TestRepeatedCommands:
+    def test_sequence_access(self):
+        program = parse_program("F(FRL)*1000R")
+        expanded = bytes(program)
+
+        assert len(program) == len(expanded) == 3002
+        assert [program[index] for index in (0, 1, 2, 3, 3000, 3001, -1)] == [
+            expanded[index] for index in (0, 1, 2, 3, 3000, 3001, -1)
+        ]
+        assert program[5:17] == expanded[5:17]
+        assert program[::7] == expanded[::7]
+        assert list(program) == list(expanded)
+
+    def test_index_out_of_range(self):
+        with pytest.raises(IndexError):
+            parse_program("(F)*3")[3]
+
+    def test_count(self):
+        program = parse_program("F(FRL)*1000R")
+
+        assert program.count(b"F") == 1001
+        assert program.count(ord("R")) == 1001
+
+    def test_chunks_are_bounded(self):
+        program = RepeatedCommands([b"F" * (3 * CHUNK_SIZE)], repeat=2)
+
+        assert max(len(chunk) for chunk in program.chunks()) == CHUNK_SIZE
+        assert b"".join(program.chunks(CHUNK_SIZE + 1, 4 * CHUNK_SIZE)) == b"F" * (
+            3 * CHUNK_SIZE - 1
+        )
+
+    def test_comparisons(self):
+        assert parse_program("(FR)*2") == b"FRFR"
+        assert parse_program("(F)*2") < b"R"
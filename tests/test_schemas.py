@@ -0,0 +1,64 @@
+import pytest
+
+from src.schemas import Car, Field
+
+
+class TestCar:
+    def test_direction_is_stored_as_int(self):
+        car = Car(id="A", x=1, y=2, direction="W", command_list=["F", "R"])
+
+        assert car.heading == 3
+        assert car.direction == "W"
+
+        car.direction = "S"
+        assert car.heading == 2
+
+    def test_commands_are_stored_as_bytes(self):
+        assert Car(id="A", x=0, y=0, direction="N", command_list=["F", "L"]).commands == b"FL"
+        assert Car(id="A", x=0, y=0, direction="N", command_list=b"FL").commands == b"FL"
+        assert Car(id="A", x=0, y=0, direction="N", command_list="FL").command_list == ["F", "L"]
+
+    def test_copy(self):
+        car = Car(id="A", x=1, y=2, direction="W", command_list=b"FFR")
+        copy = car.copy()
+        copy.move()
+
+        assert (copy.x, car.x) == (0, 1)
+        assert copy.copy() == Car(id="A", x=0, y=2, direction="W", command_list=b"FFR")
+        assert car.copy(b"L").commands == b"L"
+
+    def test_car_is_slotted(self):
+        car = Car(id="A", x=0, y=0, direction="N")
+
+        with pytest.raises(AttributeError):
+            car.speed = 2
+
+    def test_invalid_direction(self):
+        with pytest.raises(ValueError):
+            Car(id="A", x=0, y=0, direction="X")
+
+        with pytest.raises(ValueError):
+            Car(id="A", x=0, y=0, direction="N").change_direction("F")
+
+    def test_change_direction_accepts_command_codes(self):
+        car = Car(id="A", x=0, y=0, direction="N", command_list=b"RRL")
+
+        for command in car.commands:
+            car.change_direction(command)
+        assert car.direction == "E"
+
+    def test_is_move_valid_for_field(self):
+        field = Field(width=2, height=2)
+
+        assert Car(id="A", x=0, y=0, direction="N").is_move_valid_for_field(field)
+        assert not Car(id="A", x=0, y=1, direction="N").is_move_valid_for_field(field)
+        assert not Car(id="A", x=0, y=0, direction="W").is_move_valid_for_field(field)
+        assert not Car(id="A", x=1, y=0, direction="E").is_move_valid_for_field(field)
+        assert not Car(id="A", x=0, y=0, direction="S").is_move_valid_for_field(field)
+
+    def test_equality_and_format(self):
+        car = Car(id="A", x=4, y=3, direction="S", command_list=["F"])
+
+        assert car == Car(id="A", x=4, y=3, direction=2, command_list=b"F")
+        assert car != Car(id="B", x=4, y=3, direction=2, command_list=b"F")
+        assert format(car) == "4 3 S"
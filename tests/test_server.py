@@ -0,0 +1,148 @@
+import asyncio
+import json
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from src.client import SimulationClient
+from src.parser import ScenarioError
+from src.server import SimulationServer, parse_request
+
+PART1_INPUT = "10 10\n1 2 N\nFFRFFFRRLF"
+PART2_INPUT = "10 10\n\nA\n1 2 N\nFFRFFFFRRL\n\nB\n7 8 W\nFFLFFFFFFF"
+
+
+async def with_server(session, **options):
+    """Run `session(host, port)` against a server listening on a free local port."""
+    async with SimulationServer(workers=1, **options) as server:
+        listener = await server.listen_tcp("127.0.0.1", 0)
+        async with listener:
+            return await session(*listener.sockets[0].getsockname()[:2])
+
+
+class TestParseRequest:
+    def test_request(self):
+        line = json.dumps({"id": 7, "part": 1, "input": PART1_INPUT}).encode()
+        assert parse_request(line) == (7, (1, PART1_INPUT))
+
+    def test_defaults(self):
+        assert parse_request(json.dumps({"input": "x"}).encode()) == (None, (2, "x"))
+
+    @pytest.mark.parametrize("line", [b"not json", b"[1, 2]", b'{"part": 1}'])
+    def test_invalid_request(self, line):
+        with pytest.raises(ScenarioError, match="Invalid scenario record"):
+            parse_request(line)
+
+
+class TestSimulationServer:
+    def test_concurrent_requests(self):
+        async def session(host, port):
+            async with await SimulationClient.connect(host, port) as client:
+                return await asyncio.gather(
+                    *(
+                        client.simulate(part, text)
+                        for part, text in [(1, PART1_INPUT), (2, PART2_INPUT), (1, "bad")] * 10
+                    )
+                )
+
+        results = asyncio.run(with_server(session, batch_size=4))
+        assert (
+            results
+            == [
+                {"result": "4 3 S"},
+                {"result": "A B\n5 4\n7"},
+                {"error": "Error parsing input lines"},
+            ]
+            * 10
+        )
+
+    def test_invalid_line(self):
+        async def session(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(b"oops\n")
+            response = json.loads(await reader.readline())
+            writer.close()
+            await writer.wait_closed()
+            return response
+
+        assert asyncio.run(with_server(session)) == {"id": None, "error": "Invalid scenario record"}
+
+    def test_invalid_part_or_input(self):
+        async def session(host, port):
+            async with await SimulationClient.connect(host, port) as client:
+                return await asyncio.gather(
+                    client.simulate(3, PART1_INPUT),
+                    client.simulate("1", PART1_INPUT),
+                    client.simulate(1, 5),
+                    client.simulate(1, PART1_INPUT),
+                )
+
+        assert asyncio.run(with_server(session)) == [
+            {"error": "The part must be 1 or 2"},
+            {"error": "The part must be 1 or 2"},
+            {"error": "The input must be a string"},
+            {"result": "4 3 S"},
+        ]
+
+    def test_timeout(self):
+        async def session(host, port):
+            async with await SimulationClient.connect(host, port) as client:
+                return await client.simulate(1, PART1_INPUT)
+
+        result = asyncio.run(with_server(session, batch_delay=0.2, timeout=0.01))
+        assert result == {"error": "Timed out"}
+
+    def test_unix_socket(self, tmp_path):
+        path = str(tmp_path / "server.sock")
+
+        async def run():
+            async with (
+                SimulationServer(workers=1) as server,
+                await server.listen_unix(path),
+                await SimulationClient.connect(unix=path) as client,
+            ):
+                return await client.simulate(1, PART1_INPUT)
+
+        assert asyncio.run(run()) == {"result": "4 3 S"}
+
+    def test_full_queue_holds_back_submissions(self):
+        async def run():
+            # Without a dispatcher nothing leaves the queue
+            server = SimulationServer(queue_size=1)
+            await server.submit((1, PART1_INPUT))
+            with pytest.raises(TimeoutError):
+                await asyncio.wait_for(server.submit((1, PART1_INPUT)), 0.05)
+
+        asyncio.run(run())
+
+    def test_broken_worker_pool(self):
+        class BrokenExecutor(Executor):
+            def submit(self, fn, /, *args, **kwargs):
+                raise BrokenProcessPool("A worker process died")
+
+        async def run():
+            server = SimulationServer()
+            server.executor = BrokenExecutor()
+            server.slots = asyncio.Semaphore(0)
+            loop = asyncio.get_running_loop()
+            futures = [loop.create_future(), loop.create_future()]
+            await server.run_batch([((1, PART1_INPUT), future) for future in futures])
+            assert not server.slots.locked()
+            return [future.result() for future in futures]
+
+        error = {"error": "Simulation failed: BrokenProcessPool('A worker process died')"}
+        assert asyncio.run(run()) == [error, error]
+
+    def test_worker_processes(self):
+        async def session(host, port):
+            async with await SimulationClient.connect(host, port) as client:
+                return await client.simulate(2, PART2_INPUT)
+
+        async def run():
+            async with SimulationServer(workers=2) as server:
+                listener = await server.listen_tcp("127.0.0.1", 0)
+                async with listener:
+                    return await session(*listener.sockets[0].getsockname()[:2])
+
+        assert asyncio.run(run()) == {"result": "A B\n5 4\n7"}
@@ -0,0 +1,146 @@
+import random
+
+import pytest
+
+from src.execute import (
+    disable_stats,
+    enable_stats,
+    execute_simulation_multiples_cars,
+    execute_simulation_one_car,
+    execute_simulation_one_car_run_length,
+    get_stats,
+)
+from src.generator import generate_scenario
+from src.main import main
+from src.repeat import parse_program
+from src.schemas import Car, Field
+from src.stats import SimulationStats
+from src.vectorized import execute_simulation_multiples_cars_vectorized
+
+
+@pytest.fixture(autouse=True)
+def stats():
+    yield enable_stats()
+    disable_stats()
+
+
+class TestSimulationStats:
+    def test_record_commands(self):
+        stats = SimulationStats()
+
+        stats.record_commands([b"FFR", b"LFF"], rejected_moves=1)
+        assert (stats.moves, stats.rejected_moves, stats.rotations) == (3, 1, 2)
+
+    def test_latency_histogram(self):
+        stats = SimulationStats()
+
+        stats.record_step(0)
+        stats.record_step(3)
+        stats.record_step(1000)
+        assert stats.steps == 3
+        assert stats.step_latency[:3] == [1, 0, 1]
+        assert stats.step_latency[10] == 1
+        assert "steps under 1024 ns: 1" in format(stats)
+
+    def test_callback(self):
+        calls = []
+        stats = SimulationStats(callback=calls.append)
+
+        stats.finish()
+        assert calls == [stats]
+        assert stats.simulations == 1
+
+
+class TestInstrumentation:
+    def test_disabled_by_default(self):
+        disable_stats()
+
+        execute_simulation_one_car(Field(width=5, height=5), Car("A", 0, 0, "N", ["F"]))
+        assert get_stats() is None
+
+    @pytest.mark.parametrize(
+        "engine", [execute_simulation_one_car, execute_simulation_one_car_run_length]
+    )
+    def test_one_car(self, stats, engine):
+        car = Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFRRLF"))
+
+        engine(Field(width=3, height=3), car)
+        assert (stats.moves, stats.rejected_moves, stats.rotations) == (2, 4, 4)
+        assert stats.collision_checks == 0
+        assert stats.steps == 1
+        assert stats.simulations == 1
+
+    @pytest.mark.parametrize(
+        "engine", [execute_simulation_multiples_cars, execute_simulation_multiples_cars_vectorized]
+    )
+    def test_multiple_cars_stop_on_collision(self, stats, engine, sample_fleet):
+        engine(Field(width=10, height=10), sample_fleet)
+
+        assert (stats.moves, stats.rejected_moves, stats.rotations) == (12, 0, 2)
+        assert stats.collision_checks == 12
+        assert stats.steps == 7
+
+    @pytest.mark.parametrize(
+        "engine", [execute_simulation_multiples_cars, execute_simulation_multiples_cars_vectorized]
+    )
+    def test_cars_after_the_collision_do_not_count(self, stats, engine):
+        cars = [
+            Car(id="A", x=0, y=0, direction="E", command_list=["F"]),
+            Car(id="B", x=1, y=0, direction="N", command_list=["R"]),
+            Car(id="C", x=3, y=0, direction="N", command_list=["L"]),
+        ]
+
+        engine(Field(width=5, height=5), cars)
+        assert (stats.moves, stats.rotations) == (1, 0)
+
+    def test_repeated_fleet_counts_without_expanding(self, stats):
+        cars = [
+            Car("A", 0, 0, "N", parse_program("(FFRFL)*100000000")),
+            Car("B", 5, 5, "E", parse_program("(FFRFL)*2")),
+        ]
+
+        assert execute_simulation_multiples_cars(Field(width=10, height=10), cars) == "no collision"
+        # A drives up to the corner, then every move is rejected
+        assert (stats.moves, stats.rejected_moves, stats.rotations) == (24, 299999982, 200000004)
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_repeated_fleet_matches_expanded_programs(self, seed):
+        field, cars = generate_scenario(seed=seed, width=6, height=6, cars=3, commands=0)
+        rng = random.Random(seed)
+        for car in cars:
+            body = "".join(rng.choices("FFFRL", k=rng.randint(1, 6)))
+            car.commands = parse_program(f"({body})*{rng.randint(1, 200)}")
+        counters = []
+        for programs in [bytes, lambda commands: commands]:
+            stats = enable_stats()
+            fleet = [car.copy(programs(car.commands)) for car in cars]
+            execute_simulation_multiples_cars(field, fleet)
+            counters.append(
+                (stats.moves, stats.rejected_moves, stats.rotations, stats.collision_checks)
+            )
+
+        assert counters[0] == counters[1]
+
+    def test_engines_agree(self):
+        field, cars = generate_scenario(seed=2, width=8, height=8, cars=6, commands=40)
+        counters = []
+        for engine in [
+            execute_simulation_multiples_cars,
+            execute_simulation_multiples_cars_vectorized,
+        ]:
+            stats = enable_stats()
+            engine(field, [car.copy() for car in cars])
+            counters.append((stats.moves, stats.rejected_moves, stats.rotations, stats.steps))
+
+        assert counters[0] == counters[1]
+
+
+class TestStatsFlag:
+    def test_stats_are_printed_on_stderr(self, monkeypatch, capsys):
+        disable_stats()
+        monkeypatch.setattr("sys.argv", ["program", "--stats", "-p", "1", "3 3\n1 2 N\nFFRFFFRRLF"])
+
+        main()
+        output = capsys.readouterr()
+        assert output.out == "2 1 S\n"
+        assert "moves: 2\nrejected moves: 4\nrotations: 4" in output.err
@@ -0,0 +1,80 @@
+import pytest
+
+from src.execute import execute_simulation_multiples_cars
+from src.generator import generate_scenario
+from src.schemas import Car, Field
+from src.tiles import TileBuffers, execute_simulation_multiples_cars_tiles, tile_grid
+
+
+class TestTileGrid:
+    def test_square_field(self):
+        assert tile_grid(Field(width=100, height=100), 4) == (2, 2)
+
+    def test_wide_field(self):
+        assert tile_grid(Field(width=400, height=100), 4) == (4, 1)
+
+    def test_fewer_tiles_on_a_small_field(self):
+        # 5 tiles would need a 1x5 or 5x1 grid
+        assert tile_grid(Field(width=2, height=3), 5) == (2, 2)
+
+    def test_single_cell(self):
+        assert tile_grid(Field(width=1, height=1), 8) == (1, 1)
+
+
+class TestTileEngine:
+    def test_sample_from_instructions(self):
+        field = Field(width=10, height=10)
+        car1 = Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFFRRL"))
+        car2 = Car(id="B", x=7, y=8, direction="W", command_list=list("FFLFFFFFFF"))
+
+        result = execute_simulation_multiples_cars_tiles(field, [car1, car2], workers=1, tiles=4)
+        assert result == "A B\n5 4\n7"
+
+    def test_collision_across_a_tile_border(self):
+        # Tiles split x at 2: A drives from the left tile onto B's cell in the right tile
+        field = Field(width=4, height=1)
+        car1 = Car(id="A", x=0, y=0, direction="E", command_list=["F", "F", "F"])
+        car2 = Car(id="B", x=3, y=0, direction="N", command_list=["F", "F", "F"])
+
+        result = execute_simulation_multiples_cars_tiles(field, [car1, car2], workers=1, tiles=2)
+        assert result == "B A\n3 0\n3"
+
+    def test_buffers_are_bounded_by_the_steps(self, monkeypatch):
+        windows = []
+        allocate = TileBuffers.allocate.__func__
+
+        def record_window(cls, field, columns, rows, steps, cars, window):
+            windows.append(window)
+            return allocate(cls, field, columns, rows, steps, cars, window)
+
+        monkeypatch.setattr(TileBuffers, "allocate", classmethod(record_window))
+        field = Field(width=10, height=10)
+        cars = [Car("A", 0, 0, "N", "F" * 10), Car("B", 5, 5, "N", "F" * 10)]
+
+        assert execute_simulation_multiples_cars_tiles(field, cars, workers=1) == "no collision"
+        assert windows == [10]
+
+    def test_worker_processes(self):
+        field, cars = generate_scenario(seed=3, width=40, height=40, cars=30, commands=60)
+        reference = [car.copy() for car in cars]
+
+        expected = execute_simulation_multiples_cars(field, reference)
+        result = execute_simulation_multiples_cars_tiles(field, cars, workers=2, tiles=4)
+        assert result == expected
+        assert [format(car) for car in cars] == [format(car) for car in reference]
+
+    @pytest.mark.parametrize("tiles", [1, 4, 6])
+    @pytest.mark.parametrize("window", [1, 3, None])
+    @pytest.mark.parametrize("seed", range(10))
+    def test_matches_reference_engine(self, seed, window, tiles):
+        field, cars = generate_scenario(
+            seed=seed, width=6 + seed % 4, height=6, cars=8, commands=40, forward_ratio=0.8
+        )
+        reference = [car.copy() for car in cars]
+
+        expected = execute_simulation_multiples_cars(field, reference)
+        result = execute_simulation_multiples_cars_tiles(
+            field, cars, workers=1, tiles=tiles, window=window
+        )
+        assert result == expected
+        assert [format(car) for car in cars] == [format(car) for car in reference]
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from src.execute import execute_simulation_multiples_cars
+from src.generator import generate_scenario
+from src.schemas import Car, Field
+from src.trajectories import (
+    MATRIX_POSITIONS,
+    compute_trajectories,
+    execute_simulation_multiples_cars_trajectories,
+    find_earliest_collision,
+)
+from src.vectorized import build_command_matrix
+
+
+class TestComputeTrajectories:
+    def test_trajectory_is_clamped_to_the_field(self):
+        field = Field(width=3, height=3)
+        car = Car(id="A", x=1, y=1, direction="N", command_list=list("FFRFF"))
+
+        xs, ys, headings = compute_trajectories(
+            field,
+            np.array([car.x]),
+            np.array([car.y]),
+            np.array([car.heading]),
+            build_command_matrix([car]),
+        )
+        assert list(zip(xs[:, 0].tolist(), ys[:, 0].tolist(), strict=True)) == [
+            (1, 1),
+            (1, 2),
+            (1, 2),
+            (1, 2),
+            (2, 2),
+            (2, 2),
+        ]
+        assert headings[:, 0].tolist() == [0, 0, 0, 1, 1, 1]
+
+
+class TestFindEarliestCollision:
+    def test_no_move_no_collision(self):
+        assert find_earliest_collision(np.array([[1, 1], [1, 1]])) is None
+
+    def test_car_ahead_already_arrived(self):
+        # Car 0 moves from 1 to 5, car 1 from 4 to 5
+        assert find_earliest_collision(np.array([[1, 4], [5, 5]])) == (1, 1, 0)
+
+    def test_car_behind_has_not_left(self):
+        # Car 0 moves onto 4, where car 1 still is before leaving for 7
+        assert find_earliest_collision(np.array([[1, 4], [4, 7]])) == (1, 0, 1)
+
+    def test_car_ahead_already_left(self):
+        # Car 1 follows car 0 onto the cell it has just left
+        assert find_earliest_collision(np.array([[4, 1], [7, 4]])) is None
+
+    def test_earliest_step_then_fleet_order(self):
+        cells = np.array([[0, 10, 20, 30], [1, 11, 21, 31], [2, 2, 22, 22]])
+        assert find_earliest_collision(cells) == (2, 1, 0)
+
+
+class TestTrajectoryEngine:
+    def test_sample_from_instructions(self):
+        field = Field(width=10, height=10)
+        car1 = Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFFRRL"))
+        car2 = Car(id="B", x=7, y=8, direction="W", command_list=list("FFLFFFFFFF"))
+
+        result = execute_simulation_multiples_cars_trajectories(field, [car1, car2])
+        assert result == "A B\n5 4\n7"
+
+    def test_three_cars_with_collision(self):
+        field = Field(width=5, height=5)
+        car1 = Car(id="A", x=0, y=0, direction="E", command_list=["F", "F", "F"])
+        car2 = Car(id="B", x=2, y=1, direction="N", command_list=["F", "F", "F"])
+        car3 = Car(id="C", x=3, y=0, direction="W", command_list=["F", "F", "F"])
+
+        result = execute_simulation_multiples_cars_trajectories(field, [car1, car2, car3])
+        assert result == "C A\n2 0\n2"
+        # C has not played the colliding step
+        assert (car3.x, car3.y) == (2, 0)
+
+    @pytest.mark.parametrize("matrix_positions", [0, MATRIX_POSITIONS])
+    @pytest.mark.parametrize("window", [1, 3, None])
+    @pytest.mark.parametrize("seed", range(15))
+    def test_matches_reference_engine(self, monkeypatch, seed, window, matrix_positions):
+        # Commands stacked a window at a time, or all at once
+        monkeypatch.setattr("src.trajectories.MATRIX_POSITIONS", matrix_positions)
+        field, cars = generate_scenario(
+            seed=seed, width=6 + seed % 4, height=6, cars=8, commands=40, forward_ratio=0.8
+        )
+        reference = [car.copy() for car in cars]
+
+        expected = execute_simulation_multiples_cars(field, reference)
+        result = execute_simulation_multiples_cars_trajectories(field, cars, window=window)
+        assert result == expected
+        assert [format(car) for car in cars] == [format(car) for car in reference]
@@ -0,0 +1,102 @@
+import copy
+import random
+
+import pytest
+
+from src.execute import execute_simulation_multiples_cars
+from src.schemas import Car, Field
+from src.vectorized import build_command_matrix, execute_simulation_multiples_cars_vectorized
+
+
+@pytest.fixture
+def field():
+    return Field(width=5, height=5)
+
+
+def random_fleet(rng, field, size, length):
+    return [
+        Car(
+            id=chr(ord("A") + index),
+            x=rng.randrange(field.width),
+            y=rng.randrange(field.height),
+            direction=rng.choice("NESW"),
+            command_list=rng.choices("FFFRL", k=length),
+        )
+        for index in range(size)
+    ]
+
+
+class TestVectorizedEngine:
+    def test_no_collision(self, field):
+        car1 = Car(id="A", x=0, y=0, direction="N", command_list=["F", "F"])
+        car2 = Car(id="B", x=2, y=0, direction="N", command_list=["F", "F"])
+
+        result = execute_simulation_multiples_cars_vectorized(field, [car1, car2])
+        assert result == "no collision"
+        assert (car1.x, car1.y, car1.direction) == (0, 2, "N")
+        assert (car2.x, car2.y, car2.direction) == (2, 2, "N")
+
+    def test_sample_from_instructions(self):
+        field = Field(width=10, height=10)
+        car1 = Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFFRRL"))
+        car2 = Car(id="B", x=7, y=8, direction="W", command_list=list("FFLFFFFFFF"))
+
+        result = execute_simulation_multiples_cars_vectorized(field, [car1, car2])
+        assert result == "A B\n5 4\n7"
+
+    def test_three_cars_with_collision(self, field):
+        car1 = Car(id="A", x=0, y=0, direction="E", command_list=["F", "F", "F"])
+        car2 = Car(id="B", x=2, y=1, direction="N", command_list=["F", "F", "F"])
+        car3 = Car(id="C", x=3, y=0, direction="W", command_list=["F", "F", "F"])
+
+        result = execute_simulation_multiples_cars_vectorized(field, [car1, car2, car3])
+        assert result == "C A\n2 0\n2"
+        # C has not played the colliding step
+        assert (car3.x, car3.y) == (2, 0)
+
+    def test_following_car_does_not_collide(self, field):
+        car1 = Car(id="A", x=1, y=0, direction="E", command_list=["F", "F"])
+        car2 = Car(id="B", x=0, y=0, direction="E", command_list=["F", "F"])
+
+        result = execute_simulation_multiples_cars_vectorized(field, [car1, car2])
+        assert result == "no collision"
+
+    def test_leading_car_blocks_the_follower(self, field):
+        car1 = Car(id="A", x=0, y=0, direction="E", command_list=["F", "F"])
+        car2 = Car(id="B", x=1, y=0, direction="E", command_list=["F", "F"])
+
+        result = execute_simulation_multiples_cars_vectorized(field, [car1, car2])
+        assert result == "B A\n1 0\n1"
+
+    def test_shorter_command_lists_stay_idle(self, field):
+        car1 = Car(id="A", x=0, y=0, direction="N", command_list=["F"])
+        car2 = Car(id="B", x=3, y=2, direction="W", command_list=["F", "L", "F"])
+
+        result = execute_simulation_multiples_cars_vectorized(field, [car1, car2])
+        assert result == "no collision"
+        assert (car1.x, car1.y) == (0, 1)
+        assert (car2.x, car2.y, car2.direction) == (2, 1, "S")
+
+    def test_build_command_matrix(self):
+        car1 = Car(id="A", x=0, y=0, direction="N", command_list=["F", "R"])
+        car2 = Car(id="B", x=0, y=0, direction="N", command_list=["L"])
+
+        commands = build_command_matrix([car1, car2])
+        assert commands.shape == (2, 2)
+        assert commands.tolist() == [[ord("F"), ord("L")], [ord("R"), 0]]
+        # A window of steps
+        assert build_command_matrix([car1, car2], 1).tolist() == [[ord("R"), 0]]
+        assert build_command_matrix([car1, car2], 0, 1).tolist() == [[ord("F"), ord("L")]]
+        assert build_command_matrix([car1, car2], 2, 5).shape == (0, 2)
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_matches_reference_engine(self, seed):
+        rng = random.Random(seed)
+        field = Field(width=rng.randint(1, 8), height=rng.randint(1, 8))
+        fleet = random_fleet(rng, field, size=rng.randint(2, 12), length=30)
+        reference = copy.deepcopy(fleet)
+
+        expected = execute_simulation_multiples_cars(field, reference)
+        result = execute_simulation_multiples_cars_vectorized(field, fleet)
+        assert result == expected
+        assert [format(car) for car in fleet] == [format(car) for car in reference]
@@ -0,0 +1,136 @@
+import random
+
+import pytest
+
+from src.execute import execute_simulation_multiples_cars
+from src.generator import generate_scenario
+from src.schemas import Car, Field
+from src.visits import VisitIndex, build_visit_index
+
+
+def replay_stays(field, cars, steps):
+    """Stays of every car, found by replaying the fleet up to every step."""
+    cells = []
+    for step in range(steps + 1):
+        fleet = [car.copy(car.commands[:step]) for car in cars]
+        execute_simulation_multiples_cars(field, fleet)
+        cells.append([(car.x, car.y) for car in fleet])
+
+    stays = set()
+    for index, car in enumerate(cars):
+        arrive = 0
+        for step in range(1, steps + 2):
+            if step == steps + 1 or cells[step][index] != cells[step - 1][index]:
+                x, y = cells[arrive][index]
+                stays.add((car.id, x, y, arrive, step))
+                arrive = step
+
+    return stays
+
+
+@pytest.fixture
+def sample():
+    field = Field(width=10, height=10)
+    cars = [
+        Car(id="A", x=1, y=2, direction="N", command_list=list("FFRFFFFRRL")),
+        Car(id="B", x=7, y=8, direction="W", command_list=list("FFLFFFFFFF")),
+    ]
+    return field, cars
+
+
+class TestVisitIndex:
+    def test_sample_from_instructions(self, sample):
+        result, index = build_visit_index(*sample)
+
+        assert result == "A B\n5 4\n7"
+        assert index.steps == 7
+        assert index.cell(5, 4) == [("A", 7, 8), ("B", 7, 8)]
+        assert index.cell(1, 2) == [("A", 0, 1)]
+        assert index.cell(1, 2, start=1) == []
+        assert index.cell(0, 0) == []
+
+    def test_steps_window(self, sample):
+        _, index = build_visit_index(*sample)
+
+        # A turns on (1, 4) during step 3, and leaves it on step 4
+        assert index.cell(1, 4) == [("A", 2, 4)]
+        assert index.cell(1, 4, start=3, stop=4) == [("A", 2, 4)]
+        assert index.cell(1, 4, start=4) == []
+        assert index.cell(1, 4, stop=2) == []
+
+    def test_region(self, sample):
+        _, index = build_visit_index(*sample)
+
+        assert index.region(4, 4, 6, 5, start=5) == [
+            ("A", 4, 4, 6, 7),
+            ("A", 5, 4, 7, 8),
+            ("B", 5, 4, 7, 8),
+            ("B", 5, 5, 6, 7),
+        ]
+        assert index.region(-5, -5, 100, 100) == index.region(0, 0, 9, 9)
+        assert index.region(3, 3, 2, 2) == []
+
+    def test_region_of_a_huge_field(self):
+        field = Field(width=10**9, height=10**9)
+        cars = [Car("A", 5, 5, "N", "FFRFF"), Car("B", 10**9 - 3, 7, "W", "FFLFF")]
+        _, index = build_visit_index(field, cars)
+
+        # Neither the width nor the height of the rectangle is walked
+        assert len(index.region(0, 0, 10**9 - 1, 10**9 - 1)) == 10
+        assert index.region(0, 7, 10**9 - 1, 7, start=2) == [
+            ("A", 5, 7, 2, 4),
+            ("A", 6, 7, 4, 5),
+            ("A", 7, 7, 5, 6),
+            ("B", 999999995, 7, 2, 4),
+        ]
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_region_matches_the_stays_of_its_cells(self, seed):
+        field, cars = generate_scenario(
+            seed=seed, width=40, height=10, cars=3, commands=30, forward_ratio=0.8
+        )
+        _, index = build_visit_index(field, cars)
+        stays = index.region(0, 0, field.width - 1, field.height - 1)
+
+        rng = random.Random(seed)
+        for _ in range(50):
+            x0, x1 = sorted(rng.randrange(field.width) for _ in range(2))
+            y0, y1 = sorted(rng.randrange(field.height) for _ in range(2))
+            assert index.region(x0, y0, x1, y1) == [
+                stay for stay in stays if x0 <= stay[1] <= x1 and y0 <= stay[2] <= y1
+            ]
+
+    def test_save_and_load(self, sample, tmp_path):
+        _, index = build_visit_index(*sample)
+        index.save(tmp_path / "visits.npz")
+
+        loaded = VisitIndex.load(tmp_path / "visits.npz")
+        assert loaded.steps == index.steps
+        assert len(loaded) == len(index)
+        assert loaded.region(0, 0, 9, 9) == index.region(0, 0, 9, 9)
+        assert list(tmp_path.iterdir()) == [tmp_path / "visits.npz"]
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_replay(self, seed):
+        field, cars = generate_scenario(
+            seed=seed, width=12, height=10, cars=8, commands=40, forward_ratio=0.8
+        )
+        rng = random.Random(seed)
+        for car in cars:
+            car.commands = car.commands[: rng.randrange(len(car.commands) + 1)]
+
+        reference = [car.copy() for car in cars]
+        _, index = build_visit_index(field, cars)
+        stays = replay_stays(field, reference, index.steps)
+
+        assert set(index.region(0, 0, field.width - 1, field.height - 1)) == stays
+        for _ in range(20):
+            x, y = rng.randrange(field.width), rng.randrange(field.height)
+            start = rng.randrange(index.steps + 1)
+            stop = rng.randrange(start, index.steps + 2)
+            expected = sorted(
+                (car_id, arrive, leave)
+                for car_id, stay_x, stay_y, arrive, leave in stays
+                if (stay_x, stay_y) == (x, y) and arrive < stop and leave > start
+            )
+            assert sorted(index.cell(x, y, start, stop)) == expected